@@ -5,7 +5,146 @@ from dateutil.relativedelta import relativedelta
 import pytz
 
 
-def compute_domain(domain_tuple,model):
+def _quarter_start(day):
+    return day.replace(month=((day.month - 1) // 3) * 3 + 1, day=1)
+
+
+# date_filter value: day (user midnight) -> (start, end or None)
+DATE_FILTER_RANGES = {
+    'today': lambda day: (day, day + timedelta(days=1)),
+    'this_week': lambda day: (day - timedelta(days=day.weekday()), day + timedelta(days=7 - day.weekday())),
+    'this_month': lambda day: (day.replace(day=1), day.replace(day=1) + relativedelta(months=1)),
+    'this_quarter': lambda day: (_quarter_start(day), _quarter_start(day) + relativedelta(months=3)),
+    'this_year': lambda day: (day.replace(month=1, day=1), day.replace(month=1, day=1) + relativedelta(years=1)),
+    'last_day': lambda day: (day - timedelta(days=1), day),
+    'last_week': lambda day: (day - timedelta(days=day.weekday() + 7), day - timedelta(days=day.weekday())),
+    'last_month': lambda day: (day.replace(day=1) - relativedelta(months=1), day.replace(day=1)),
+    'last_quarter': lambda day: (_quarter_start(day) - relativedelta(months=3), _quarter_start(day)),
+    'last_year': lambda day: (day.replace(year=day.year - 1, month=1, day=1), day.replace(month=1, day=1)),
+    'last_7_days': lambda day: (day - timedelta(days=6), None),
+    'last_30_days': lambda day: (day - timedelta(days=29), None),
+    'last_90_days': lambda day: (day - timedelta(days=89), None),
+    'last_365_days': lambda day: (day - timedelta(days=364), None),
+    'next_day': lambda day: (day + timedelta(days=1), day + timedelta(days=2)),
+    'next_week': lambda day: (day + timedelta(days=7 - day.weekday()), day + timedelta(days=14 - day.weekday())),
+    'next_month': lambda day: (day.replace(day=1) + relativedelta(months=1), day.replace(day=1) + relativedelta(months=2)),
+    'next_quarter': lambda day: (_quarter_start(day) + relativedelta(months=3), _quarter_start(day) + relativedelta(months=6)),
+    'next_year': lambda day: (day.replace(year=day.year + 1, month=1, day=1), day.replace(year=day.year + 2, month=1, day=1)),
+}
+
+# relation targets whose 0 ids stand for the current user / company
+CURRENT_RECORD_MODELS = ('res.users', 'res.company')
+
+
+def _user_today(env):
+    """Midnight of the current day in the user timezone."""
+    tz = pytz.timezone(env.user.tz or 'UTC')
+    return datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def date_filter_domain(field_name, value, current_date):
+    """Expand a ``(field_name, 'date_filter', value)`` leaf for the day ``current_date``."""
+    date_range = DATE_FILTER_RANGES.get(value)
+    if not date_range:
+        return [(field_name, 'date_filter', value)]
+    start, end = date_range(current_date)
+    if end is None:
+        return [(field_name, ">=", fields.Datetime.to_string(start))]
+    return ["&", (field_name, ">=", fields.Datetime.to_string(start)),
+            (field_name, "<", fields.Datetime.to_string(end))]
+
+
+def resolve_path_target(model, path):
+    """
+    Follow a dotted field path through the in-memory ``_fields`` of ``model``
+    and return the comodel name of its last field when it is relational.
+
+    :param model: recordset of the model the path starts from
+    :param path: dotted field path, e.g. ``'order_id.user_id'``
+    :return: comodel name or ``False``
+    """
+    target = False
+    for name in path.split('.'):
+        field = model._fields.get(name)
+        target = False
+        if field is None:
+            break
+        if field.relational:
+            target = field.comodel_name
+            model = model.env[target]
+    return target
+
+
+def freeze_domain(domain):
+    """Hashable copy of a domain (lists become tuples), usable as a cache key."""
+    if isinstance(domain, (list, tuple)):
+        return tuple(freeze_domain(item) for item in domain)
+    return domain
+
+
+def compile_domain_parts(model, domain):
+    """
+    Compile a normalized domain once: each part is either a static element,
+    a leaf whose ``0`` ids are filled with the current user/company, or a
+    ``date_filter`` template expanded at evaluation time.
+    """
+    parts = []
+    for element in domain:
+        if isinstance(element, (list, tuple)) and len(element) == 3:
+            left_value, operator_value, right_value = element
+            if operator_value == 'date_filter':
+                parts.append(('date', left_value, right_value))
+                continue
+            if (operator_value in ('in', 'not in') and isinstance(right_value, (list, tuple))
+                    and 0 in right_value and isinstance(left_value, str)):
+                target = model._get_domain_path_target(left_value)
+                if target in CURRENT_RECORD_MODELS:
+                    parts.append(('current', target, element))
+                    continue
+        parts.append(('static', element))
+    return tuple(parts)
+
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def evaluate_domain(env, compiled):
+    """Fill a compiled domain for the user, company and day of ``env``."""
+    domain_list = []
+    current_date = None
+    for part in compiled:
+        kind = part[0]
+        if kind == 'date':
+            if current_date is None:
+                current_date = _user_today(env)
+            domain_list += date_filter_domain(part[1], part[2], current_date)
+        elif kind == 'current':
+            left_value, operator_value, right_value = part[2]
+            right_value = _thaw(right_value)
+            right_value[right_value.index(0)] = env.user.id if part[1] == 'res.users' else env.company.id
+            domain_list.append((left_value, operator_value, right_value))
+        else:
+            element = part[1]
+            domain_list.append(element if isinstance(element, str) else tuple(
+                _thaw(item) if isinstance(item, tuple) else item for item in element))
+    return domain_list
+
+
+def prepare_domain(env, model_name, domain):
+    """
+    Compiled and evaluated form of a normalized domain on ``model_name``:
+    ``date_filter`` leaves are expanded and ``0`` in user/company ``in`` leaves
+    is replaced by the current user/company. Compilation is cached per model
+    and domain in the registry, evaluation runs no query.
+    """
+    compiled = env[model_name]._compile_web_domain(freeze_domain(domain))
+    return evaluate_domain(env, compiled)
+
+
+def compute_domain(domain_tuple,model,env=None):
     """
     This function takes a tuple of a domain and a model name as input. It parses
     the domain and replaces 0 with the current user's ID or the current company's
@@ -18,163 +157,24 @@ def compute_domain(domain_tuple,model):
     :return: The modified domain
     :rtype: tuple
     """
+    env = env or request.env
     left_value = domain_tuple[0]
     operator_value = domain_tuple[1]
     right_value = domain_tuple[2]
-    left_value_split_list = left_value.split('.')
-    left_user = False
-    left_company = False
-    field_obj = request.env['ir.model.fields'].sudo()
-    model_obj = request.env[model]._name
-    for field in left_value_split_list:
-        left_user = False
-        left_company = False
-        model_field = field_obj.search([('model_id.model','=',model_obj),('name','=',field)],limit=1)
-        field_type = model_field.ttype
-        if field_type in ['many2one', 'many2many', 'one2many']:
-            model_obj = model_field.relation
-            field_relation = model_field.relation
-            relation_model = field_relation
-            if relation_model == 'res.users':
-                left_user = True
-            if relation_model == 'res.company': 
-                left_company = True
-    
-    if left_user:
-        if operator_value in ['in', 'not in']:
-            if isinstance(right_value, list) and 0 in right_value:
-                zero_index = right_value.index(0)
-                right_value[zero_index] = request.env.user.id
-
-    if left_company:
-        if operator_value in ['in', 'not in']:
-            if isinstance(right_value, list) and 0 in right_value:
-                zero_index = right_value.index(0)
-                right_value[zero_index] = request.env.company.id
+    target = env[model]._get_domain_path_target(left_value)
+
+    if operator_value in ['in', 'not in'] and isinstance(right_value, list) and 0 in right_value:
+        zero_index = right_value.index(0)
+        if target == 'res.users':
+            right_value[zero_index] = env.user.id
+        elif target == 'res.company':
+            right_value[zero_index] = env.company.id
                 
-def prepare_domain_v2(domain):
+def prepare_domain_v2(domain, env=None):
     if isinstance(domain, tuple) or isinstance(domain, list):
-        field_name = domain[0]
-        operator = domain[1]
-        val = domain[2]
-
-        # Initialize timezone
-        user_tz = request.env.user.tz or 'UTC'
-        tz = pytz.timezone(user_tz)
-        current_date = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
-
-        if operator != "date_filter":
+        if domain[1] != "date_filter":
             return [tuple(domain)]
-
-        if val == "today":
-            start_of_today = current_date
-            end_of_today = start_of_today + timedelta(days=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_today)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_today))]
-
-        if val == "this_week":
-            start_of_week = current_date - timedelta(days=current_date.weekday())
-            end_of_week = start_of_week + timedelta(days=7)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_week)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_week))]
-
-        if val == "this_month":
-            start_of_month = current_date.replace(day=1)
-            end_of_month = start_of_month + relativedelta(months=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_month)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_month))]
-
-        if val == "this_quarter":
-            quarter_start_month = ((current_date.month - 1) // 3) * 3 + 1
-            start_of_quarter = current_date.replace(month=quarter_start_month, day=1)
-            end_of_quarter = start_of_quarter + relativedelta(months=3)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_quarter)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_quarter))]
-
-        if val == "this_year":
-            start_of_year = current_date.replace(month=1, day=1)
-            end_of_year = start_of_year + relativedelta(years=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_year)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_year))]
-
-        if val == "last_day":
-            start_of_yesterday = current_date - timedelta(days=1)
-            end_of_yesterday = current_date
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_yesterday)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_yesterday))]
-
-        if val == "last_week":
-            end_of_last_week = current_date - timedelta(days=current_date.weekday())
-            start_of_last_week = end_of_last_week - timedelta(days=7)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_last_week)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_last_week))]
-
-        if val == "last_month":
-            start_of_last_month = current_date.replace(day=1) - relativedelta(months=1)
-            end_of_last_month = current_date.replace(day=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_last_month)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_last_month))]
-
-        if val == "last_quarter":
-            quarter_start_month = ((current_date.month - 1) // 3) * 3 + 1
-            end_of_last_quarter = current_date.replace(month=quarter_start_month, day=1)
-            start_of_last_quarter = end_of_last_quarter - relativedelta(months=3)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_last_quarter)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_last_quarter))]
-
-        if val == "last_year":
-            start_of_last_year = current_date.replace(year=current_date.year - 1, month=1, day=1)
-            end_of_last_year = current_date.replace(month=1, day=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_last_year)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_last_year))]
-
-        if val == "last_7_days":
-            start_of_last_7_days = current_date - timedelta(days=6)
-            return [(field_name, ">=", fields.Datetime.to_string(start_of_last_7_days))]
-
-        if val == "last_30_days":
-            start_of_last_30_days = current_date - timedelta(days=29)
-            return [(field_name, ">=", fields.Datetime.to_string(start_of_last_30_days))]
-
-        if val == "last_90_days":
-            start_of_last_90_days = current_date - timedelta(days=89)
-            return [(field_name, ">=", fields.Datetime.to_string(start_of_last_90_days))]
-
-        if val == "last_365_days":
-            start_of_last_365_days = current_date - timedelta(days=364)
-            return [(field_name, ">=", fields.Datetime.to_string(start_of_last_365_days))]
-
-        if val == "next_day":
-            start_of_next_day = current_date + timedelta(days=1)
-            end_of_next_day = start_of_next_day + timedelta(days=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_next_day)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_next_day))]
-
-        if val == "next_week":
-            start_of_next_week = current_date + timedelta(days=(7 - current_date.weekday()))
-            end_of_next_week = start_of_next_week + timedelta(days=7)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_next_week)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_next_week))]
-
-        if val == "next_month":
-            start_of_next_month = current_date.replace(day=1) + relativedelta(months=1)
-            end_of_next_month = start_of_next_month + relativedelta(months=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_next_month)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_next_month))]
-
-        if val == "next_quarter":
-            quarter_start_month = ((current_date.month - 1) // 3) * 3 + 1
-            end_of_current_quarter = current_date.replace(month=quarter_start_month, day=1) + relativedelta(months=3)
-            start_of_next_quarter = end_of_current_quarter
-            end_of_next_quarter = start_of_next_quarter + relativedelta(months=3)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_next_quarter)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_next_quarter))]
-
-        if val == "next_year":
-            start_of_next_year = current_date.replace(year=current_date.year + 1, month=1, day=1)
-            end_of_next_year = start_of_next_year + relativedelta(years=1)
-            return ["&", (field_name, ">=", fields.Datetime.to_string(start_of_next_year)),
-                    (field_name, "<", fields.Datetime.to_string(end_of_next_year))]
+        return date_filter_domain(domain[0], domain[2], _user_today(env or request.env))
 
     return [tuple(domain)]
 
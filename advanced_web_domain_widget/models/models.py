@@ -1,5 +1,6 @@
 from odoo import api, fields, models, tools, _
-from odoo.addons.advanced_web_domain_widget.models.domain_prepare import prepare_domain_v2
+from odoo.addons.advanced_web_domain_widget.models.domain_prepare import prepare_domain, resolve_path_target, \
+    compile_domain_parts
 
 class BaseModel(models.AbstractModel):
     _inherit = 'base'
@@ -24,12 +25,21 @@ class BaseModel(models.AbstractModel):
     @api.model
     def get_widget_count(self, args):
         # return self.sudo().search_count(args)
-        domain_list = []
-        for domain in args:
-            if isinstance(domain, tuple) or isinstance(domain, list):
-                domain_list += prepare_domain_v2(domain)
+        domain_list = prepare_domain(self.env, self._name, [domain for domain in args
+                                                            if isinstance(domain, tuple) or isinstance(domain, list)])
         if self.env.user.has_group('base.group_system'):
             res = self.sudo().search_count(domain_list)
         else:
             res = self.search_count(domain_list)
-        return res
\ No newline at end of file
+        return res
+    @api.model
+    @tools.ormcache('path')
+    def _get_domain_path_target(self, path):
+        """Comodel reached by a dotted field path of this model, see :func:`resolve_path_target`."""
+        return resolve_path_target(self, path)
+
+    @api.model
+    @tools.ormcache('domain')
+    def _compile_web_domain(self, domain):
+        """Compiled form of a frozen domain of this model, see :func:`compile_domain_parts`."""
+        return compile_domain_parts(self, domain)
@@ -1 +1,4 @@
 from . import ks_date_filter_selections
+from . import ks_data_ingestion
+from . import ks_columnar_cache
+from . import ks_domain_cache
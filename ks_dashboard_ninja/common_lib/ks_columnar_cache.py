@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import logging
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = pq = None
+
+KS_CACHE_FOLDER = 'ks_dn_columnar'
+KS_MANIFEST = 'manifest.json'
+KS_PARQUET = 'data.parquet'
+# Rows read to suggest the column types of a freshly uploaded file
+KS_SAMPLE_ROWS = 1000
+# Caches of files not saved on any item are kept this long, e.g. for a form still being edited
+KS_CACHE_GRACE = 24 * 3600
+
+
+def ks_columnar_checksum(ks_binary):
+    """Checksum of the base64 content of an uploaded file, the same as sha256() of the stored column."""
+    if isinstance(ks_binary, str):
+        ks_binary = ks_binary.encode()
+    return hashlib.sha256(ks_binary).hexdigest()
+
+
+def ks_columnar_path(env, ks_binary):
+    """Cache folder of an uploaded file, addressed by the checksum of its base64 content."""
+    checksum = ks_columnar_checksum(ks_binary)
+    return os.path.join(env['ir.attachment']._filestore(), KS_CACHE_FOLDER, checksum[:2], checksum)
+
+
+def ks_columnar_gc(env, checksums, grace=KS_CACHE_GRACE):
+    """Remove the cache folders whose checksum is not in ``checksums`` and older than ``grace`` seconds.
+
+    :return: number of removed folders
+    """
+    root = os.path.join(env['ir.attachment']._filestore(), KS_CACHE_FOLDER)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    expired = time.time() - grace
+    for prefix in os.listdir(root):
+        prefix_path = os.path.join(root, prefix)
+        if not os.path.isdir(prefix_path):
+            continue
+        for checksum in os.listdir(prefix_path):
+            path = os.path.join(prefix_path, checksum)
+            if checksum in checksums:
+                continue
+            try:
+                if os.path.getmtime(path) > expired:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        try:
+            os.rmdir(prefix_path)
+        except OSError:
+            pass
+    return removed
+
+
+def _ks_to_storable(df):
+    """Object columns become strings (nulls kept) so every column has a single native type."""
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object:
+            series = df[column]
+            df[column] = series.where(series.isna(), series.astype(str))
+    return df
+
+
+def _ks_write(df, path):
+    df = _ks_to_storable(df)
+    headers = [str(header) for header in df.columns]
+    df.columns = headers
+    manifest = {'headers': headers, 'rows': len(df), 'format': 'parquet' if pq else 'npy', 'columns': []}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=os.path.dirname(path))
+    try:
+        if pq:
+            pq.write_table(pyarrow.Table.from_pandas(df, preserve_index=False), os.path.join(tmp_path, KS_PARQUET))
+        else:
+            import numpy as np
+            for index, header in enumerate(headers):
+                series = df[header]
+                mask = series.isna().to_numpy()
+                if series.dtype == object:
+                    values = series.fillna('').to_numpy(dtype=str)
+                else:
+                    values = series.to_numpy()
+                np.save(os.path.join(tmp_path, '%04d.npy' % index), values, allow_pickle=False)
+                np.save(os.path.join(tmp_path, '%04d.mask.npy' % index), mask, allow_pickle=False)
+                manifest['columns'].append('%04d' % index)
+        with open(os.path.join(tmp_path, KS_MANIFEST), 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+    return manifest
+
+
+def ks_columnar_manifest(env, ks_binary, filename):
+    """Convert an uploaded Excel/CSV file to its columnar cache once and return the manifest."""
+    path = ks_columnar_path(env, ks_binary)
+    manifest_path = os.path.join(path, KS_MANIFEST)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    from .ks_data_ingestion import ks_read_dataframe
+    _logger.info("Building columnar cache for %s in %s", filename, path)
+    return _ks_write(ks_read_dataframe(ks_binary, filename), path)
+
+
+def ks_load_columnar(env, ks_binary, filename, columns=None):
+    """DataFrame of an uploaded file read from its memory-mapped columnar cache.
+
+    :param columns: headers to load, all of them by default
+    """
+    import pandas as pd
+
+    manifest = ks_columnar_manifest(env, ks_binary, filename)
+    path = ks_columnar_path(env, ks_binary)
+    headers = [header for header in manifest['headers'] if columns is None or header in columns]
+    if manifest['format'] == 'parquet':
+        if not pq:
+            shutil.rmtree(path, ignore_errors=True)
+            return ks_load_columnar(env, ks_binary, filename, columns)
+        table = pq.read_table(os.path.join(path, KS_PARQUET), columns=headers, memory_map=True)
+        return table.to_pandas()
+
+    import numpy as np
+    data = {}
+    for index, header in enumerate(manifest['headers']):
+        if header not in headers:
+            continue
+        name = manifest['columns'][index]
+        values = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+        mask = np.load(os.path.join(path, name + '.mask.npy'), mmap_mode='r')
+        series = pd.Series(values)
+        data[header] = series.where(~mask, None) if mask.any() else series
+    return pd.DataFrame(data, columns=headers)
+
+
+def _ks_detect_type(series):
+    import pandas as pd
+
+    non_null = series.dropna()
+    if series.dtype == object:
+        non_null = non_null[non_null.astype(str).str.strip() != '']
+    if series.dtype == object and len(non_null):
+        numbers = pd.to_numeric(non_null.str.replace(r"[$,\s]", '', regex=True), errors='coerce')
+        if numbers.notna().all():
+            non_null = numbers
+        else:
+            dates = pd.to_datetime(non_null, errors='coerce')
+            if dates.notna().all():
+                non_null = dates
+    if not len(non_null):
+        return 'char'
+    if pd.api.types.is_bool_dtype(non_null) or pd.api.types.is_integer_dtype(non_null):
+        return 'integer'
+    if pd.api.types.is_float_dtype(non_null):
+        return 'integer' if (non_null % 1 == 0).all() else 'float'
+    if pd.api.types.is_datetime64_any_dtype(non_null):
+        return 'date' if (non_null == non_null.dt.normalize()).all() else 'datetime'
+    return 'char'
+
+
+def ks_detect_column_types(ks_binary, filename, nrows=KS_SAMPLE_ROWS):
+    """Suggest a Column Data Type for each header from the first ``nrows`` rows of the file."""
+    from .ks_data_ingestion import ks_read_dataframe
+    df = ks_read_dataframe(ks_binary, filename, nrows=nrows)
+    return {header: _ks_detect_type(df[header]) for header in df.columns}
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+import binascii
+import io
+import os
+
+from odoo import _, fields
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+
+KS_NULL_TOKENS = ('', 'nan', 'NaN', 'NaT', 'None', 'null', 'Null')
+
+
+def ks_normalize_column_name(name):
+    """Return the technical ``x_`` field name used for an uploaded column header."""
+    column_name = str(name).strip().lower()
+    for char in ('/', ' '):
+        column_name = column_name.replace(char, '_')
+    column_name = column_name.replace('(', '').replace(')', '')
+    if column_name == 'name':
+        column_name = 'name1'
+    return 'x_' + column_name
+
+
+def ks_file_extension(filename):
+    return os.path.splitext(filename or '')[1].lower()
+
+
+def ks_read_dataframe(ks_binary, filename, nrows=None):
+    """Decode an uploaded Excel/CSV binary field into a pandas DataFrame."""
+    import pandas as pd
+
+    ks_buffer = io.BytesIO(binascii.a2b_base64(ks_binary))
+    file_type = ks_file_extension(filename)
+    try:
+        if file_type == '.xlsx':
+            return pd.read_excel(ks_buffer, engine='openpyxl', nrows=nrows)
+        if file_type == '.xls':
+            return pd.read_excel(ks_buffer, engine='xlrd', nrows=nrows)
+        if file_type == '.csv':
+            return pd.read_csv(ks_buffer, dtype=str, keep_default_na=False, nrows=nrows, encoding='utf-8')
+    except Exception as e:
+        raise ValidationError(_("Invalid file! %s", e))
+    raise ValidationError(_("Unsupported file format. Only XLSX, XLS and CSV are supported."))
+
+
+def ks_coerce_column(series, ttype, timezone):
+    """Convert one raw column to database-ready values (``None`` for NULL).
+
+    Dates and datetimes are parsed in one pass, datetimes are localized from the
+    user timezone and shifted to UTC. Numbers are stripped of currency symbols
+    and thousands separators before conversion; unparsable numbers become 0.
+    """
+    import pandas as pd
+
+    ks_text = series.astype(str).str.strip()
+    ks_nulls = series.isna() | ks_text.isin(KS_NULL_TOKENS)
+
+    if ttype in ('date', 'datetime'):
+        values = pd.to_datetime(series.where(~ks_nulls), errors='coerce')
+        if ttype == 'datetime':
+            if values.dt.tz is None:
+                values = values.dt.tz_localize(timezone, ambiguous='NaT', nonexistent='shift_forward')
+            values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+            ks_format = '%Y-%m-%d %H:%M:%S'
+        else:
+            ks_format = '%Y-%m-%d'
+        return values.dt.strftime(ks_format).astype(object).where(values.notna(), None)
+
+    if ttype in ('float', 'integer'):
+        ks_clean = ks_text.str.replace(r"[$,'\s()]", '', regex=True)
+        values = pd.to_numeric(ks_clean, errors='coerce').fillna(0)
+        values = values.astype('int64') if ttype == 'integer' else values.astype('float64')
+        return values.astype(object).where(~ks_nulls, None)
+
+    values = ks_text.str.replace("'", '', regex=False)
+    return values.astype(object).where(~ks_nulls, None)
+
+
+def ks_prepare_dataframe(df, ks_column_types, timezone):
+    """Rename the uploaded columns to their ``x_`` fields and coerce each column once.
+
+    :param ks_column_types: ``{x_field_name: ttype}`` of the columns to keep
+    """
+    import pandas as pd
+
+    ks_columns = {}
+    for header in df.columns:
+        field_name = ks_normalize_column_name(header)
+        if field_name in ks_column_types and field_name not in ks_columns:
+            ks_columns[field_name] = ks_coerce_column(df[header], ks_column_types[field_name], timezone)
+    return pd.DataFrame(ks_columns, index=df.index)
+
+
+def ks_bulk_load(env, model_name, df, key_column=None):
+    """Load a prepared DataFrame into the table of a generated ``x_`` model with COPY.
+
+    Without ``key_column`` the rows are appended. With it, rows whose key already
+    exists are updated in place and only the remaining rows are inserted, so a
+    re-sync of a grown file only touches what changed.
+    """
+    if df.empty:
+        return 0
+    cr = env.cr
+    ks_table = env[model_name]._table
+    now = fields.Datetime.to_string(fields.Datetime.now())
+    df = df.assign(create_uid=env.uid, write_uid=env.uid, create_date=now, write_date=now)
+    if key_column:
+        df = df[df[key_column].notna()].drop_duplicates(subset=[key_column], keep='last')
+    ks_columns = list(df.columns)
+    ks_column_sql = SQL(', ').join(SQL.identifier(column) for column in ks_columns)
+
+    ks_buffer = io.StringIO()
+    df.to_csv(ks_buffer, index=False, header=False)
+    ks_buffer.seek(0)
+
+    if not key_column:
+        cr.copy_expert(SQL("COPY %s (%s) FROM STDIN WITH (FORMAT csv)",
+                           SQL.identifier(ks_table), ks_column_sql).code, ks_buffer)
+    else:
+        ks_index = f'{ks_table}_{key_column}_ks_sync_index'[:63]
+        cr.execute(SQL("CREATE INDEX IF NOT EXISTS %s ON %s (%s)", SQL.identifier(ks_index),
+                       SQL.identifier(ks_table), SQL.identifier(key_column)))
+        cr.execute(SQL("CREATE TEMP TABLE ks_ingestion_rows ON COMMIT DROP AS SELECT %s FROM %s WITH NO DATA",
+                       ks_column_sql, SQL.identifier(ks_table)))
+        cr.copy_expert(SQL("COPY ks_ingestion_rows (%s) FROM STDIN WITH (FORMAT csv)", ks_column_sql).code,
+                       ks_buffer)
+        ks_update_columns = [column for column in ks_columns if column not in (key_column, 'create_uid', 'create_date')]
+        cr.execute(SQL(
+            "UPDATE %s AS t SET %s FROM ks_ingestion_rows AS s WHERE t.%s = s.%s",
+            SQL.identifier(ks_table),
+            SQL(', ').join(SQL("%s = s.%s", SQL.identifier(column), SQL.identifier(column))
+                           for column in ks_update_columns),
+            SQL.identifier(key_column), SQL.identifier(key_column),
+        ))
+        cr.execute(SQL(
+            "INSERT INTO %s (%s) SELECT %s FROM ks_ingestion_rows AS s"
+            " WHERE NOT EXISTS (SELECT 1 FROM %s AS t WHERE t.%s = s.%s)",
+            SQL.identifier(ks_table), ks_column_sql,
+            SQL(', ').join(SQL("s.%s", SQL.identifier(column)) for column in ks_columns),
+            SQL.identifier(ks_table), SQL.identifier(key_column), SQL.identifier(key_column),
+        ))
+        cr.execute(SQL("DROP TABLE ks_ingestion_rows"))
+    env[model_name].invalidate_model()
+    return len(df)
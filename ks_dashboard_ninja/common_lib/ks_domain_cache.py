@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import time
+import logging
+
+from odoo.tools.lru import LRU
+from odoo.tools.safe_eval import safe_eval
+from odoo.addons.ks_dashboard_ninja.common_lib.ks_date_filter_selections import ks_get_date
+
+_logger = logging.getLogger(__name__)
+
+# Evaluated domains, {domain text with placeholders resolved: (domain, compile time)}.
+# %UID and %MYCOMPANY are substituted before lookup, so the key carries user and company.
+KS_DOMAIN_CACHE = LRU(4096)
+KS_DOMAIN_CACHE_STATS = {'hits': 0, 'misses': 0, 'compile_time': 0.0, 'saved_time': 0.0}
+
+
+def ks_resolve_domain_placeholders(ks_domain, env):
+    if ks_domain and "%UID" in ks_domain:
+        ks_domain = ks_domain.replace('"%UID"', str(env.user.id)).replace("'%UID'", str(env.user.id))
+    if ks_domain and "%MYCOMPANY" in ks_domain:
+        ks_domain = ks_domain.replace('"%MYCOMPANY"', str(env.company.id)).replace("'%MYCOMPANY'",
+                                                                                   str(env.company.id))
+    return ks_domain
+
+
+def ks_eval_domain(ks_domain, env):
+    """safe_eval a stored domain string once and serve copies of the result afterwards."""
+    ks_domain = ks_resolve_domain_placeholders(ks_domain, env)
+    if not ks_domain:
+        return []
+    cached = KS_DOMAIN_CACHE.get(ks_domain)
+    if cached is not None:
+        KS_DOMAIN_CACHE_STATS['hits'] += 1
+        KS_DOMAIN_CACHE_STATS['saved_time'] += cached[1]
+        return copy.deepcopy(cached[0])
+    start = time.perf_counter()
+    domain = safe_eval(ks_domain)
+    compile_time = time.perf_counter() - start
+    KS_DOMAIN_CACHE_STATS['misses'] += 1
+    KS_DOMAIN_CACHE_STATS['compile_time'] += compile_time
+    KS_DOMAIN_CACHE[ks_domain] = (copy.deepcopy(domain), compile_time)
+    return domain
+
+
+def ks_get_date_cached(ks_date_filter_selection, self, type):
+    """:func:`ks_get_date` computed once per transaction (one dashboard request) and shared by all items."""
+    ks_timezone = self._context.get('tz') or self.env.user.tz
+    key = (ks_date_filter_selection, type, ks_timezone, self.env.company.id)
+    ks_date_ranges = self.env.cr.cache.setdefault('ks_date_ranges', {})
+    if key not in ks_date_ranges:
+        ks_date_ranges[key] = ks_get_date(ks_date_filter_selection, self, type)
+    return dict(ks_date_ranges[key])
+
+
+def ks_domain_cache_stats():
+    return dict(KS_DOMAIN_CACHE_STATS, size=len(KS_DOMAIN_CACHE))
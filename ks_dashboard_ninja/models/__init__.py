@@ -14,3 +14,4 @@ from . import ks_key_fetch
 from . import ks_chat_channel
 
 
+from . import ks_live_update
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.tools.misc import DEFAULT_SERVER_DATETIME_FORMAT
 from odoo.exceptions import ValidationError
 import datetime
@@ -10,9 +10,21 @@ import json
 from odoo.addons.ks_dashboard_ninja.common_lib.ks_date_filter_selections import ks_get_date, ks_convert_into_local, \
     ks_convert_into_utc
 from odoo.tools.safe_eval import safe_eval
+from odoo.addons.ks_dashboard_ninja.common_lib.ks_domain_cache import ks_eval_domain, ks_get_date_cached, \
+    ks_domain_cache_stats
 import locale
 from dateutil.parser import parse
 from odoo.tools.misc import file_open
+from odoo.tools import SQL
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Version of the live item maps cached by the workers, see _ks_live_item_map(). The version is a
+# plain row so its change follows the transaction; its values come from a non-transactional
+# sequence, so a version seen by a rolled back transaction is never handed out again.
+KS_LIVE_VERSION_KEY = 'ks_dashboard_ninja.live_item_version'
+KS_LIVE_VERSION_SEQUENCE = 'ks_dashboard_ninja_live_item_version_seq'
 
 
 
@@ -94,6 +106,9 @@ class KsDashboardNinjaBoard(models.Model):
         ('300000', '5 minute'),
         ('600000', '10 minute'),
     ], string="Default Update Interval", help="Update Interval for new items only")
+    ks_live_update = fields.Boolean(string="Live Updates",
+                                    help="Refresh items when their records change instead of polling on the "
+                                         "update interval")
     ks_dashboard_menu_sequence = fields.Integer(string="Menu Sequence", default=20,
                                                 help="Smallest sequence give high priority and Highest sequence give "
                                                      "low priority")
@@ -160,6 +175,8 @@ class KsDashboardNinjaBoard(models.Model):
                         dashboard_item = self.env.ref(item_data['item_id']).copy({'ks_dashboard_ninja_board_id': record.id})
                         ks_gridstack_config[dashboard_item.id] = item_data['data']
                 record.ks_gridstack_config = json.dumps(ks_gridstack_config)
+        if records.filtered('ks_live_update'):
+            self._ks_bump_live_version()
         return records
 
     @api.onchange('ks_date_filter_selection')
@@ -177,6 +194,8 @@ class KsDashboardNinjaBoard(models.Model):
                 'ks_dashboard_end_date': False
 
             })
+        ks_live_changed = 'ks_live_update' in vals and any(
+            rec.ks_live_update != bool(vals['ks_live_update']) for rec in self)
         record = super(KsDashboardNinjaBoard, self).write(vals)
         for rec in self:
             if 'ks_dashboard_menu_name' in vals:
@@ -205,6 +224,8 @@ class KsDashboardNinjaBoard(models.Model):
             if 'name' in vals:
                 rec.ks_dashboard_client_action_id.sudo().name = vals['name']
 
+        if ks_live_changed:
+            self._ks_bump_live_version()
         return record
 
     def unlink(self):
@@ -216,9 +237,70 @@ class KsDashboardNinjaBoard(models.Model):
                 rec.ks_child_dashboard_ids.unlink()
                 rec.ks_dashboard_menu_id.sudo().unlink()
                 rec.ks_dashboard_items_ids.unlink()
+        ks_live_update = any(self.mapped('ks_live_update'))
         res = super(KsDashboardNinjaBoard, self).unlink()
+        if ks_live_update:
+            self._ks_bump_live_version()
         return res
 
+    def init(self):
+        self.env.cr.execute(SQL("CREATE SEQUENCE IF NOT EXISTS %s", SQL.identifier(KS_LIVE_VERSION_SEQUENCE)))
+
+    @api.model
+    def _ks_live_version(self):
+        """Version of the live item maps, queried once per transaction."""
+        ks_version = self.env.cr.cache.get(KS_LIVE_VERSION_KEY)
+        if ks_version is None:
+            self.env.cr.execute(SQL("SELECT value FROM ir_config_parameter WHERE key = %s", KS_LIVE_VERSION_KEY))
+            row = self.env.cr.fetchone()
+            ks_version = self.env.cr.cache[KS_LIVE_VERSION_KEY] = row[0] if row else '0'
+        return ks_version
+
+    @api.model
+    def _ks_bump_live_version(self):
+        """Invalidate the live item maps of every worker once the transaction commits."""
+        self.env.cr.execute(SQL("""
+            INSERT INTO ir_config_parameter (key, value, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, nextval(%s)::varchar, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, write_date = EXCLUDED.write_date
+        """, KS_LIVE_VERSION_KEY, KS_LIVE_VERSION_SEQUENCE, self.env.uid, self.env.uid))
+        self.env.cr.cache.pop(KS_LIVE_VERSION_KEY, None)
+        self.env['ir.config_parameter'].invalidate_model(['value'])
+
+    @api.model
+    def _ks_live_item_map(self):
+        """Items of live dashboards per source model: {model: {dashboard_id: (item_ids)}}."""
+        return self._ks_live_item_map_version(self._ks_live_version())
+
+    @api.model
+    @tools.ormcache('ks_version')
+    def _ks_live_item_map_version(self, ks_version):
+        ks_live_items = {}
+        ks_items = self.env['ks_dashboard_ninja.item'].sudo().search_read(
+            [('ks_dashboard_ninja_board_id.ks_live_update', '=', True)],
+            ['ks_model_name', 'ks_model_name_2', 'ks_dashboard_ninja_board_id'])
+        for item in ks_items:
+            dashboard_id = item['ks_dashboard_ninja_board_id'][0]
+            for model_name in {item['ks_model_name'], item['ks_model_name_2']} - {False}:
+                ks_live_items.setdefault(model_name, {}).setdefault(dashboard_id, []).append(item['id'])
+        return {model_name: {dashboard_id: tuple(item_ids) for dashboard_id, item_ids in dashboards.items()}
+                for model_name, dashboards in ks_live_items.items()}
+
+    def _ks_push_live_updates(self):
+        """Precommit hook: notify open live dashboards of the items whose models changed."""
+        ks_models = self.env.cr.precommit.data.pop('ks_dashboard_ninja.live_models', set())
+        ks_live_items = self._ks_live_item_map()
+        ks_changed = {}
+        for model_name in ks_models:
+            for dashboard_id, item_ids in ks_live_items.get(model_name, {}).items():
+                ks_changed.setdefault(dashboard_id, set()).update(item_ids)
+        for dashboard_id, item_ids in ks_changed.items():
+            self.env['bus.bus'].sudo()._sendone(f'ks_dashboard_ninja.board_{dashboard_id}',
+                                                'ks_dashboard_ninja/items_changed',
+                                                {'dashboard_id': dashboard_id, 'item_ids': sorted(item_ids)})
+        if ks_changed:
+            self.env['bus.bus'].flush_model()
+
     def ks_update_menu_id_old_db(self):
         ks_records = self.search([('name','in',['Template1 Dashboard','Template2 Dashboard','Template3 Dashboard','My Dashboard'])])
         ks_menu_id = self.env.ref('ks_dashboard_ninja.dashboards_menu_root').id
@@ -306,6 +388,7 @@ class KsDashboardNinjaBoard(models.Model):
                 ks_dashboard_id).ks_date_filter_selection,
             'ks_gridstack_config': "{}",
             'ks_set_interval': ks_dashboard_rec.ks_set_interval,
+            'ks_live_update': ks_dashboard_rec.ks_live_update,
             'ks_data_formatting': ks_dashboard_rec.ks_data_formatting,
             'ks_dashboard_items_ids': ks_dashboard_rec.ks_dashboard_items_ids.ids,
             'ks_item_data': {},
@@ -366,11 +449,23 @@ class KsDashboardNinjaBoard(models.Model):
         self = self.ks_set_date(ks_dashboard_id)
         items = {}
         item_model = self.env['ks_dashboard_ninja.item']
+        ks_stats = ks_domain_cache_stats()
         for item_id in item_list:
             item = self.ks_fetch_item_data(item_model.browse(item_id), params)
             items[item['id']] = item
+        if _logger.isEnabledFor(logging.DEBUG):
+            ks_new_stats = ks_domain_cache_stats()
+            _logger.debug("Dashboard %s: %d items, domain cache %d hits / %d misses, %.2f ms compile time saved",
+                          ks_dashboard_id, len(item_list), ks_new_stats['hits'] - ks_stats['hits'],
+                          ks_new_stats['misses'] - ks_stats['misses'],
+                          (ks_new_stats['saved_time'] - ks_stats['saved_time']) * 1000)
         return items
 
+    @api.model
+    def ks_get_domain_cache_stats(self):
+        """Counters of the compiled item domain cache of this worker (hits, misses, compile time saved)."""
+        return ks_domain_cache_stats()
+
     # fetching Item info (Divided to make function inherit easily)
     def ks_fetch_item_data(self, rec, params={}):
         """
@@ -583,7 +678,7 @@ class KsDashboardNinjaBoard(models.Model):
             self = self.with_context(ksIsDefultCustomDateFilter=True)
 
         if ks_date_filter_selection not in ['l_custom', 'l_none']:
-            ks_date_data = ks_get_date(ks_date_filter_selection, self, 'datetime')
+            ks_date_data = ks_get_date_cached(ks_date_filter_selection, self, 'datetime')
             self = self.with_context(ksDateFilterStartDate=ks_date_data["selected_start_date"])
             self = self.with_context(ksDateFilterEndDate=ks_date_data["selected_end_date"])
 
@@ -1429,17 +1524,12 @@ class KsDashboardNinjaBoard(models.Model):
                     connect_symbol = '&'
 
                 if data.get(rec.ks_model_id.model) and rec.ks_domain:
-                    data[rec.ks_model_id.model]['domain'] = data[rec.ks_model_id.model]['domain'] + safe_eval(
-                        rec.ks_domain)
+                    data[rec.ks_model_id.model]['domain'] = data[rec.ks_model_id.model]['domain'] + ks_eval_domain(
+                        rec.ks_domain, self.env)
                     data[rec.ks_model_id.model]['domain'].insert(0, connect_symbol)
                 elif rec.ks_model_id.model:
-                    ks_domain = rec.ks_domain
-                    if ks_domain and "%UID" in ks_domain:
-                        ks_domain = ks_domain.replace('"%UID"', str(self.env.user.id))
-                    if ks_domain and "%MYCOMPANY" in ks_domain:
-                        ks_domain = ks_domain.replace('"%MYCOMPANY"', str(self.env.company.id))
                     data[rec.ks_model_id.model] = {
-                        'domain': safe_eval(ks_domain) if ks_domain else [],
+                        'domain': ks_eval_domain(rec.ks_domain, self.env),
                         'ks_domain_index_data': [],
                         'model_name': rec.ks_model_id.name,
                         'item_ids': self.env['ks_dashboard_ninja.item'].search(
@@ -1457,12 +1547,6 @@ class KsDashboardNinjaBoard(models.Model):
         for rec in pre_defined_filter_ids:
             if rec.display_type == 'line_section':
                 categ_seq = categ_seq + 1
-            ks_domain = rec.ks_domain
-            if ks_domain and "%UID" in ks_domain:
-                ks_domain = ks_domain.replace('"%UID"', str(self.env.user.id))
-            if ks_domain and "%MYCOMPANY" in ks_domain:
-                ks_domain = ks_domain.replace('"%MYCOMPANY"', str(self.env.company.id))
-
             data[rec['id']] = {
                 'id': rec.id,
                 'name': rec.name,
@@ -1471,7 +1555,7 @@ class KsDashboardNinjaBoard(models.Model):
                 'active': rec.ks_is_active,
                 'categ': rec.ks_model_id.model + '_' + str(categ_seq) if rec.display_type != 'line_section' else 0,
                 'type': 'filter' if rec.display_type != 'line_section' else 'separator',
-                'domain': safe_eval(ks_domain) if ks_domain else [],
+                'domain': ks_eval_domain(rec.ks_domain, self.env),
                 'sequence': rec.sequence
             }
         return data
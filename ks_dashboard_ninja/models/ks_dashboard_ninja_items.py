@@ -1,14 +1,8 @@
 # -*- coding: utf-8 -*-
 import dateutil
 import datetime as dt
-from datetime import timezone
 import pytz
 import json
-import xlrd
-import csv
-import os
-import tempfile
-import binascii
 import babel
 import ast
 from datetime import timedelta
@@ -20,11 +14,23 @@ from datetime import datetime
 from dateutil import relativedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
-from odoo.addons.ks_dashboard_ninja.common_lib.ks_date_filter_selections import ks_get_date, ks_convert_into_utc, \
-    ks_convert_into_local
+from odoo.addons.ks_dashboard_ninja.common_lib.ks_date_filter_selections import ks_convert_into_utc, ks_convert_into_local
+from odoo.addons.ks_dashboard_ninja.common_lib.ks_data_ingestion import ks_normalize_column_name, \
+    ks_file_extension, ks_prepare_dataframe, ks_bulk_load
+from odoo.addons.ks_dashboard_ninja.common_lib.ks_columnar_cache import ks_load_columnar, ks_detect_column_types, \
+    ks_columnar_gc
+from odoo.addons.ks_dashboard_ninja.common_lib.ks_domain_cache import ks_eval_domain, ks_get_date_cached
 from .ks_country_bounds import get_country_code
 import logging
+import time
+from odoo.tools.lru import LRU
 _logger = logging.getLogger("DS_NINJA")
+
+# Field types whose stored column can be compared directly for keyset pagination.
+KS_KEYSET_TTYPES = ('char', 'integer', 'float', 'monetary', 'date', 'datetime', 'boolean', 'selection')
+# Pager totals of list items, {(db, model, domain, uid, companies): (timestamp, count)}.
+KS_LIST_COUNT_CACHE = LRU(1024)
+KS_LIST_COUNT_TTL = 60
 # TODO : Check all imports if needed
 
 
@@ -688,6 +694,10 @@ class KsDashboardNinjaItems(models.Model):
     data_source = fields.Selection(
         [('odoo', 'Odoo'), ('excel', 'Excel'), ('csv', 'CSV')],
         string="Data Source",default='odoo')
+    ks_sync_key_column = fields.Char(string="Sync Key Column",
+                                     help="Column of the uploaded file that identifies a row. When set, Sync Data "
+                                          "updates the matching rows and inserts the new ones instead of reloading "
+                                          "the whole table.")
 
     ks_ai_analysis = fields.Char(string='AI Analysis')
 
@@ -835,37 +845,10 @@ class KsDashboardNinjaItems(models.Model):
     def read_csv(self):
         if self.ks_csv_field:
             if ' ' in self.filename or '_' in self.filename:
-                try:
-                    fp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-                    fp.write(binascii.a2b_base64(self.ks_csv_field))
-                    fp.seek(0)
-
-                    with open(fp.name, 'r', encoding='utf-8') as csvfile:
-                        csv_reader = csv.reader(csvfile)
-                        fields = []
-                        values = {}
-                        header_row = next(csv_reader)
-
-                        for row in header_row:
-                            fields.append(row)
-                            values[row] = None
-                            del_group_by_field = """delete from ks_dashboard_csv_new;"""
-                            self._cr.execute(del_group_by_field)
-                            self.env['ks.dashboard.csv.new'].search([])
-                            for rec in fields:
-                                self.env['ks.dashboard.csv.new'].create({
-                                    'name': rec,
-                                })
-
-                        for line in csv_reader:
-                            for i, field in enumerate(fields):
-                                values[field] = line[i]
-
-                            values = {}
-                            for field in fields:
-                                values[field] = None
-                except:
-                    raise ValidationError(_("Invalid file!"))
+                column_types = ks_detect_column_types(self.ks_csv_field, self.filename)
+                self._cr.execute("""delete from ks_dashboard_csv_new;""")
+                self.env['ks.dashboard.csv.new'].create([{'name': header, 'ttype': ttype}
+                                                         for header, ttype in column_types.items()])
             else:
                 raise ValidationError('Please add filename which contain Spaces and Underscore in there name only.')
         else:
@@ -881,40 +864,12 @@ class KsDashboardNinjaItems(models.Model):
     def _read_xls(self):
         if self.upload_excel:
             if ' ' in self.filename or '_' in self.filename:
-                try:
-                    fp = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-                    fp.write(binascii.a2b_base64(self.upload_excel))
-                    fp.seek(0)
-                    file_type = os.path.splitext(self.filename)
-                    if file_type[1] == ".xlsx":
-                        df = pd.read_excel(fp.name, engine='openpyxl')
-                    elif file_type[1] == ".xls":
-                        df = pd.read_excel(fp.name, engine='xlrd')
-                    else:
-                        raise ValueError("Unsupported file format. Only XLSX and XLS are supported.")
-                except Exception as e:
-                    raise ValidationError(_(e))
-
-                values = {}
-                fields = df.columns.tolist()
-                val = {}
-                del_group_by_field = """delete from ks_dashboard_new;"""
-                self._cr.execute(del_group_by_field)
-                self.env['ks.dashboard.new'].search([])
-                for rec in fields:
-                    self.env['ks.dashboard.new'].create({
-                        'name': str(rec),
-                    })
-                for row_no in range(df.shape[0]):
-                    line = list(df.iloc[row_no])
-                    value = 0
-                    for field in fields:
-                        while value < len(line):
-                            values.update({
-                                field: str(line[value]),
-                            })
-                            value += 1
-                            break
+                if ks_file_extension(self.filename) not in ('.xlsx', '.xls'):
+                    raise ValidationError(_("Unsupported file format. Only XLSX and XLS are supported."))
+                column_types = ks_detect_column_types(self.upload_excel, self.filename)
+                self._cr.execute("""delete from ks_dashboard_new;""")
+                self.env['ks.dashboard.new'].create([{'name': header, 'ttype': ttype}
+                                                     for header, ttype in column_types.items()])
             else:
                 raise ValidationError('Please add filename which contain Spaces and Underscore in there name only.')
         else:
@@ -927,276 +882,35 @@ class KsDashboardNinjaItems(models.Model):
 
             # Syncing the data from table to page
     def data_sync(self):
-        data = self.env['ks.dashboard.new'].search([])
-        for rec in data:
-            self.write({
-                'ks_group_by_lines': [(0, 0, {
-                    'name': rec.name
-                })]
-            })
+        self._ks_sync_column_lines(self.env['ks.dashboard.new'].search([]), 'ks_group_by_lines')
+        if self.ks_model_id and self.upload_excel:
+            self.insert_data_into_table(self.ks_model_id.model)
 
     def csv_data_sync(self):
-        data = self.env['ks.dashboard.csv.new'].search([])
-        for rec in data:
-            self.write({
-                'ks_csv_group_by_lines': [(0, 0, {
-                    'name': rec.name
-                })]
-            })
+        self._ks_sync_column_lines(self.env['ks.dashboard.csv.new'].search([]), 'ks_csv_group_by_lines')
+        if self.ks_model_id and self.ks_csv_field:
+            self.insert_data_into_csv_table(self.ks_model_id.model)
+
+    def _ks_sync_column_lines(self, columns, lines_field):
+        """Add a column data type line for every uploaded column that has none yet."""
+        existing = set(self[lines_field].mapped('name'))
+        new_lines = [(0, 0, {'name': rec.name, 'ttype': rec.ttype}) for rec in columns if rec.name not in existing]
+        if new_lines:
+            self.write({lines_field: new_lines})
 
         # Creating table in ir model and adding column in it.
     def create_table(self):
-        records = self.ks_group_by_lines
-        dict = []
-        if records:
-            for rec in records:
-                values = {}
-                if not rec.ttype:
-                    raise ValidationError('Please Enter the type under Column Data Type Tab')
-                values.update({
-                    'name': rec.name.lower().replace(' ', '_'),
-                    'type': rec.ttype
-                })
-                dict.append(values)
-        if '_' and '-' in self.filename:
-            split = self.filename.lower().split('_')
-            split_value = ''
-            for res in split:
-                split_value += res
-            final_split = split_value.split('-')
-        elif' ' in self.filename:
-            final_split = self.filename.lower().split(' ')
-        elif'_' in self.filename:
-            final_split = self.filename.lower().split('_')
-        else:
-            final_split = self.filename.lower().split('.')
-        tablemodel = 'x_'+final_split[0]+'_'+self.name_seq
-        tablename = final_split[0]+' '+self.name_seq
-        model_creation = self.env['ir.model'].create({
-            'name': tablename,
-            'model': tablemodel,
-            'order': 'x_name asc, id desc',  # valid order
-        })
-        for value in dict:
-            column_name = value.get('name')
-            column_type = value.get('type')
-            if '/' in column_name:
-                column_name = value.get('name').replace('/', '_')
-            if ' ' in column_name:
-                column_name = value.get('name').replace(' ', '_')
-            if '(' and ')' in column_name:
-                column_name = value.get('name').replace(')', '').replace('(', '')
-            if column_name == 'name':
-                column_name = column_name.replace('name', 'name1')
-            model_creation.write({
-                    'field_id': [(0, 0, {
-                        'name': 'x_'+column_name,
-                        'ttype': column_type,
-                        'field_description': column_name.replace('_', ' ')
-                    })]
-                })
-        self.env['ir.model.access'].sudo().create({
-            'name': model_creation.name + ' all_user',
-            'model_id': model_creation.id,
-            'perm_read': True,
-            'perm_write': False,
-            'perm_create': False,
-            'perm_unlink': False,
-        })
-        self.ks_model_id = model_creation.id
+        tablemodel = self._ks_create_source_model(self.ks_group_by_lines)
         self.insert_data_into_table(tablemodel)
 
-        # Inserting data into the ir model table.
-    def insert_data_into_table(self, tablemodel):
-        if self.upload_excel:
-            try:
-                fp = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-                fp.write(binascii.a2b_base64(self.upload_excel))
-                fp.seek(0)
-                file_type = os.path.splitext(self.filename)
-                if file_type[1] == ".xlsx":
-                    df = pd.read_excel(fp.name, engine='openpyxl')
-                elif file_type[1] == ".xls":
-                    df = pd.read_excel(fp.name, engine='xlrd')
-                else:
-                    raise ValueError("Unsupported file format. Only XLSX and XLS are supported.")
-            except Exception as e:
-                raise ValidationError("Invalid file")
-            df = df.astype(str)
-            values ={}
-            fields = df.columns.tolist()
-            user_timezone_str = self.env.context.get('tz', 'UTC')
-            for row_no in range(df.shape[0]):
-                    line = list(df.iloc[row_no])
-                    val = {}
-                    value = 0
-                    for field in fields:
-                        if '/' in field:
-                            field = field.replace('/', ' ')
-                        if ' ' in field:
-                            field = field.replace(' ', '_')
-                        if '(' and ')' in field:
-                            field = field.replace(')', '').replace('(', '')
-                        if field == 'Name':
-                            field = field.replace('Name', 'name1')
-                        if 'Date' in field or 'Deadline' in field:
-                            if line[value] != 'NaT' and line[value] !=False:
-                                if self.ks_group_by_lines[value].ttype == 'datetime':
-                                    user_datetime_str = line[value]
-                                    local_datetime = datetime.strptime(user_datetime_str, '%Y-%m-%d %H:%M:%S')
-                                    user_timezone = pytz.timezone(user_timezone_str)
-                                    localized_datetime = user_timezone.localize(local_datetime)
-                                    utc_datetime = localized_datetime.astimezone(pytz.utc)
-                                    formatted_utc_datetime = utc_datetime.strftime('%Y-%m-%d %H:%M:%S')
-                                    # final_date = pd.to_timedelta(float(line[value]), unit='D') + pd.to_datetime('1899-12-30')
-                                    while (value < len(line)):
-                                        values.update({
-                                            field: formatted_utc_datetime,
-                                        })
-                                        value = value + 1
-                                        break
-                                else:
-                                    while (value < len(line)):
-                                        values.update({
-                                            field: line[value],
-                                        })
-                                        value = value + 1
-                                        break
-                            else:
-                                while (value < len(line)):
-                                    values.update({
-                                        field: 'Null',
-                                    })
-                                    value = value + 1
-                                    break
-                        else:
-                            while (value < len(line)):
-                                if line[value] != 'nan' and  line[value] !=False:
-                                    if '.' in line[value]:
-                                        if ',' in line[value]:
-                                            if self.ks_group_by_lines[value].ttype == 'char':
-                                                split = line[value].split(',')
-                                                split_value = ''
-                                                for res in split:
-                                                    split_value += res
-                                                final_split = split_value.split('.')
-                                                final_split_value = ''
-                                                for final_res in final_split:
-                                                    final_split_value += final_res
-                                                values.update({
-                                                    field: final_split_value,
-                                                })
-                                            else:
-                                                split = line[value].split(',')
-                                                split_value = split[0] + split[1]
-                                                final_value = float(split_value)
-                                                values.update({
-                                                    field: final_value,
-                                                })
-                                        elif '@' in line[value]:
-                                            values.update({
-                                                field: line[value],
-                                            })
-                                        else:
-                                            # final_value = (line[value])
-                                            if self.ks_group_by_lines[value].ttype == 'integer' and line[value]!='nan':
-                                                try:
-                                                    values.update({
-                                                        field: int(float(line[value])),
-                                                    })
-                                                except:
-                                                    values.update({
-                                                        field: 0,
-                                                    })
-                                            elif self.ks_group_by_lines[value].ttype == 'float'and line[value]!='nan':
-                                                try:
-                                                    values.update({
-                                                        field: float(line[value]),
-                                                    })
-                                                except:
-                                                    values.update({
-                                                        field: 0.00,
-                                                    })
-                                            elif line[value] == 'nan':
-                                                values.update({
-                                                    field: 'Null',
-                                                })
-
-                                            else:
-                                                values.update({
-                                                    field: line[value],
-                                                })
-                                    elif "'" and '+' in line[value]:
-                                        split_value = line[value].split('+')
-                                        final_split = '+' + split_value[1]
-                                        values.update({
-                                            field: final_split,
-                                        })
-                                    elif "'" in line[value]:
-                                        split_value = line[value].split("'")
-                                        final_split_value = ''
-                                        for res in split_value:
-                                            final_split_value += res
-                                        values.update({
-                                            field: final_split_value,
-                                        })
-                                    elif "NaT" in line[value]:
-                                        values.update({
-                                            field:'Null',
-                                        })
-                                    elif  self.ks_group_by_lines[value].ttype == 'integer' and line[value]!='nan':
-                                        try:
-                                            values.update({
-                                                field: int(float(line[value])),
-                                            })
-                                        except:
-                                            values.update({
-                                                field: 0,
-                                            })
-                                    elif self.ks_group_by_lines[value].ttype == 'float' and line[value] != 'nan':
-                                        try:
-                                            values.update({
-                                                field: float(line[value]),
-                                            })
-                                        except:
-                                            values.update({
-                                                field: 0.00,
-                                            })
-                                    else:
-                                        values.update({
-                                            field: line[value],
-                                        })
-                                    value = value + 1
-                                    break
-                                else:
-                                    values.update({
-                                        field: 'Null',
-                                    })
-                                    value = value + 1
-                                    break
-                    final_values = []
-                    final_heading = []
-                    try:
-                        if values.keys():
-                            data_values = dict([('x_' + key.lower().replace(' ', '_'), values[key]) for key in values if
-                                                values[key] != 'Null'])
-                            self.env[tablemodel].sudo().create(data_values)
-                    except Exception as e:
-                        raise ValidationError("found error while Table creation {}".format(e))
-
     def csv_create_table(self):
-        records = self.ks_csv_group_by_lines
-        dict = []
-        if records:
-            for rec in records:
-                values = {}
-                if not rec.ttype:
-                    raise ValidationError('Please Enter the type under Column Data Type Tab')
-                values.update({
-                    'name': rec.name.lower().replace(' ', '_'),
-                    'type': rec.ttype
-                })
-                dict.append(values)
+        tablemodel = self._ks_create_source_model(self.ks_csv_group_by_lines)
+        self.insert_data_into_csv_table(tablemodel)
+
+    def _ks_create_source_model(self, records):
+        for rec in records:
+            if not rec.ttype:
+                raise ValidationError('Please Enter the type under Column Data Type Tab')
         if '_' and '-' in self.filename:
             split = self.filename.lower().split('_')
             split_value = ''
@@ -1211,29 +925,20 @@ class KsDashboardNinjaItems(models.Model):
             final_split = self.filename.lower().split('.')
         tablemodel = 'x_'+final_split[0]+'_'+self.name_seq
         tablename = final_split[0]+' '+self.name_seq
+        field_values = {}
+        for rec in records:
+            field_name = ks_normalize_column_name(rec.name)
+            field_values.setdefault(field_name, {
+                'name': field_name,
+                'ttype': rec.ttype,
+                'field_description': field_name[2:].replace('_', ' ')
+            })
         model_creation = self.env['ir.model'].create({
             'name': tablename,
             'model': tablemodel,
             'order': 'x_name asc, id desc',  # valid order
         })
-        for value in dict:
-            column_name = value.get('name')
-            column_type = value.get('type')
-            if '/' in column_name:
-                column_name = value.get('name').replace('/', '_')
-            if ' ' in column_name:
-                column_name = value.get('name').replace(' ', '_')
-            if '(' and ')' in column_name:
-                column_name = value.get('name').replace(')', '').replace('(', '')
-            if column_name == 'name':
-                column_name = column_name.replace('name', 'name1')
-            model_creation.write({
-                    'field_id': [(0, 0, {
-                        'name': 'x_'+column_name,
-                        'ttype': column_type,
-                        'field_description': column_name.replace('_', ' ')
-                    })]
-                })
+        model_creation.write({'field_id': [(0, 0, values) for values in field_values.values()]})
         self.env['ir.model.access'].sudo().create({
             'name': model_creation.name + ' all_user',
             'model_id': model_creation.id,
@@ -1243,169 +948,53 @@ class KsDashboardNinjaItems(models.Model):
             'perm_unlink': False,
         })
         self.ks_model_id = model_creation.id
-        self.insert_data_into_csv_table(tablemodel)
+        return tablemodel
+
+        # Inserting data into the ir model table.
+    def insert_data_into_table(self, tablemodel):
+        if self.upload_excel:
+            self._ks_ingest_file(tablemodel, self.upload_excel, self.ks_group_by_lines)
 
     def insert_data_into_csv_table(self, tablemodel):
         if self.ks_csv_field:
-            fp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-            fp.write(binascii.a2b_base64(self.ks_csv_field))
-            fp.seek(0)
-
-            with open(fp.name, 'r', encoding='utf-8') as csvfile:
-                csv_reader = csv.reader(csvfile)
-                fields = []
-                values = {}
-                field_values = {}
-                header_row = next(csv_reader)
-                user_timezone_str = self.env.context.get('tz', 'UTC')
-                for row in header_row:
-                    fields.append(row)
-                    field_values[row] = None
-                for line in csv_reader:
-                    value = 0
-                    for field in fields:
-                        if ' ' in field:
-                            field = field.replace(' ', '_')
-                        if '/' in field:
-                            field = field.replace('/', ' ')
-                        if '(' and ')' in field:
-                            field = field.replace(')', '').replace('(', '')
-                        if field == 'Name':
-                            field = field.replace('Name', 'name1')
-                        if 'Date' in field or 'Deadline' in field:
-                            if line[value]:
-                                if self.ks_csv_group_by_lines[value].ttype == 'datetime':
-                                    user_datetime_str = line[value]
-                                    local_datetime = datetime.strptime(user_datetime_str, '%Y-%m-%d %H:%M:%S')
-                                    user_timezone = pytz.timezone(user_timezone_str)
-                                    localized_datetime = user_timezone.localize(local_datetime)
-                                    utc_datetime = localized_datetime.astimezone(pytz.utc)
-                                    formatted_utc_datetime = utc_datetime.strftime('%Y-%m-%d %H:%M:%S')
-                                    final_date = line[value].split(' ')[0]
-                                    while (value < len(line)):
-                                        values.update({
-                                            field: formatted_utc_datetime,
-                                        })
-                                        value = value + 1
-                                        break
-                                else:
-                                    while (value < len(line)):
-                                        values.update({
-                                            field: line[value],
-                                        })
-                                        value = value + 1
-                                        break
-                            else:
-                                while (value < len(line)):
-                                    values.update({
-                                        field: 'Null',
-                                    })
-                                    value = value + 1
-                                    break
-                        else:
-                            while (value < len(line)):
-                                if line[value]:
-                                    if '$' in line[value]:
-                                        line[value] = line[value].replace('$', '')
-                                    if '-' in line[value]:
-                                        line[value] = line[value].replace('-', '')
-                                    if '(' and ')' in line[value]:
-                                        line[value] = line[value].replace(')', '').replace('(', '')
-                                    if '.' in line[value]:
-                                        if ',' in line[value]:
-                                            if self.ks_csv_group_by_lines[value].ttype == 'char':
-                                                split = line[value].split(',')
-                                                split_value = ''
-                                                for res in split:
-                                                    split_value += res
-                                                final_split = split_value.split('.')
-                                                final_split_value = ''
-                                                for final_res in final_split:
-                                                    final_split_value += final_res
-                                                values.update({
-                                                    field: final_split_value,
-                                                })
-                                            else:
-                                                split = line[value].split(',')
-                                                split_value = split[0] + split[1]
-                                                if self.ks_csv_group_by_lines[value].ttype == 'float':
-                                                    values.update({
-                                                        field: float(split_value),
-                                                    })
-                                                elif self.ks_csv_group_by_lines[value].ttype == 'integer':
-                                                    values.update({
-                                                        field: int(float(split_value)),
-                                                    })
-                                                else:
-                                                    values.update({
-                                                        field: split_value,
-                                                    })
-                                        elif '@' in line[value]:
-                                            values.update({
-                                                field: line[value],
-                                            })
-                                        else:
-                                            if self.ks_csv_group_by_lines[value].ttype == 'float':
-                                                values.update({
-                                                    field: float(line[value]),
-                                                })
-                                            elif self.ks_csv_group_by_lines[value].ttype == 'integer':
-                                                values.update({
-                                                    field: int(float(line[value])),
-                                                })
-                                            else:
-                                                values.update({
-                                                    field: line[value],
-                                                })
-                                    elif "'" and '+' in line[value]:
-                                        split_value = line[value].split('+')
-                                        final_split = '+' + split_value[1]
-                                        values.update({
-                                            field: final_split,
-                                        })
-                                    elif "'" in line[value]:
-                                        split_value = line[value].split("'")
-                                        final_split_value = ''
-                                        for res in split_value:
-                                            final_split_value += res
-                                        values.update({
-                                            field: final_split_value,
-                                        })
-                                    elif line[value] == '    ':
-                                        values.update({
-                                            field: 'Null',
-                                        })
-                                        value = value + 1
-                                        break
-                                    elif self.ks_csv_group_by_lines[value].ttype == 'float':
-                                        values.update({
-                                                    field: float(line[value]),
-                                        })
-                                    elif self.ks_csv_group_by_lines[value].ttype == 'integer':
-                                        values.update({
-                                            field: int(float(line[value])),
-                                        })
-                                    else:
-                                        values.update({
-                                            field: line[value],
-                                        })
-                                    value = value + 1
-                                    break
-                                else:
-                                    values.update({
-                                        field: 'Null',
-                                    })
-                                    value = value + 1
-                                    break
-                    final_values = []
-                    final_heading = []
-                    try:
-                        if values.keys():
-                            data_values = dict([('x_' + key.lower().replace(' ', '_'), values[key]) for key in values if
-                                                values[key] != 'Null'])
-                            self.env[tablemodel].sudo().create(data_values)
-                    except Exception as e:
-                        raise ValidationError("found error while Table creation error {}".format(e))
+            self._ks_ingest_file(tablemodel, self.ks_csv_field, self.ks_csv_group_by_lines)
+
+    @api.autovacuum
+    def _gc_ks_columnar_cache(self):
+        """Remove the columnar caches of files no longer uploaded on any item"""
+        self.flush_model(['upload_excel', 'ks_csv_field'])
+        self._cr.execute("""
+            SELECT encode(sha256(upload_excel), 'hex') FROM ks_dashboard_ninja_item WHERE upload_excel IS NOT NULL
+             UNION
+            SELECT encode(sha256(ks_csv_field), 'hex') FROM ks_dashboard_ninja_item WHERE ks_csv_field IS NOT NULL
+        """)
+        removed = ks_columnar_gc(self.env, {checksum for checksum, in self._cr.fetchall()})
+        if removed:
+            _logger.info("Removed %s unused spreadsheet columnar caches", removed)
+
+    def _ks_ingest_file(self, tablemodel, ks_binary, records):
+        """Read the uploaded file from its columnar cache, coerce it column by column and bulk load it.
+
+        When a sync key column is set, rows already present in the table are
+        updated and new ones inserted; otherwise the table is reloaded.
+        """
+        column_types = {ks_normalize_column_name(rec.name): rec.ttype for rec in records if rec.ttype}
+        model_fields = self.env[tablemodel]._fields
+        column_types = {name: ttype for name, ttype in column_types.items() if name in model_fields}
+        ks_timezone = self.env.context.get('tz') or self.env.user.tz or 'UTC'
+        headers = [rec.name for rec in records if ks_normalize_column_name(rec.name) in column_types]
+        df = ks_load_columnar(self.env, ks_binary, self.filename, columns=headers)
+        df = ks_prepare_dataframe(df, column_types, ks_timezone)
+
+        key_column = self.ks_sync_key_column and ks_normalize_column_name(self.ks_sync_key_column)
+        if key_column and key_column not in df.columns:
+            raise ValidationError(_("Sync key column %s is not part of the uploaded file.", self.ks_sync_key_column))
+        try:
+            if not key_column:
+                self._cr.execute(SQL("DELETE FROM %s", SQL.identifier(self.env[tablemodel]._table)))
+            ks_bulk_load(self.env, tablemodel, df, key_column=key_column)
+        except Exception as e:
+            raise ValidationError("found error while Table creation {}".format(e))
 
     def check_target(self):
         base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
@@ -1440,7 +1029,13 @@ class KsDashboardNinjaItems(models.Model):
     def write(self, vals):
         if vals.get('ks_standard_goal_value') or vals.get('ks_record_count_type'):
             self.ks_stop_mail_cron = False
-        return super(KsDashboardNinjaItems, self).write(vals)
+        ks_live_changed = {'ks_model_id', 'ks_model_id_2', 'ks_dashboard_ninja_board_id'} & set(vals) and any(
+            self.mapped('ks_dashboard_ninja_board_id.ks_live_update'))
+        res = super(KsDashboardNinjaItems, self).write(vals)
+        if ks_live_changed or ('ks_dashboard_ninja_board_id' in vals and any(
+                self.mapped('ks_dashboard_ninja_board_id.ks_live_update'))):
+            self.env['ks_dashboard_ninja.board']._ks_bump_live_version()
+        return res
 
 
     @api.onchange('ks_year_period', 'ks_year_period_2')
@@ -1723,8 +1318,11 @@ class KsDashboardNinjaItems(models.Model):
                 values[i]['ks_many2many_field_ordering'] = json.dumps(ks_many2many_field_ordering)
         seq = self.env['ir.sequence'].next_by_code('ks_dashboard_ninja.item') or 'New'
         values[0]['name_seq'] = seq
-        return super(KsDashboardNinjaItems, self).create(
+        records = super(KsDashboardNinjaItems, self).create(
             values)
+        if records.ks_dashboard_ninja_board_id.filtered('ks_live_update'):
+            self.env['ks_dashboard_ninja.board']._ks_bump_live_version()
+        return records
 
     @api.onchange('ks_list_view_fields')
     def ks_list_view_fields_onchange(self):
@@ -1945,7 +1543,11 @@ class KsDashboardNinjaItems(models.Model):
         channel = self.env['discuss.channel'].search([('ks_dashboard_item_id', 'in', self.ids)])
         if channel:
             channel.unlink()
-        return super(KsDashboardNinjaItems, self).unlink()
+        ks_live_update = any(self.mapped('ks_dashboard_ninja_board_id.ks_live_update'))
+        res = super(KsDashboardNinjaItems, self).unlink()
+        if ks_live_update:
+            self.env['ks_dashboard_ninja.board']._ks_bump_live_version()
+        return res
 
     def _ksGetRecordCount(self, domain=[]):
         rec = self
@@ -1998,12 +1600,6 @@ class KsDashboardNinjaItems(models.Model):
         return data
 
     def ks_convert_into_proper_domain(self, ks_domain, rec, domain=[]):
-        if ks_domain and "%UID" in ks_domain:
-            ks_domain = ks_domain.replace('"%UID"', str(self.env.user.id))
-
-        if ks_domain and "%MYCOMPANY" in ks_domain:
-            ks_domain = ks_domain.replace('"%MYCOMPANY"', str(self.env.company.id))
-
         ks_date_domain = False
         if rec.ks_date_filter_field:
             if not rec.ks_date_filter_selection or rec.ks_date_filter_selection == "l_none":
@@ -2020,7 +1616,7 @@ class KsDashboardNinjaItems(models.Model):
 
                 if self._context.get('ksDateFilterSelection', False) and self._context['ksDateFilterSelection'] not in [
                     'l_none', 'l_custom']:
-                    ks_date_data = ks_get_date(self._context.get('ksDateFilterSelection'), self,
+                    ks_date_data = ks_get_date_cached(self._context.get('ksDateFilterSelection'), self,
                                                rec.ks_date_filter_field.ttype)
                     selected_start_date = ks_date_data["selected_start_date"]
                     selected_end_date = ks_date_data["selected_end_date"]
@@ -2043,7 +1639,7 @@ class KsDashboardNinjaItems(models.Model):
 
             else:
                 if rec.ks_date_filter_selection and rec.ks_date_filter_selection != 'l_custom':
-                    ks_date_data = ks_get_date(rec.ks_date_filter_selection, self, rec.ks_date_filter_field.ttype)
+                    ks_date_data = ks_get_date_cached(rec.ks_date_filter_selection, self, rec.ks_date_filter_field.ttype)
                     selected_start_date = ks_date_data["selected_start_date"]
                     selected_end_date = ks_date_data["selected_end_date"]
                 else:
@@ -2109,7 +1705,7 @@ class KsDashboardNinjaItems(models.Model):
         else:
             ks_date_domain = []
 
-        proper_domain = safe_eval(ks_domain) if ks_domain else []
+        proper_domain = ks_eval_domain(ks_domain, self.env)
         if ks_date_domain:
             proper_domain.extend(ks_date_domain)
         if rec.ks_domain_extension:
@@ -2121,18 +1717,7 @@ class KsDashboardNinjaItems(models.Model):
         return proper_domain
 
     def ks_convert_domain_extension(self, ks_extensiom_domain, rec):
-        if ks_extensiom_domain and "%UID" in ks_extensiom_domain:
-            ks_extensiom_domain = ks_extensiom_domain.replace('"%UID"', str(self.env.user.id))
-            if "%UID" in ks_extensiom_domain:
-                ks_extensiom_domain = ks_extensiom_domain.replace("'%UID'", str(self.env.user.id))
-
-        if ks_extensiom_domain and "%MYCOMPANY" in ks_extensiom_domain:
-            ks_extensiom_domain = ks_extensiom_domain.replace('"%MYCOMPANY"', str(self.env.company.id))
-            if "%MYCOMPANY" in ks_extensiom_domain:
-                ks_extensiom_domain = ks_extensiom_domain.replace("'%MYCOMPANY'", str(self.env.company.id))
-
-        ks_domain = safe_eval(ks_extensiom_domain)
-        return ks_domain
+        return ks_eval_domain(ks_extensiom_domain, self.env)
 
     @api.onchange('ks_domain_extension')
     def ks_onchange_domain_extension(self):
@@ -2419,7 +2004,7 @@ class KsDashboardNinjaItems(models.Model):
                                 selected_start_date = rec.ks_item_start_date
                                 selected_end_date = rec.ks_item_end_date
                             else:
-                                ks_date_data = ks_get_date(rec.ks_date_filter_selection, self,
+                                ks_date_data = ks_get_date_cached(rec.ks_date_filter_selection, self,
                                                            rec.ks_date_filter_field.ttype)
                                 selected_start_date = ks_date_data["selected_start_date"]
                                 selected_end_date = ks_date_data["selected_end_date"]
@@ -2944,15 +2529,15 @@ class KsDashboardNinjaItems(models.Model):
         if ks_export_all:
             limit = ks_limit
             offset = 0
-        self.ks_sort_by_field = orderid
-        self.ks_sort_by_order = sort_order
-        orderby = self.ks_sort_by_field.name if self.ks_sort_by_field else False
-        if orderby and self.ks_sort_by_order:
-            orderby = orderby + " " + self.ks_sort_by_order
+        sort_field = self.env['ir.model.fields'].browse(orderid) if orderid else self.env['ir.model.fields']
+        orderby = sort_field.name if sort_field else False
+        if orderby and sort_order:
+            orderby = orderby + " " + sort_order
         if self.ks_list_view_type == "ungrouped":
             if self.ks_list_view_fields:
                 ks_list_view_data = self.ks_fetch_list_view_data(self, ks_chart_domain, offset=ksoffset,
-                                                                 initial_count=initial_count)
+                                                                 initial_count=initial_count,
+                                                                 ks_sort_field=sort_field, ks_sort_order=sort_order)
         elif self.ks_list_view_type == "grouped" and self.ks_list_view_group_fields \
                 and self.ks_chart_relation_groupby:
             ks_list_fields = []
@@ -3335,15 +2920,20 @@ class KsDashboardNinjaItems(models.Model):
         return ks_list_view_data
 
     @api.model
-    def ks_fetch_list_view_data(self, rec, ks_chart_domain, limit=15, offset=0, ks_export_all=False, initial_count=0):
+    def ks_fetch_list_view_data(self, rec, ks_chart_domain, limit=15, offset=0, ks_export_all=False, initial_count=0,
+                                ks_sort_field=False, ks_sort_order=False, ks_cursor=False, ks_direction='next'):
         ks_list_view_data = {'label': [], 'fields': [], 'fields_type': [],
                              'store': [], 'type': 'ungrouped',
                              'data_rows': [], 'model': self.ks_model_name}
 
         # ks_chart_domain = self.ks_convert_into_proper_domain(self.ks_domain, self)
-        orderby = self.ks_sort_by_field.name if self.ks_sort_by_field else False
-        if orderby and self.ks_sort_by_order:
-            orderby = orderby + " " + self.ks_sort_by_order
+        if not ks_sort_field:
+            ks_sort_field = self.ks_sort_by_field
+            ks_sort_order = self.ks_sort_by_order
+        ks_sort_order = (ks_sort_order or 'ASC').upper()
+        orderby = False
+        if ks_sort_field:
+            orderby = "%s %s, id %s" % (ks_sort_field.name, ks_sort_order, ks_sort_order)
 
         ks_limit = self.ks_record_data_limit if self.ks_record_data_limit and self.ks_record_data_limit > 0 else False
         limit = self.ks_pagination_limit
@@ -3356,6 +2946,7 @@ class KsDashboardNinjaItems(models.Model):
         if ks_export_all:
             limit = ks_limit
             offset = 0
+            ks_cursor = False
         if self.ks_list_view_fields:
             ks_list_view_data['list_view_type'] = 'other'
             ks_list_view_data['groupby'] = False
@@ -3377,13 +2968,42 @@ class KsDashboardNinjaItems(models.Model):
 
             ks_list_view_fields = [res.name for res in self.ks_list_view_fields]
             ks_list_view_field_type = [res.ttype for res in self.ks_list_view_fields]
+        ks_keyset_domain = self._ks_list_keyset_domain(ks_sort_field, ks_sort_order, ks_cursor, ks_direction)
+        ks_reverse = False
+        if ks_keyset_domain:
+            ks_chart_domain = list(ks_chart_domain) + ks_keyset_domain
+            offset = 0
+            if ks_direction != 'next':
+                ks_reverse = True
+                reverse_order = 'DESC' if ks_sort_order == 'ASC' else 'ASC'
+                orderby = "%s %s, id %s" % (ks_sort_field.name, reverse_order, reverse_order)
         try:
+            ks_read_fields = list(ks_list_view_fields)
+            if ks_sort_field and ks_sort_field.name not in ks_read_fields:
+                ks_read_fields.append(ks_sort_field.name)
             ks_list_view_records = self.env[self.ks_model_name].search_read(ks_chart_domain,
-                                                                            ks_list_view_fields,
+                                                                            ks_read_fields,
                                                                             order=orderby, limit=limit, offset=offset)
         except Exception as e:
             ks_list_view_data = False
             return ks_list_view_data
+        if ks_reverse:
+            ks_list_view_records.reverse()
+        if ks_sort_field and ks_sort_field.ttype in KS_KEYSET_TTYPES and ks_list_view_records:
+            ks_list_view_data['ks_cursor'] = {
+                'first': self._ks_list_cursor_key(ks_list_view_records[0], ks_sort_field),
+                'last': self._ks_list_cursor_key(ks_list_view_records[-1], ks_sort_field),
+            }
+
+        ks_selection_fields = [field_rec for field_rec, ttype in zip(ks_list_view_fields, ks_list_view_field_type)
+                               if ttype == "selection"]
+        ks_selection_labels = {}
+        if ks_selection_fields:
+            ks_selection_labels = {
+                field_rec: dict(description.get('selection') or [])
+                for field_rec, description in self.env[rec.ks_model_name].fields_get(
+                    allfields=ks_selection_fields, attributes=['selection']).items()
+            }
         for res in ks_list_view_records:
             counter = 0
             data_row = {'id': res['id'], 'data': [], 'ks_column_type': []}
@@ -3394,8 +3014,7 @@ class KsDashboardNinjaItems(models.Model):
                     if res[field_rec]:
                         res[field_rec] = res[field_rec][1]
                 elif ks_list_view_field_type[counter] == "selection" and res.get(field_rec, False):
-                    res[field_rec] = dict(self.env[rec.ks_model_name].fields_get(allfields=[field_rec])
-                                          [field_rec]['selection'])[res[field_rec]]
+                    res[field_rec] = ks_selection_labels.get(field_rec, {}).get(res[field_rec], res[field_rec])
                 data_row['data'].append(res[field_rec])
                 data_row['ks_column_type'].append(ks_list_view_field_type[counter])
                 counter += 1
@@ -3403,6 +3022,56 @@ class KsDashboardNinjaItems(models.Model):
 
         return ks_list_view_data
 
+    def _ks_list_cursor_key(self, record_values, sort_field):
+        value = record_values[sort_field.name]
+        if sort_field.ttype == 'datetime' and value:
+            value = fields.Datetime.to_string(value)
+        elif sort_field.ttype == 'date' and value:
+            value = fields.Date.to_string(value)
+        return [value, record_values['id']]
+
+    def _ks_list_keyset_domain(self, sort_field, sort_order, ks_cursor, ks_direction):
+        """Domain selecting the rows after (or before) the cursor row in (sort field, id) order.
+
+        Returns False when the page has to be fetched by offset instead: no cursor,
+        a sort field that cannot be compared in SQL, or a cursor row without value.
+        """
+        if not ks_cursor or not sort_field or not sort_field.store or sort_field.ttype not in KS_KEYSET_TTYPES:
+            return False
+        value, record_id = ks_cursor.get('last' if ks_direction == 'next' else 'first') or (False, False)
+        if value is None or value is False or not record_id:
+            return False
+        # Walking towards greater values; NULLs sort greatest in PostgreSQL in both directions.
+        ascending = (ks_direction == 'next') == (sort_order == 'ASC')
+        operator = '>' if ascending else '<'
+        name = sort_field.name
+        domain = ['|', (name, operator, value), '&', (name, '=', value), ('id', operator, record_id)]
+        if ascending and sort_field.ttype != 'boolean':
+            # the NULL tail only: on strings "= False" also matches '', which sorts first
+            # and would come back on every page
+            if sort_field.ttype in ('char', 'selection'):
+                domain = ['|'] + domain + ['&', (name, '=', False), (name, '!=', '')]
+            else:
+                domain = ['|'] + domain + [(name, '=', False)]
+        return domain
+
+    def _ks_list_record_count(self, ks_chart_domain):
+        """Total rows of a list item for the pager, cached for a minute per user and companies."""
+        key = (self.env.cr.dbname, self.ks_model_name, repr(ks_chart_domain), self.env.uid,
+               tuple(self.env.companies.ids))
+        cached = KS_LIST_COUNT_CACHE.get(key)
+        if cached and time.monotonic() - cached[0] < KS_LIST_COUNT_TTL:
+            count = cached[1]
+        else:
+            try:
+                count = self.env[self.ks_model_name].search_count(ks_chart_domain)
+            except Exception:
+                count = 0
+            KS_LIST_COUNT_CACHE[key] = (time.monotonic(), count)
+        if self.ks_record_data_limit and self.ks_record_data_limit > 0:
+            count = min(count, self.ks_record_data_limit)
+        return count
+
     @api.onchange('ks_dashboard_item_type')
     def set_color_palette(self):
         for rec in self:
@@ -3431,7 +3100,7 @@ class KsDashboardNinjaItems(models.Model):
             if (not rec.ks_date_filter_selection) or rec.ks_date_filter_selection == "l_none":
                 rec.ks_item_start_date = rec.ks_item_end_date = False
             elif rec.ks_date_filter_selection != 'l_custom':
-                ks_date_data = ks_get_date(rec.ks_date_filter_selection, self, rec.ks_date_filter_field.ttype)
+                ks_date_data = ks_get_date_cached(rec.ks_date_filter_selection, self, rec.ks_date_filter_field.ttype)
                 rec.ks_item_start_date = ks_date_data["selected_start_date"]
                 rec.ks_item_end_date = ks_date_data["selected_end_date"]
 
@@ -3491,7 +3160,7 @@ class KsDashboardNinjaItems(models.Model):
             date_filter_selection = rec.ks_date_filter_selection
             ks_previous_period = switcher.get(date_filter_selection, False)
         if ks_previous_period:
-            ks_date_data = ks_get_date(ks_previous_period, self, rec.ks_date_filter_field.ttype)
+            ks_date_data = ks_get_date_cached(ks_previous_period, self, rec.ks_date_filter_field.ttype)
 
         if (ks_date_data):
             previous_period_start_date = ks_date_data["selected_start_date"]
@@ -3526,11 +3195,9 @@ class KsDashboardNinjaItems(models.Model):
             return False
 
     def ks_get_previous_period_domain(self, ks_domain, ks_start_date, ks_end_date, date_filter_field):
-        if ks_domain and "%UID" in ks_domain:
-            ks_domain = ks_domain.replace('"%UID"', str(self.env.user.id))
         if ks_domain:
             # try:
-            proper_domain = safe_eval(ks_domain)
+            proper_domain = ks_eval_domain(ks_domain, self.env)
             if ks_start_date and ks_end_date and date_filter_field:
                 proper_domain.extend([(date_filter_field.name, ">=", ks_start_date),
                                       (date_filter_field.name, "<=", ks_end_date)])
@@ -3628,16 +3295,11 @@ class KsDashboardNinjaItems(models.Model):
             if (not rec.ks_date_filter_selection_2) or rec.ks_date_filter_selection_2 == "l_none":
                 rec.ks_item_start_date_2 = rec.ks_item_end_date = False
             elif rec.ks_date_filter_selection_2 != 'l_custom':
-                ks_date_data = ks_get_date(rec.ks_date_filter_selection_2, self, rec.ks_date_filter_field_2.ttype)
+                ks_date_data = ks_get_date_cached(rec.ks_date_filter_selection_2, self, rec.ks_date_filter_field_2.ttype)
                 rec.ks_item_start_date_2 = ks_date_data["selected_start_date"]
                 rec.ks_item_end_date_2 = ks_date_data["selected_end_date"]
 
     def ks_convert_into_proper_domain_2(self, ks_domain_2, rec, domain=[]):
-        if ks_domain_2 and "%UID" in ks_domain_2:
-            ks_domain_2 = ks_domain_2.replace('"%UID"', str(self.env.user.id))
-        if ks_domain_2 and "%MYCOMPANY" in ks_domain_2:
-            ks_domain_2 = ks_domain_2.replace('"%MYCOMPANY"', str(self.env.company.id))
-
         ks_date_domain = False
 
         if rec.ks_date_filter_field_2:
@@ -3654,7 +3316,7 @@ class KsDashboardNinjaItems(models.Model):
                     selected_end_date = ks_convert_into_local(selected_end_date, ks_timezone)
                 if self._context.get('ksDateFilterSelection', False) and self._context['ksDateFilterSelection'] not in [
                     'l_none', 'l_custom']:
-                    ks_date_data = ks_get_date(self._context.get('ksDateFilterSelection'), self,
+                    ks_date_data = ks_get_date_cached(self._context.get('ksDateFilterSelection'), self,
                                                rec.ks_date_filter_field_2.ttype)
                     selected_start_date = ks_date_data["selected_start_date"]
                     selected_end_date = ks_date_data["selected_end_date"]
@@ -3676,7 +3338,7 @@ class KsDashboardNinjaItems(models.Model):
                              selected_end_date.strftime(DEFAULT_SERVER_DATETIME_FORMAT))]
             else:
                 if rec.ks_date_filter_selection_2 and rec.ks_date_filter_selection_2 != 'l_custom':
-                    ks_date_data = ks_get_date(rec.ks_date_filter_selection_2, self, rec.ks_date_filter_field_2.ttype)
+                    ks_date_data = ks_get_date_cached(rec.ks_date_filter_selection_2, self, rec.ks_date_filter_field_2.ttype)
                     selected_start_date = ks_date_data["selected_start_date"]
                     selected_end_date = ks_date_data["selected_end_date"]
                 else:
@@ -3747,7 +3409,7 @@ class KsDashboardNinjaItems(models.Model):
         else:
             ks_date_domain = []
 
-        proper_domain = safe_eval(ks_domain_2) if ks_domain_2 else []
+        proper_domain = ks_eval_domain(ks_domain_2, self.env)
         if ks_date_domain:
             proper_domain.extend(ks_date_domain)
         if rec.ks_domain_extension_2:
@@ -4233,13 +3895,16 @@ class KsDashboardNinjaItems(models.Model):
             ks_list_view_data = self.get_list_view_record(orderby, sort_order, ks_list_domain, ksoffset=int(ks_offset))
 
         else:
-            ks_list_view_data = self.ks_fetch_list_view_data(record, ks_list_domain, offset=int(ks_offset))
+            ks_list_view_data = self.ks_fetch_list_view_data(record, ks_list_domain, offset=int(ks_offset),
+                                                             ks_cursor=offset.get('ks_cursor'),
+                                                             ks_direction=offset.get('ks_direction', 'next'))
 
         return {
             'ks_list_view_data': json.dumps(ks_list_view_data),
             'offset': int(ks_offset) + 1,
             'next_offset': int(ks_offset) + len(ks_list_view_data['data_rows']),
             'limit': record.ks_record_data_limit if record.ks_record_data_limit else 0,
+            'ks_record_count': record._ks_list_record_count(ks_list_domain),
         }
 
     @api.model
@@ -0,0 +1,32 @@
+from odoo import models, api
+
+
+class KsLiveUpdateBase(models.AbstractModel):
+    _inherit = 'base'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(KsLiveUpdateBase, self).create(vals_list)
+        records._ks_notify_live_dashboards()
+        return records
+
+    def write(self, vals):
+        res = super(KsLiveUpdateBase, self).write(vals)
+        self._ks_notify_live_dashboards()
+        return res
+
+    def unlink(self):
+        self._ks_notify_live_dashboards()
+        return super(KsLiveUpdateBase, self).unlink()
+
+    def _ks_notify_live_dashboards(self):
+        """Remember that this model changed; live dashboards are notified once, when the transaction commits."""
+        if not self or not self.pool.ready or 'ks_dashboard_ninja.board' not in self.env:
+            return
+        ks_board = self.env['ks_dashboard_ninja.board']
+        if self._name not in ks_board._ks_live_item_map():
+            return
+        ks_models = self.env.cr.precommit.data.setdefault('ks_dashboard_ninja.live_models', set())
+        if not ks_models:
+            self.env.cr.precommit.add(ks_board.sudo()._ks_push_live_updates)
+        ks_models.add(self._name)
@@ -58,7 +58,7 @@ export class Ksdashboardgraph extends Component{
 
         })
         useEffect(()=>{
-            if (update_interval && !this.env.inDialog){
+            if (update_interval && !this.env.inDialog && !this.props.dashboard_data.ks_live_update){
                 const interval = setInterval(() => {
                     this.ksFetchUpdateItem(this.item.id, this.ks_dashboard_id, this.props.dashboard_data.context);
                 }, update_interval);
@@ -66,6 +66,11 @@ export class Ksdashboardgraph extends Component{
             }
 
         })
+        useBus(this.env.bus, "KS:ITEMS_CHANGED", (ev) => {
+            if (!this.env.inDialog && ev.detail.item_ids.includes(this.item.id)){
+                this.ksFetchUpdateItem(this.item.id, this.ks_dashboard_id, this.props.dashboard_data.context);
+            }
+        });
 
         onWillUnmount( () => {
             this.aiAudioRef.el?.removeEventListener('ended', onAudioEnded)
@@ -2477,6 +2482,8 @@ export class Ksdashboardgraph extends Component{
                 args: [parseInt(itemId), {
                     ks_intial_count: ks_intial_count,
                     offset: ks_offset,
+                    ks_cursor: self.ksGetListCursor(),
+                    ks_direction: 'next',
                     }, parseInt(self.ks_dashboard_data.ks_dashboard_id), params],
                 kwargs:{context:context}
             }).then(function(result) {
@@ -2498,8 +2505,9 @@ export class Ksdashboardgraph extends Component{
                 var loadPreviousButton = e.target.parentElement.querySelector('.ks_load_previous');
                 loadPreviousButton.classList.remove('ks_event_offer_list');
 
+                var record_count = result.ks_record_count !== undefined ? result.ks_record_count : item_data.ks_record_count;
                 if (result.next_offset < parseInt(result.offset) + (offset - 1) ||
-                    result.next_offset == item_data.ks_record_count ||
+                    result.next_offset == record_count ||
                     result.next_offset === result.limit) {
 
                     e.target.classList.add('ks_event_offer_list');
@@ -2507,6 +2515,15 @@ export class Ksdashboardgraph extends Component{
             });
         }
 
+        ksGetListCursor() {
+            // Keyset cursor (first/last row of the displayed page) of ungrouped list items.
+            var list_view_data = this.item.ks_list_view_data;
+            if (typeof(list_view_data) == 'string'){
+                list_view_data = JSON.parse(list_view_data);
+            }
+            return (list_view_data && list_view_data.ks_cursor) || false;
+        }
+
         getDomainParams(ev){
             this.domainParams = ev.detail;
         }
@@ -2533,6 +2550,8 @@ export class Ksdashboardgraph extends Component{
                 args: [parseInt(itemId), {
                     ks_intial_count: ks_intial_count,
                     offset: ks_offset,
+                    ks_cursor: self.ksGetListCursor(),
+                    ks_direction: 'previous',
                     }, parseInt(self.ks_dashboard_data.ks_dashboard_id), params],
                 kwargs:{context:context}
             }).then(function(result) {
@@ -3,7 +3,7 @@ import { Component,useState ,onWillUpdateProps,useEffect,onMounted,useRef, onWil
 import {globalfunction } from '@ks_dashboard_ninja/js/ks_global_functions';
 import { formatFloat } from "@web/core/utils/numbers";
 import { formatInteger } from "@web/views/fields/formatters";
-import { useService } from "@web/core/utils/hooks";
+import { useService, useBus } from "@web/core/utils/hooks";
 import { rpc } from "@web/core/network/rpc";
 import { onAudioEnded } from '@ks_dashboard_ninja/js/ks_global_functions';
 import { _t } from "@web/core/l10n/translation";
@@ -54,13 +54,18 @@ export class Ksdashboardkpiview extends Component{
         })
 
         useEffect(()=>{
-            if (update_interval && !this.env.inDialog){
+            if (update_interval && !this.env.inDialog && !this.props.dashboard_data.ks_live_update){
                 const interval = setInterval(() => {
                     this.ksFetchUpdateItem(this.item.id, this.props.dashboard_data.context);
                 }, update_interval);
                 return () => clearInterval(interval);
             }
         })
+        useBus(this.env.bus, "KS:ITEMS_CHANGED", (ev) => {
+            if (!this.env.inDialog && ev.detail.item_ids.includes(this.item.id)){
+                this.ksFetchUpdateItem(this.item.id, this.props.dashboard_data.context);
+            }
+        });
 
         onWillUnmount( () => {
             this.aiAudioRef.el?.removeEventListener('ended', onAudioEnded)
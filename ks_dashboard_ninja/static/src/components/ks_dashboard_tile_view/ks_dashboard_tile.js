@@ -2,7 +2,7 @@
 import { Component, useState ,useEffect,onWillUpdateProps,useRef, onMounted, onWillUnmount} from "@odoo/owl";
 import {globalfunction } from '@ks_dashboard_ninja/js/ks_global_functions';
 import { loadBundle } from "@web/core/assets";
-import { useService } from "@web/core/utils/hooks";
+import { useService, useBus } from "@web/core/utils/hooks";
 import { _t } from "@web/core/l10n/translation";
 import { onAudioEnded } from '@ks_dashboard_ninja/js/ks_global_functions';
 import { rpc } from "@web/core/network/rpc";
@@ -55,13 +55,18 @@ export class Ksdashboardtile extends Component{
 
         })
         useEffect(()=>{
-            if (update_interval && !this.env.inDialog){
+            if (update_interval && !this.env.inDialog && !this.props.dashboard_data.ks_live_update){
                 const interval = setInterval(() => {
                     this.ksFetchUpdateItem(this.item.id, this.props.dashboard_data.context);
                 }, update_interval);
                 return () => clearInterval(interval);
             }
         })
+        useBus(this.env.bus, "KS:ITEMS_CHANGED", (ev) => {
+            if (!this.env.inDialog && ev.detail.item_ids.includes(this.item.id)){
+                this.ksFetchUpdateItem(this.item.id, this.props.dashboard_data.context);
+            }
+        });
         onMounted(()=>{
             if (this.ks_ai_analysis){
                 const dashboardItems = this.ks_tile.el.querySelectorAll('.ks_dashboarditem_id');
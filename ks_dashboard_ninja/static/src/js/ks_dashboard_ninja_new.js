@@ -297,6 +297,45 @@ export class KsDashboardNinja extends Component {
         })
 
         useBus(this.env.bus, "GET:ParamsForItemFetch", (ev) => this.ksGetParamsForItemFetch(ev.detail));
+
+        this.busService = this.env.services.bus_service;
+        onMounted(() => this.ksStartLiveUpdates());
+        onWillUnmount(() => this.ksStopLiveUpdates());
+    }
+
+    ksStartLiveUpdates(){
+        if (!this.ks_dashboard_data.ks_live_update || this.on_dialog || !this.busService){
+            return;
+        }
+        // Changes pushed by the server are gathered for a second so a burst of writes refreshes each item once.
+        this.ks_live_channel = `ks_dashboard_ninja.board_${this.ks_dashboard_id}`;
+        this.ks_live_item_ids = new Set();
+        this.ksOnItemsChanged = (payload) => {
+            if (payload.dashboard_id != this.ks_dashboard_id){
+                return;
+            }
+            payload.item_ids.forEach((item_id) => this.ks_live_item_ids.add(item_id));
+            if (!this.ks_live_timeout){
+                this.ks_live_timeout = setTimeout(() => {
+                    const item_ids = [...this.ks_live_item_ids];
+                    this.ks_live_item_ids.clear();
+                    this.ks_live_timeout = false;
+                    this.env.bus.trigger("KS:ITEMS_CHANGED", {item_ids: item_ids});
+                }, 1000);
+            }
+        };
+        this.busService.addChannel(this.ks_live_channel);
+        this.busService.subscribe("ks_dashboard_ninja/items_changed", this.ksOnItemsChanged);
+    }
+
+    ksStopLiveUpdates(){
+        if (!this.ks_live_channel){
+            return;
+        }
+        clearTimeout(this.ks_live_timeout);
+        this.busService.unsubscribe("ks_dashboard_ninja/items_changed", this.ksOnItemsChanged);
+        this.busService.deleteChannel(this.ks_live_channel);
+        this.ks_live_channel = false;
     }
 
     willStart(){
@@ -3,7 +3,8 @@
 import logging
 from odoo import http
 from odoo.http import request
-import base64
+
+from ..models.referral_qr_image import IMAGE_MIMETYPES, MIN_BOX_SIZE, MAX_BOX_SIZE
 
 _logger = logging.getLogger(__name__)
 
@@ -27,7 +28,8 @@ class ReferralTrackingController(http.Controller):
             user_agent = request.httprequest.headers.get('User-Agent', '')
             
             # Track the click - use sudo() to avoid write_uid issues
-            click = request.env['referral.link.click'].sudo().track_click(
+            # Fraud checks run in track_click, the click is written by a cron
+            request.env['referral.link.click'].sudo().track_click(
                 referral_code=referral_code,
                 ip_address=ip_address,
                 user_agent=user_agent,
@@ -38,13 +40,6 @@ class ReferralTrackingController(http.Controller):
                 referrer_url=referrer_url
             )
             
-            # Run fraud detection checks
-            if click:
-                fraud_detection = request.env['referral.fraud.detection'].sudo()
-                fraud_detection.check_duplicate_ip(referral_code, ip_address)
-                fraud_detection.check_duplicate_device(referral_code, click.device_fingerprint)
-                fraud_detection.check_velocity(referral_code, ip_address, click.device_fingerprint)
-            
             # Redirect to signup with referral code
             signup_url = f"/web/signup?ref={referral_code}"
             
@@ -91,16 +86,12 @@ class ReferralTrackingController(http.Controller):
             }
 
     @http.route('/ref/qrcode/<string:referral_code>', type='http', auth='public')
-    def generate_qrcode(self, referral_code, **kwargs):
-        """Generate QR code for referral link"""
+    def generate_qrcode(self, referral_code, size=10, **kwargs):
+        """QR code for referral link, served from the QR image store"""
         try:
-            # Try to import qrcode library
-            try:
-                import qrcode
-                from io import BytesIO
-            except ImportError:
-                return request.not_found("QR code library not installed. Install with: pip install qrcode[pil]")
-            
+            if not request.env['res.partner']._get_referral_partner_id(referral_code):
+                return request.not_found("Invalid referral code")
+
             # Build referral URL
             base_url = request.env['ir.config_parameter'].sudo().get_param('web.base.url', 'http://localhost:8069')
             referral_url = f"{base_url}/ref/click/{referral_code}"
@@ -117,33 +108,42 @@ class ReferralTrackingController(http.Controller):
             if utm_params:
                 referral_url += "?" + "&".join(utm_params)
             
-            # Generate QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(referral_url)
-            qr.make(fit=True)
-            
-            # Create image
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert to base64
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            
-            # Return as image
-            return request.make_response(
-                base64.b64decode(img_str),
-                headers=[
-                    ('Content-Type', 'image/png'),
-                    ('Content-Disposition', f'inline; filename="qrcode_{referral_code}.png"')
-                ]
+            return qr_image_response(
+                referral_url, size=size, border=4, error_correction='L', image_format=kwargs.get('format', 'png'),
+                filename=f"qrcode_{referral_code}", variants=request.env['referral.qr.image']._get_link_variants(
+                    base_url, referral_code),
             )
             
         except Exception as e:
             _logger.error(f"Error generating QR code: {str(e)}", exc_info=True)
             return request.not_found("Error generating QR code")
+
+
+def qr_image_response(url, size=10, border=4, error_correction='L', image_format='png', filename=None,
+                      variants=()):
+    """HTTP response of a QR code image, or 304 when the client has it already
+
+    Only the images among ``variants`` (arguments of _get_image()) are stored,
+    the others are rendered in the memory of the process.
+    """
+    try:
+        box_size = min(max(int(size), MIN_BOX_SIZE), MAX_BOX_SIZE)
+    except (TypeError, ValueError):
+        box_size = 10
+    image_format = image_format if image_format in IMAGE_MIMETYPES else 'png'
+
+    variant = (url, box_size, border, error_correction, image_format)
+    key, image = request.env['referral.qr.image'].sudo()._get_image(*variant, store=variant in variants)
+    if image is None:
+        return request.not_found("QR code library not installed. Install with: pip install qrcode[pil]")
+
+    headers = [
+        ('Content-Type', IMAGE_MIMETYPES[image_format]),
+        ('Cache-Control', 'public, max-age=86400'),  # Cache for 24 hours
+        ('ETag', f'"{key}"'),
+    ]
+    if request.httprequest.if_none_match.contains(key):
+        return request.make_response(b'', headers=headers, status=304)
+    if filename:
+        headers.append(('Content-Disposition', f'inline; filename="{filename}.{image_format}"'))
+    return request.make_response(image, headers=headers)
@@ -7,4 +7,6 @@ from . import referral_reward
 from . import referral_reward_rule
 from . import res_config_settings
 from . import referral_tracking
+from . import referral_daily_stat
+from . import referral_qr_image
 from . import referral_dashboard
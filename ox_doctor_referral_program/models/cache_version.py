@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from odoo.tools import SQL
+
+
+def get_cache_version(env, key):
+    """Version of the process caches named ``key``, queried once per transaction"""
+    version = env.cr.cache.get(key)
+    if version is None:
+        env.cr.execute(SQL("SELECT value FROM ir_config_parameter WHERE key = %s", key))
+        row = env.cr.fetchone()
+        version = env.cr.cache[key] = row[0] if row else '0'
+    return version
+
+
+def bump_cache_version(env, key, sequence):
+    """Invalidate the process caches named ``key``, in every worker once committed
+
+    The version is a plain row so its change follows the transaction; its values
+    come from the non-transactional ``sequence``, so a version seen by a rolled
+    back transaction is never handed out again.
+    """
+    env.cr.execute(SQL("""
+        INSERT INTO ir_config_parameter (key, value, create_uid, create_date, write_uid, write_date)
+        VALUES (%s, nextval(%s)::varchar, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, write_date = EXCLUDED.write_date
+    """, key, sequence, env.uid, env.uid))
+    env.cr.cache.pop(key, None)
+    env['ir.config_parameter'].invalidate_model(['value'])
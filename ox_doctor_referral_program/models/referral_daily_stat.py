@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Clicks whose user agent matches are counted as mobile, then tablet; the rest is desktop.
+MOBILE_AGENT_PATTERN = '(mobile|android|iphone)'
+TABLET_AGENT_PATTERN = '(tablet|ipad)'
+CONFIRMED_ORDER_STATES = ('sale', 'done')
+
+
+class ReferralDailyStat(models.Model):
+    """Daily referral rollup per referrer, so analytics of any period are one aggregate query
+
+    Click counters are incremented when clicks are created or converted. Order
+    counters of the (day, referrer) pairs touched by a transaction are recomputed
+    from sale orders just before commit. Days are UTC days, like the stored datetimes.
+    """
+    _name = 'referral.daily.stat'
+    _description = 'Referral Daily Statistics'
+    _order = 'day desc'
+    _log_access = False
+
+    day = fields.Date(string='Day', required=True, index=True)
+    partner_id = fields.Many2one('res.partner', string='Referrer', index=True, ondelete='cascade',
+                                 help='Empty for clicks on unknown referral codes')
+    clicks = fields.Integer(string='Clicks')
+    unique_clicks = fields.Integer(string='Unique Clicks')
+    conversions = fields.Integer(string='Conversions')
+    mobile_clicks = fields.Integer(string='Mobile Clicks')
+    tablet_clicks = fields.Integer(string='Tablet Clicks')
+    order_count = fields.Integer(string='Orders')
+    revenue = fields.Float(string='Revenue', help='Total of the confirmed orders of the referred partners')
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS referral_daily_stat_day_partner_uniq
+                ON referral_daily_stat (day, (COALESCE(partner_id, 0)))
+        """)
+        self.env.cr.execute("SELECT 1 FROM referral_daily_stat LIMIT 1")
+        if not self.env.cr.rowcount:
+            self._rebuild()
+
+    # ------------------------------------------------------------------
+    # Click counters
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _add_clicks(self, clicks, conversions_only=False, sign=1):
+        """Add (or remove with ``sign=-1``) clicks to the counters of their day and referrer"""
+        if not clicks:
+            return
+        clicks.flush_recordset(['click_date', 'partner_id', 'is_unique', 'converted', 'user_agent'])
+        if conversions_only:
+            counters = SQL("0, 0, %s * COUNT(*), 0, 0", sign)
+        else:
+            counters = SQL("""
+                %(sign)s * COUNT(*),
+                %(sign)s * COUNT(*) FILTER (WHERE is_unique),
+                %(sign)s * COUNT(*) FILTER (WHERE converted),
+                %(sign)s * COUNT(*) FILTER (WHERE lower(user_agent) ~ %(mobile)s),
+                %(sign)s * COUNT(*) FILTER (WHERE lower(user_agent) !~ %(mobile)s
+                                              AND lower(user_agent) ~ %(tablet)s)
+            """, sign=sign, mobile=MOBILE_AGENT_PATTERN, tablet=TABLET_AGENT_PATTERN)
+        self.env.cr.execute(SQL("""
+            INSERT INTO referral_daily_stat (day, partner_id, clicks, unique_clicks, conversions,
+                                             mobile_clicks, tablet_clicks, order_count, revenue)
+                 SELECT click_date::date, partner_id, %(counters)s, 0, 0
+                   FROM referral_link_click
+                  WHERE id IN %(ids)s
+               GROUP BY click_date::date, partner_id
+            ON CONFLICT (day, (COALESCE(partner_id, 0))) DO UPDATE
+                    SET clicks = referral_daily_stat.clicks + EXCLUDED.clicks,
+                        unique_clicks = referral_daily_stat.unique_clicks + EXCLUDED.unique_clicks,
+                        conversions = referral_daily_stat.conversions + EXCLUDED.conversions,
+                        mobile_clicks = referral_daily_stat.mobile_clicks + EXCLUDED.mobile_clicks,
+                        tablet_clicks = referral_daily_stat.tablet_clicks + EXCLUDED.tablet_clicks
+        """, counters=counters, ids=tuple(clicks.ids)))
+        self.invalidate_model()
+
+    # ------------------------------------------------------------------
+    # Order counters
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_order_keys(self, orders=None, partners=None):
+        """(day, referrer id) pairs of the confirmed orders of ``orders`` or of the partners ``partners``"""
+        if orders:
+            condition = SQL("so.id IN %s", tuple(orders.ids))
+        elif partners:
+            condition = SQL("so.partner_id IN %s", tuple(partners.ids))
+        else:
+            return set()
+        self.env.cr.execute(SQL("""
+            SELECT DISTINCT so.date_order::date, p.referred_by_id
+              FROM sale_order so
+              JOIN res_partner p ON p.id = so.partner_id
+             WHERE %s AND so.state IN %s AND p.referred_by_id IS NOT NULL
+        """, condition, CONFIRMED_ORDER_STATES))
+        return set(self.env.cr.fetchall())
+
+    @api.model
+    def _mark_orders_dirty(self, orders=None, partners=None, current_keys=True):
+        """Recompute before commit the order counters touched by ``orders`` or by the orders of ``partners``
+
+        Called before a change with ``current_keys``, the (day, referrer) pairs the
+        records count in right now are refreshed too, besides those they count in at
+        commit time. Without it nothing is read, so it is safe to call from computes.
+        """
+        data = self.env.cr.precommit.data
+        if 'referral.daily.stat.keys' not in data:
+            data['referral.daily.stat.keys'] = set()
+            data['referral.daily.stat.orders'] = set()
+            data['referral.daily.stat.partners'] = set()
+            self.env.cr.precommit.add(self._refresh_dirty_orders)
+        if current_keys:
+            self.env['sale.order'].flush_model(['date_order', 'state', 'partner_id', 'amount_total'])
+            self.env['res.partner'].flush_model(['referred_by_id'])
+            data['referral.daily.stat.keys'].update(self._get_order_keys(orders=orders, partners=partners))
+        if orders:
+            data['referral.daily.stat.orders'].update(orders.ids)
+        if partners:
+            data['referral.daily.stat.partners'].update(partners.ids)
+
+    def _refresh_dirty_orders(self):
+        data = self.env.cr.precommit.data
+        keys = data.pop('referral.daily.stat.keys', set())
+        order_ids = data.pop('referral.daily.stat.orders', set())
+        partner_ids = data.pop('referral.daily.stat.partners', set())
+        self.env.flush_all()
+        keys |= self._get_order_keys(orders=self.env['sale.order'].browse(order_ids))
+        keys |= self._get_order_keys(partners=self.env['res.partner'].browse(partner_ids))
+        self._refresh_order_counters(keys)
+        self.env.flush_all()
+
+    @api.model
+    def _refresh_order_counters(self, keys):
+        """Recompute order count and revenue of the given (day, referrer id) pairs from sale orders"""
+        if not keys:
+            return
+        self.env.cr.execute(SQL("""
+            INSERT INTO referral_daily_stat (day, partner_id, clicks, unique_clicks, conversions,
+                                             mobile_clicks, tablet_clicks, order_count, revenue)
+                 SELECT k.day, k.partner_id, 0, 0, 0, 0, 0, COUNT(so.id), COALESCE(SUM(so.amount_total), 0)
+                   FROM (VALUES %s) AS k (day, partner_id)
+              LEFT JOIN res_partner p ON p.referred_by_id = k.partner_id
+              LEFT JOIN sale_order so ON so.partner_id = p.id
+                                     AND so.state IN %s
+                                     AND so.date_order >= k.day
+                                     AND so.date_order < k.day + 1
+               GROUP BY k.day, k.partner_id
+            ON CONFLICT (day, (COALESCE(partner_id, 0))) DO UPDATE
+                    SET order_count = EXCLUDED.order_count,
+                        revenue = EXCLUDED.revenue
+        """, SQL(", ").join(SQL("(%s::date, %s::integer)", day, partner_id) for day, partner_id in keys),
+            CONFIRMED_ORDER_STATES))
+        self.invalidate_model()
+
+    # ------------------------------------------------------------------
+    # Rebuild
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _rebuild(self, date_from=None):
+        """Recompute every counter from clicks and orders, from ``date_from`` (a date) or from the beginning"""
+        self.env.flush_all()
+        click_condition = SQL("click_date >= %s", date_from) if date_from else SQL("TRUE")
+        order_condition = SQL("so.date_order >= %s", date_from) if date_from else SQL("TRUE")
+        self.env.cr.execute(SQL("DELETE FROM referral_daily_stat WHERE %s",
+                                SQL("day >= %s", date_from) if date_from else SQL("TRUE")))
+        self.env.cr.execute(SQL("""
+            INSERT INTO referral_daily_stat (day, partner_id, clicks, unique_clicks, conversions,
+                                             mobile_clicks, tablet_clicks, order_count, revenue)
+                 SELECT day, partner_id, SUM(clicks), SUM(unique_clicks), SUM(conversions),
+                        SUM(mobile_clicks), SUM(tablet_clicks), SUM(order_count), SUM(revenue)
+                   FROM (
+                        SELECT click_date::date AS day, partner_id,
+                               COUNT(*) AS clicks,
+                               COUNT(*) FILTER (WHERE is_unique) AS unique_clicks,
+                               COUNT(*) FILTER (WHERE converted) AS conversions,
+                               COUNT(*) FILTER (WHERE lower(user_agent) ~ %(mobile)s) AS mobile_clicks,
+                               COUNT(*) FILTER (WHERE lower(user_agent) !~ %(mobile)s
+                                                  AND lower(user_agent) ~ %(tablet)s) AS tablet_clicks,
+                               0 AS order_count, 0 AS revenue
+                          FROM referral_link_click
+                         WHERE %(click_condition)s
+                      GROUP BY 1, 2
+                     UNION ALL
+                        SELECT so.date_order::date, p.referred_by_id, 0, 0, 0, 0, 0,
+                               COUNT(*), SUM(so.amount_total)
+                          FROM sale_order so
+                          JOIN res_partner p ON p.id = so.partner_id AND p.referred_by_id IS NOT NULL
+                         WHERE so.state IN %(states)s AND %(order_condition)s
+                      GROUP BY 1, 2
+                   ) AS rollup
+               GROUP BY day, partner_id
+        """, mobile=MOBILE_AGENT_PATTERN, tablet=TABLET_AGENT_PATTERN, click_condition=click_condition,
+            order_condition=order_condition, states=CONFIRMED_ORDER_STATES))
+        self.invalidate_model()
+        _logger.info("Rebuilt referral daily statistics%s", f" from {date_from}" if date_from else '')
+
+    @api.model
+    def _cron_rebuild_recent(self, days=2):
+        """Safety net for changes made outside the ORM: recompute the last ``days`` days"""
+        self._rebuild(date_from=fields.Date.today() - timedelta(days=days))
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_totals(self, date_from, date_to):
+        """Counters summed over [date_from, date_to], and the number of referrers having clicks"""
+        self.flush_model()
+        self.env.cr.execute(SQL("""
+            SELECT COALESCE(SUM(clicks), 0), COALESCE(SUM(unique_clicks), 0), COALESCE(SUM(conversions), 0),
+                   COALESCE(SUM(mobile_clicks), 0), COALESCE(SUM(tablet_clicks), 0),
+                   COALESCE(SUM(order_count), 0), COALESCE(SUM(revenue), 0),
+                   COUNT(DISTINCT partner_id) FILTER (WHERE clicks > 0)
+              FROM referral_daily_stat
+             WHERE day BETWEEN %s AND %s
+        """, date_from, date_to))
+        keys = ('clicks', 'unique_clicks', 'conversions', 'mobile_clicks', 'tablet_clicks', 'order_count',
+                'revenue', 'active_referrers')
+        return dict(zip(keys, self.env.cr.fetchone()))
+
+    @api.model
+    def _get_daily(self, date_from, date_to):
+        """{day: (clicks, conversions, revenue)} for the days of [date_from, date_to] having data"""
+        self.flush_model()
+        self.env.cr.execute(SQL("""
+            SELECT day, SUM(clicks), SUM(conversions), SUM(revenue)
+              FROM referral_daily_stat
+             WHERE day BETWEEN %s AND %s
+          GROUP BY day
+        """, date_from, date_to))
+        return {day: (clicks, conversions, revenue) for day, clicks, conversions, revenue in self.env.cr.fetchall()}
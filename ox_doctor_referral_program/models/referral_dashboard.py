@@ -37,19 +37,16 @@ class ReferralDashboard(models.Model):
 
     @api.depends('date_from', 'date_to')
     def _compute_stats(self):
-        """Compute dashboard statistics"""
+        """Compute dashboard statistics from the daily rollup (referral.daily.stat)"""
+        daily_stats = self.env['referral.daily.stat'].sudo()
         for dashboard in self:
             date_from = dashboard.date_from or (fields.Date.today() - timedelta(days=30))
             date_to = dashboard.date_to or fields.Date.today()
-            
-            # Get clicks
-            clicks = self.env['referral.link.click'].search([
-                ('click_date', '>=', datetime.combine(date_from, time.min)),
-                ('click_date', '<=', datetime.combine(date_to, time.max))
-            ])
-            dashboard.total_clicks = len(clicks)
-            dashboard.unique_clicks = len(clicks.filtered('is_unique'))
-            dashboard.total_signups = len(clicks.filtered('converted'))
+            totals = daily_stats._get_totals(date_from, date_to)
+
+            dashboard.total_clicks = totals['clicks']
+            dashboard.unique_clicks = totals['unique_clicks']
+            dashboard.total_signups = totals['conversions']
             
             # Conversion rate
             if dashboard.total_clicks > 0:
@@ -57,22 +54,9 @@ class ReferralDashboard(models.Model):
             else:
                 dashboard.conversion_rate = 0.0
             
-            # Get orders from referred partners
-            referred_partners = self.env['res.partner'].search([
-                ('referred_by_id', '!=', False),
-                ('create_date', '>=', datetime.combine(date_from, time.min)),
-                ('create_date', '<=', datetime.combine(date_to, time.max))
-            ])
-            
-            orders = self.env['sale.order'].search([
-                ('partner_id', 'in', referred_partners.ids),
-                ('date_order', '>=', datetime.combine(date_from, time.min)),
-                ('date_order', '<=', datetime.combine(date_to, time.max)),
-                ('state', 'in', ['sale', 'done'])
-            ])
-            
-            dashboard.total_revenue = sum(orders.mapped('amount_total'))
-            dashboard.order_count = len(orders)
+            # Confirmed orders of referred partners in the period
+            dashboard.total_revenue = totals['revenue']
+            dashboard.order_count = totals['order_count']
             
             if dashboard.order_count > 0:
                 dashboard.average_order_value = dashboard.total_revenue / dashboard.order_count
@@ -80,11 +64,14 @@ class ReferralDashboard(models.Model):
                 dashboard.average_order_value = 0.0
             
             # New referrals
-            dashboard.new_referrals = len(referred_partners)
+            dashboard.new_referrals = self.env['res.partner'].search_count([
+                ('referred_by_id', '!=', False),
+                ('create_date', '>=', datetime.combine(date_from, time.min)),
+                ('create_date', '<=', datetime.combine(date_to, time.max))
+            ])
             
             # Active referrers (partners with referral code who had clicks in period)
-            active_referrer_ids = list(set(clicks.mapped('partner_id').ids))
-            dashboard.active_referrers = len([pid for pid in active_referrer_ids if pid])
+            dashboard.active_referrers = totals['active_referrers']
             
             # Pending fraud cases
             fraud_cases = self.env['referral.fraud.detection'].search_count([
@@ -144,46 +131,19 @@ class ReferralDashboard(models.Model):
     
     def _get_time_series_data(self, date_from, date_to):
         """Get time-series data for line/bar charts"""
-        # Generate daily data points
-        current_date = datetime.combine(date_from, time.min)
-        end_date = datetime.combine(date_to, time.max)
+        daily = self.env['referral.daily.stat'].sudo()._get_daily(date_from, date_to)
         dates = []
         clicks_data = []
         signups_data = []
         revenue_data = []
         
-        while current_date <= end_date:
+        current_date = date_from
+        while current_date <= date_to:
+            clicks, signups, revenue = daily.get(current_date, (0, 0, 0.0))
             dates.append(current_date.strftime('%Y-%m-%d'))
-            day_start = datetime.combine(current_date.date(), time.min)
-            day_end = datetime.combine(current_date.date(), time.max)
-            
-            # Count clicks for this day
-            clicks = self.env['referral.link.click'].search_count([
-                ('click_date', '>=', day_start),
-                ('click_date', '<=', day_end)
-            ])
             clicks_data.append(clicks)
-            
-            # Count signups for this day
-            signups = self.env['referral.link.click'].search_count([
-                ('click_date', '>=', day_start),
-                ('click_date', '<=', day_end),
-                ('converted', '=', True)
-            ])
             signups_data.append(signups)
-            
-            # Get revenue for this day
-            referred_partners = self.env['res.partner'].search([
-                ('referred_by_id', '!=', False)
-            ])
-            orders = self.env['sale.order'].search([
-                ('partner_id', 'in', referred_partners.ids),
-                ('date_order', '>=', day_start),
-                ('date_order', '<=', day_end),
-                ('state', 'in', ['sale', 'done'])
-            ])
-            revenue_data.append(sum(orders.mapped('amount_total')))
-            
+            revenue_data.append(revenue)
             current_date += timedelta(days=1)
         
         return {
@@ -199,22 +159,12 @@ class ReferralDashboard(models.Model):
         date_to_dt = datetime.combine(date_to, time.max)
         
         # Device breakdown
-        clicks = self.env['referral.link.click'].search([
-            ('click_date', '>=', date_from_dt),
-            ('click_date', '<=', date_to_dt)
-        ])
-        
-        device_data = {}
-        for click in clicks:
-            # Simple device detection from user agent
-            ua = (click.user_agent or '').lower()
-            if 'mobile' in ua or 'android' in ua or 'iphone' in ua:
-                device = 'Mobile'
-            elif 'tablet' in ua or 'ipad' in ua:
-                device = 'Tablet'
-            else:
-                device = 'Desktop'
-            device_data[device] = device_data.get(device, 0) + 1
+        totals = self.env['referral.daily.stat'].sudo()._get_totals(date_from, date_to)
+        device_data = {
+            'Desktop': totals['clicks'] - totals['mobile_clicks'] - totals['tablet_clicks'],
+            'Mobile': totals['mobile_clicks'],
+            'Tablet': totals['tablet_clicks'],
+        }
         
         # Referral type breakdown (Doctor 1, Doctor 2/3/4, Company)
         referred_partners = self.env['res.partner'].search([
@@ -247,7 +197,7 @@ class ReferralDashboard(models.Model):
         
         return {
             'device': {
-                'labels': list(device_data.keys()) or ['Desktop', 'Mobile', 'Tablet'],
+                'labels': ['Desktop', 'Mobile', 'Tablet'],
                 'data': [device_data.get(d, 0) for d in ['Desktop', 'Mobile', 'Tablet']]
             },
             'referral_type': {
@@ -260,41 +210,18 @@ class ReferralDashboard(models.Model):
         """Get sparkline data for KPI tiles (last 30 days or period)"""
         # Get data points for sparklines (simplified - last 7 days)
         sparkline_days = 7
-        current_date = datetime.combine(date_to, time.min) - timedelta(days=sparkline_days)
-        end_date = datetime.combine(date_to, time.max)
+        current_date = date_to - timedelta(days=sparkline_days)
+        daily = self.env['referral.daily.stat'].sudo()._get_daily(current_date, date_to)
         
         clicks_sparkline = []
         signups_sparkline = []
         revenue_sparkline = []
         conversion_sparkline = []
         
-        while current_date <= end_date:
-            day_start = datetime.combine(current_date.date(), time.min)
-            day_end = datetime.combine(current_date.date(), time.max)
-            
-            clicks = self.env['referral.link.click'].search_count([
-                ('click_date', '>=', day_start),
-                ('click_date', '<=', day_end)
-            ])
+        while current_date <= date_to:
+            clicks, signups, revenue = daily.get(current_date, (0, 0, 0.0))
             clicks_sparkline.append(clicks)
-            
-            signups = self.env['referral.link.click'].search_count([
-                ('click_date', '>=', day_start),
-                ('click_date', '<=', day_end),
-                ('converted', '=', True)
-            ])
             signups_sparkline.append(signups)
-            
-            referred_partners = self.env['res.partner'].search([
-                ('referred_by_id', '!=', False)
-            ])
-            orders = self.env['sale.order'].search([
-                ('partner_id', 'in', referred_partners.ids),
-                ('date_order', '>=', day_start),
-                ('date_order', '<=', day_end),
-                ('state', 'in', ['sale', 'done'])
-            ])
-            revenue = sum(orders.mapped('amount_total'))
             revenue_sparkline.append(revenue)
             
             conversion = (signups / clicks * 100) if clicks > 0 else 0
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import hashlib
+import io
+import logging
+import threading
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import qrcode
+    import qrcode.image.svg
+    HAS_QRCODE = True
+except ImportError:
+    HAS_QRCODE = False
+
+IMAGE_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+MIN_BOX_SIZE = 1
+MAX_BOX_SIZE = 40
+# Rendered images of this process, {key: image bytes}
+QR_IMAGE_CACHE = LRU(1024)
+
+
+def render_qr(url, box_size=10, border=4, error_correction='L', image_format='png'):
+    """QR code of ``url`` as PNG or SVG bytes; needs the qrcode library"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{error_correction}'),
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    if image_format == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ReferralQrImage(models.Model):
+    """Rendered QR codes of referral links, addressed by a hash of what was rendered
+
+    The key doubles as the ETag of the image: the same link, size and format
+    always give the same bytes.
+    """
+    _name = 'referral.qr.image'
+    _description = 'Referral QR Code Image'
+    _log_access = False
+
+    key = fields.Char(string='Key', required=True, readonly=True)
+    url = fields.Char(string='URL', required=True, readonly=True)
+    box_size = fields.Integer(string='Box Size', readonly=True)
+    border = fields.Integer(string='Border', readonly=True)
+    error_correction = fields.Char(string='Error Correction', readonly=True)
+    image_format = fields.Char(string='Format', readonly=True)
+    image = fields.Binary(string='Image', attachment=False, readonly=True)
+    rendered_date = fields.Datetime(string='Rendered On', readonly=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', 'A QR code image is stored once per key.'),
+    ]
+
+    @api.model
+    def _make_key(self, url, box_size, border, error_correction, image_format):
+        return hashlib.sha256(f'{url}|{box_size}|{border}|{error_correction}|{image_format}'.encode()).hexdigest()
+
+    @api.model
+    def _get_image(self, url, box_size=10, border=4, error_correction='L', image_format='png', store=False):
+        """(key, image bytes) of a QR code, rendered only the first time
+
+        Looked up in the memory of the process, then in the table; returns
+        (key, None) when the image is not stored and the qrcode library is missing.
+        Rendered images are stored with ``store``, for the default variants of
+        the referral codes (see _get_link_variants), and only kept in memory otherwise.
+        """
+        key = self._make_key(url, box_size, border, error_correction, image_format)
+        image = QR_IMAGE_CACHE.get(key)
+        if image is not None:
+            return key, image
+
+        self.env.cr.execute(SQL("SELECT image FROM referral_qr_image WHERE key = %s", key))
+        row = self.env.cr.fetchone()
+        if row:
+            image = base64.b64decode(bytes(row[0]))
+        elif not HAS_QRCODE:
+            return key, None
+        else:
+            image = render_qr(url, box_size, border, error_correction, image_format)
+            if store:
+                self._store_images([(key, url, box_size, border, error_correction, image_format, image)])
+        QR_IMAGE_CACHE[key] = image
+        return key, image
+
+    @api.model
+    def _store_images(self, images):
+        """Insert [(key, url, box size, border, error correction, format, image bytes)], skipping known keys"""
+        self.env.cr.execute(SQL("""
+            INSERT INTO referral_qr_image (key, url, box_size, border, error_correction, image_format, image,
+                                           rendered_date)
+                 VALUES %s
+            ON CONFLICT (key) DO NOTHING
+        """, SQL(", ").join(
+            SQL("(%s, %s, %s, %s, %s, %s, %s, now() at time zone 'UTC')",
+                key, url, box_size, border, error_correction, image_format, base64.b64encode(image))
+            for key, url, box_size, border, error_correction, image_format, image in images
+        )))
+
+    @api.model
+    def _get_link_variants(self, base_url, code):
+        """Arguments of _get_image() for the default QR codes served for a referral code"""
+        return [
+            # /ref/qrcode/<code>
+            (f'{base_url}/ref/click/{code}', 10, 4, 'L', 'png'),
+            # /referral/qr/<code>
+            (f'{base_url}/ref/click/{code}', 10, 2, 'M', 'png'),
+        ]
+
+    @api.model
+    def _gc_images(self, base_url):
+        """Remove the stored images that are not a default variant of an active referral code
+
+        That is images of another base URL, whose links are dead, images of removed
+        or archived codes, and images of other sizes or formats.
+        """
+        prefix = f'{base_url}/ref/click/'
+        variants = tuple(variant[1:] for variant in self._get_link_variants(base_url, ''))
+        self.env['res.partner'].flush_model(['referral_code', 'active'])
+        self.env.cr.execute(SQL("""
+            DELETE FROM referral_qr_image image
+             WHERE left(image.url, %(length)s) != %(prefix)s
+                OR (image.box_size, image.border, image.error_correction, image.image_format) NOT IN %(variants)s
+                OR NOT EXISTS (SELECT 1
+                                 FROM res_partner partner
+                                WHERE partner.referral_code = substr(image.url, %(length)s + 1)
+                                  AND partner.active)
+        """, length=len(prefix), prefix=prefix, variants=variants))
+        return self.env.cr.rowcount
+
+    @api.model
+    def _cron_prerender(self, batch_size=500):
+        """Render the QR codes of every active referral code not stored yet
+
+        Stored images that are no longer served are removed first, see _gc_images().
+        """
+        if not HAS_QRCODE:
+            _logger.warning("qrcode library not installed, referral QR codes are not pre-rendered")
+            return 0
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url', '')
+        removed = self._gc_images(base_url)
+        if removed:
+            _logger.info("Removed %s stale referral QR codes", removed)
+
+        codes = sorted(set(self.env['res.partner'].sudo().search([('referral_code', '!=', False)]).mapped('referral_code')))
+        rendered = 0
+        for start in range(0, len(codes), batch_size):
+            variants = {
+                self._make_key(*variant): variant
+                for code in codes[start:start + batch_size]
+                for variant in self._get_link_variants(base_url, code)
+            }
+            self.env.cr.execute(SQL("SELECT key FROM referral_qr_image WHERE key IN %s", tuple(variants)))
+            for (key,) in self.env.cr.fetchall():
+                del variants[key]
+            if variants:
+                self._store_images([(key, *variant, render_qr(*variant)) for key, variant in variants.items()])
+                rendered += len(variants)
+            self.env['ir.cron']._notify_progress(done=min(start + batch_size, len(codes)),
+                                                 remaining=max(len(codes) - start - batch_size, 0))
+            if auto_commit:
+                self.env.cr.commit()
+        _logger.info("Pre-rendered %s referral QR codes", rendered)
+        return rendered
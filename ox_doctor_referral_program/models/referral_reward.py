@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import threading
 from odoo import models, fields, api
 from odoo.exceptions import UserError
 
@@ -75,50 +76,66 @@ class ReferralReward(models.Model):
 
     def action_grant_reward(self):
         """Grant the promo reward by creating a free order for Doctor 1"""
-        for reward in self:
-            if reward.state != 'pending':
-                raise UserError('Only pending rewards can be granted.')
-            
-            # Create free sale order for Doctor 1
-            order_vals = {
-                'partner_id': reward.doctor_1_id.id,
-                'date_order': fields.Datetime.now(),
-                'state': 'draft',
-                'order_line': [(0, 0, {
-                    'product_id': reward.product_id.id,
-                    'product_uom_qty': reward.quantity,
-                    'price_unit': 0.0,  # Free
-                    'name': f'Promo Reward: {reward.product_id.name}',
-                })],
-                'note': f'Promo reward for referring doctor {reward.referred_doctor_id.name}',
-            }
-            
-            reward_order = self.env['sale.order'].create(order_vals)
-            
-            # Confirm the order
-            reward_order.action_confirm()
-            
-            # Update reward record
-            reward.write({
-                'state': 'granted',
-                'granted_date': fields.Datetime.now(),
-                'granted_by_id': self.env.user.id,
-                'reward_order_id': reward_order.id,
-            })
-            
-            _logger.info(
-                f"[referral.reward] Granted reward {reward.id} to Doctor 1 {reward.doctor_1_id.id}. "
-                f"Created order {reward_order.id}"
-            )
-            
+        if any(reward.state != 'pending' for reward in self):
+            raise UserError('Only pending rewards can be granted.')
+        reward_orders = self._grant_rewards()
+        if len(reward_orders) != 1:
             return {
                 'type': 'ir.actions.act_window',
-                'name': 'Reward Order',
+                'name': 'Reward Orders',
                 'res_model': 'sale.order',
-                'res_id': reward_order.id,
-                'view_mode': 'form',
+                'domain': [('id', 'in', reward_orders.ids)],
+                'view_mode': 'list,form',
                 'target': 'current',
             }
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Reward Order',
+            'res_model': 'sale.order',
+            'res_id': reward_orders.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    def _grant_rewards(self):
+        """Create and confirm the free orders of these pending rewards in bulk
+
+        Returns:
+            sale.order: the reward orders, in the order of the rewards
+        """
+        if not self:
+            return self.env['sale.order']
+        # Create free sale orders for Doctor 1
+        reward_orders = self.env['sale.order'].create([{
+            'partner_id': reward.doctor_1_id.id,
+            'date_order': fields.Datetime.now(),
+            'state': 'draft',
+            'order_line': [(0, 0, {
+                'product_id': reward.product_id.id,
+                'product_uom_qty': reward.quantity,
+                'price_unit': 0.0,  # Free
+                'name': f'Promo Reward: {reward.product_id.name}',
+            })],
+            'note': f'Promo reward for referring doctor {reward.referred_doctor_id.name}',
+        } for reward in self])
+        
+        # Confirm the orders
+        reward_orders.action_confirm()
+        
+        # Update reward records
+        self.write({
+            'state': 'granted',
+            'granted_date': fields.Datetime.now(),
+            'granted_by_id': self.env.user.id,
+        })
+        for reward, reward_order in zip(self, reward_orders):
+            reward.reward_order_id = reward_order
+        
+        _logger.info(
+            f"[referral.reward] Granted rewards {self.ids} to Doctors 1 {self.doctor_1_id.ids}. "
+            f"Created orders {reward_orders.ids}"
+        )
+        return reward_orders
 
     def action_cancel(self):
         """Cancel the reward"""
@@ -128,13 +145,32 @@ class ReferralReward(models.Model):
             reward.state = 'cancelled'
 
     @api.model
-    def cron_grant_pending_rewards(self):
-        """Automated cron to grant pending rewards"""
+    def cron_grant_pending_rewards(self, batch_size=100):
+        """Automated cron to grant pending rewards, in batches
+
+        A failing batch is retried reward by reward so that one bad reward does
+        not hold back the others.
+        """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
         pending_rewards = self.search([('state', '=', 'pending')])
-        for reward in pending_rewards:
+        for start in range(0, len(pending_rewards), batch_size):
+            batch = pending_rewards[start:start + batch_size]
             try:
-                reward.action_grant_reward()
+                with self.env.cr.savepoint():
+                    batch._grant_rewards()
             except Exception as e:
-                _logger.error(
-                    f"[referral.reward] Failed to grant reward {reward.id}: {str(e)}"
-                )
+                _logger.warning(f"[referral.reward] Failed to grant rewards {batch.ids} together: {str(e)}")
+                for reward in batch:
+                    try:
+                        with self.env.cr.savepoint():
+                            reward._grant_rewards()
+                    except Exception as e:
+                        _logger.error(
+                            f"[referral.reward] Failed to grant reward {reward.id}: {str(e)}"
+                        )
+            self.env['ir.cron']._notify_progress(
+                done=min(start + batch_size, len(pending_rewards)),
+                remaining=max(len(pending_rewards) - start - batch_size, 0),
+            )
+            if auto_commit:
+                self.env.cr.commit()
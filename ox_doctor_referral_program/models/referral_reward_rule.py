@@ -1,11 +1,23 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 import logging
+from collections import defaultdict, namedtuple
+
+from .cache_version import bump_cache_version, get_cache_version
 
 _logger = logging.getLogger(__name__)
 
+# Version of the compiled rules cached by the workers, see cache_version
+REWARD_RULE_VERSION_KEY = 'ox_doctor_referral_program.reward_rule_version'
+REWARD_RULE_VERSION_SEQUENCE = 'referral_reward_rule_version_seq'
+
+# Reward rule reduced to what evaluating orders needs; product and category ids are frozensets
+CompiledRule = namedtuple('CompiledRule', [
+    'id', 'name', 'product_ids', 'category_ids', 'reward_type', 'minimum', 'reward_product_id', 'reward_quantity',
+])
+
 
 class ReferralRewardRule(models.Model):
     """Reward rules for referral program - flexible product/category based rewards"""
@@ -198,6 +210,76 @@ class ReferralRewardRule(models.Model):
             is_eligible = total_revenue >= self.minimum_revenue
             return is_eligible, total_qty, total_revenue, reward_product
     
+    def init(self):
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {REWARD_RULE_VERSION_SEQUENCE}")
+
+    @api.model
+    def _get_compiled_rules(self, company_id):
+        """Active rules of a company, in evaluation order, cached until a rule changes"""
+        return self._get_compiled_rules_version(company_id, get_cache_version(self.env, REWARD_RULE_VERSION_KEY))
+
+    @api.model
+    @tools.ormcache('company_id', 'version')
+    def _get_compiled_rules_version(self, company_id, version):
+        rules = self.sudo().with_context(active_test=False).search([
+            ('active', '=', True),
+            ('company_id', '=', company_id)
+        ], order='sequence, id')
+        return tuple(
+            CompiledRule(
+                id=rule.id,
+                name=rule.name,
+                product_ids=frozenset(rule.product_ids.ids if rule.apply_to_type == 'product' else ()),
+                category_ids=frozenset(rule.product_category_ids.ids if rule.apply_to_type == 'category' else ()),
+                reward_type=rule.reward_type,
+                minimum=rule.minimum_qty if rule.reward_type == 'qty' else rule.minimum_revenue,
+                reward_product_id=rule.reward_product_id.id,
+                reward_quantity=rule.reward_quantity,
+            )
+            for rule in rules
+        )
+
+    @api.model
+    def _match_orders(self, orders):
+        """First rule each order qualifies for, like check_order_eligibility() rule by rule
+
+        The lines of all orders are walked once against the compiled rules of
+        their company.
+
+        Returns:
+            dict: {order id: (CompiledRule, matched qty, matched revenue, reward product id)}
+                  for the qualifying orders
+        """
+        fallback_product_id = int(self.env['ir.config_parameter'].sudo().get_param(
+            'ox_doctor_referral_program.skydell_platinum_product_id'
+        ) or 0)
+        rules_by_company = {company.id: self._get_compiled_rules(company.id) for company in orders.company_id}
+
+        # {(order id, rule id): [qty, revenue]} of the lines matching the rule
+        totals = defaultdict(lambda: [0.0, 0.0])
+        for line in orders.order_line:
+            product = line.product_id
+            # rules only apply to active products, and category rules to sellable ones
+            if not product.active:
+                continue
+            for rule in rules_by_company[line.order_id.company_id.id]:
+                if product.id in rule.product_ids or (product.sale_ok and product.categ_id.id in rule.category_ids):
+                    total = totals[line.order_id.id, rule.id]
+                    total[0] += line.product_uom_qty
+                    total[1] += line.price_subtotal
+
+        matches = {}
+        for order in orders:
+            for rule in rules_by_company[order.company_id.id]:
+                reward_product_id = rule.reward_product_id or fallback_product_id
+                if not reward_product_id or (order.id, rule.id) not in totals:
+                    continue
+                matched_qty, matched_revenue = totals[order.id, rule.id]
+                if (matched_qty if rule.reward_type == 'qty' else matched_revenue) >= rule.minimum:
+                    matches[order.id] = (rule, matched_qty, matched_revenue, reward_product_id)
+                    break
+        return matches
+
     @api.model_create_multi
     def create(self, vals_list):
         """Override create to ensure company_id is set from context if not provided"""
@@ -210,7 +292,19 @@ class ReferralRewardRule(models.Model):
                 elif not vals.get('company_id'):
                     # Fallback to current company
                     vals['company_id'] = self.env.company.id
-        return super(ReferralRewardRule, self).create(vals_list)
+        rules = super(ReferralRewardRule, self).create(vals_list)
+        bump_cache_version(self.env, REWARD_RULE_VERSION_KEY, REWARD_RULE_VERSION_SEQUENCE)
+        return rules
+
+    def write(self, vals):
+        result = super().write(vals)
+        bump_cache_version(self.env, REWARD_RULE_VERSION_KEY, REWARD_RULE_VERSION_SEQUENCE)
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        bump_cache_version(self.env, REWARD_RULE_VERSION_KEY, REWARD_RULE_VERSION_SEQUENCE)
+        return result
     
     @api.model
     def action_open_reward_rules(self):
@@ -2,14 +2,29 @@
 
 from odoo import models, fields, api, SUPERUSER_ID
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
 import logging
 import hashlib
 import json
+import threading
 from datetime import datetime, timedelta, time
 
 _logger = logging.getLogger(__name__)
 
 
+# Fraud thresholds of referral link clicks, the same as the referral.fraud.detection checks
+DUPLICATE_THRESHOLD = 10
+VELOCITY_THRESHOLD = 20
+
+# Fields of referral.link.click the daily rollup groups or counts clicks by, besides ``converted``
+ROLLUP_CLICK_FIELDS = {'referral_code', 'click_date', 'user_agent', 'device_fingerprint'}
+# Values of a tracked click kept in the click queue until it is written
+QUEUED_CLICK_FIELDS = ('ip_address', 'user_agent', 'device_fingerprint', 'utm_source', 'utm_medium',
+                       'utm_campaign', 'utm_content', 'referrer_url')
+FLUSH_BATCH_SIZE = 1000
+
+
 class ReferralLinkClick(models.Model):
     """Track clicks on referral links"""
     _name = 'referral.link.click'
@@ -98,16 +113,71 @@ class ReferralLinkClick(models.Model):
         help='First click from this device/IP combination'
     )
 
+    def init(self):
+        cr = self.env.cr
+        # per-code scans of recent clicks, see _create_click_detections()
+        create_index(cr, 'referral_link_click_code_date_index', self._table, ['referral_code', 'click_date'])
+
+        # Tables of track_click(), shared by all workers:
+        # - referral_click_counter: clicks per (code, counter, key, minute) over the last day,
+        #   for the fraud checks; unlogged as it is only a heuristic, PostgreSQL empties it
+        #   after a crash and the counts start over
+        # - referral_click_device: the (code, device) pairs that have clicked, for uniqueness
+        # - referral_click_queue: clicks tracked but not written yet, see _flush_click_queue()
+        cr.execute("SELECT to_regclass('referral_click_counter'), to_regclass('referral_click_device')")
+        counter_exists, device_exists = cr.fetchone()
+        cr.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS referral_click_counter (
+                referral_code varchar NOT NULL,
+                kind varchar NOT NULL,
+                key varchar NOT NULL,
+                minute timestamp NOT NULL,
+                hits integer NOT NULL,
+                PRIMARY KEY (referral_code, kind, key, minute)
+            );
+            CREATE TABLE IF NOT EXISTS referral_click_device (
+                referral_code varchar NOT NULL,
+                device_fingerprint varchar NOT NULL,
+                PRIMARY KEY (referral_code, device_fingerprint)
+            );
+            CREATE TABLE IF NOT EXISTS referral_click_queue (
+                id bigserial PRIMARY KEY,
+                referral_code varchar NOT NULL,
+                click_date timestamp NOT NULL,
+                click jsonb NOT NULL,
+                ip_hits integer,
+                device_hits integer,
+                visitor_hits integer NOT NULL,
+                is_unique boolean NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS referral_click_queue_referral_code_index
+                ON referral_click_queue (referral_code);
+        """)
+        if not device_exists:
+            cr.execute("""
+                INSERT INTO referral_click_device (referral_code, device_fingerprint)
+                     SELECT DISTINCT referral_code, device_fingerprint
+                       FROM referral_link_click
+                      WHERE device_fingerprint IS NOT NULL
+            """)
+        if not counter_exists:
+            cr.execute(SQL("""
+                INSERT INTO referral_click_counter (referral_code, kind, key, minute, hits)
+                     SELECT referral_code, counter.kind, counter.key, date_trunc('minute', click_date), COUNT(*)
+                       FROM referral_link_click,
+                    LATERAL (VALUES ('ip', ip_address), ('device', device_fingerprint),
+                                    ('visitor', COALESCE(ip_address, '') || '|' || COALESCE(device_fingerprint, '')))
+                                 AS counter (kind, key)
+                      WHERE click_date >= %s AND counter.key <> ''
+                   GROUP BY 1, 2, 3, 4
+            """, fields.Datetime.now() - timedelta(days=1)))
+
     @api.depends('referral_code')
     def _compute_partner_id(self):
         """Find partner by referral code"""
         for click in self:
             if click.referral_code:
-                # Use sudo to avoid access issues in public context
-                partner = self.env['res.partner'].sudo().search([
-                    ('referral_code', '=', click.referral_code)
-                ], limit=1)
-                click.partner_id = partner.id if partner else False
+                click.partner_id = self.env['res.partner']._get_referral_partner_id(click.referral_code)
 
     @api.depends('device_fingerprint', 'click_date', 'referral_code')
     def _compute_is_unique(self):
@@ -127,6 +197,41 @@ class ReferralLinkClick(models.Model):
             
             click.is_unique = not bool(earlier_click)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        clicks = super().create(vals_list)
+        self.env['referral.daily.stat'].sudo()._add_clicks(clicks)
+        if not clicks:
+            return clicks
+        # clicks created by other means than track_click() make their device known too
+        clicks.flush_recordset(['referral_code', 'device_fingerprint'])
+        self.env.cr.execute(SQL("""
+            INSERT INTO referral_click_device (referral_code, device_fingerprint)
+                 SELECT DISTINCT referral_code, device_fingerprint
+                   FROM referral_link_click
+                  WHERE id IN %s AND device_fingerprint IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """, tuple(clicks.ids)))
+        return clicks
+
+    def write(self, vals):
+        stats = self.env['referral.daily.stat'].sudo()
+        # clicks moving to another day or referrer, or counted in other counters
+        moved = self if not ROLLUP_CLICK_FIELDS.isdisjoint(vals) else self.browse()
+        flipped = self.browse()
+        if 'converted' in vals:
+            flipped = (self - moved).filtered(lambda click: click.converted != bool(vals['converted']))
+        stats._add_clicks(moved, sign=-1)
+        result = super().write(vals)
+        stats._add_clicks(moved)
+        if flipped:
+            stats._add_clicks(flipped, conversions_only=True, sign=1 if vals['converted'] else -1)
+        return result
+
+    def unlink(self):
+        self.env['referral.daily.stat'].sudo()._add_clicks(self, sign=-1)
+        return super().unlink()
+
     def _generate_device_fingerprint(self, ip_address, user_agent):
         """Generate device fingerprint from IP and User Agent"""
         if not ip_address or not user_agent:
@@ -138,7 +243,15 @@ class ReferralLinkClick(models.Model):
     def track_click(self, referral_code, ip_address=None, user_agent=None, 
                     utm_source=None, utm_medium=None, utm_campaign=None, 
                     utm_content=None, referrer_url=None):
-        """Track a click on a referral link"""
+        """Track a click on a referral link
+
+        The click is counted and queued with one statement on shared tables (see
+        init): per-minute counters give the fraud counts with index range scans, and
+        the table of known devices gives uniqueness. The click itself, and the fraud
+        detections it raises, are written in batches by _cron_flush_click_queue().
+
+        :return: True if the click was tracked, False on error
+        """
         try:
             # Get IP from request if not provided
             if not ip_address:
@@ -161,29 +274,132 @@ class ReferralLinkClick(models.Model):
             # Generate device fingerprint
             device_fingerprint = self._generate_device_fingerprint(ip_address, user_agent)
             
-            # Create click record - use sudo() to bypass access rights and use system user
-            # This ensures computed fields also write with valid user
-            click_vals = {
-                'referral_code': referral_code,
-                'ip_address': ip_address,
-                'user_agent': user_agent,
-                'device_fingerprint': device_fingerprint,
-                'utm_source': utm_source,
-                'utm_medium': utm_medium,
-                'utm_campaign': utm_campaign,
-                'utm_content': utm_content,
-                'referrer_url': referrer_url,
-            }
-            
-            # Use sudo() to ensure all operations (including computed fields) use system user
-            # The key is that self.env already has sudo() from controller call
-            click = self.env['referral.link.click'].create(click_vals)
-            _logger.info(f"Tracked click for referral code {referral_code}, click ID: {click.id}")
-            return click
+            click_date = fields.Datetime.now()
+            minute = click_date.replace(second=0, microsecond=0)
+            day, hour = minute - timedelta(days=1), minute - timedelta(hours=1)
+
+            def hits(kind, key, since):
+                # this click included: the statement does not see its own upsert
+                return SQL("""1 + (SELECT COALESCE(SUM(hits), 0) FROM referral_click_counter
+                                    WHERE referral_code = %s AND kind = %s AND key = %s AND minute > %s)""",
+                           referral_code, kind, key, since)
+
+            counters = [('visitor', f"{ip_address or ''}|{device_fingerprint or ''}")]
+            if ip_address:
+                counters.append(('ip', ip_address))
+            if device_fingerprint:
+                counters.append(('device', device_fingerprint))
+                device = SQL("""
+                    INSERT INTO referral_click_device (referral_code, device_fingerprint) VALUES (%s, %s)
+                    ON CONFLICT DO NOTHING RETURNING 1
+                """, referral_code, device_fingerprint)
+            else:
+                device = SQL("SELECT 1 WHERE FALSE")
+            click = dict(zip(QUEUED_CLICK_FIELDS, (
+                ip_address, user_agent, device_fingerprint, utm_source, utm_medium,
+                utm_campaign, utm_content, referrer_url,
+            )))
+            self.env.cr.execute(SQL("""
+                WITH device AS (%(device)s),
+                     counter AS (
+                        INSERT INTO referral_click_counter (referral_code, kind, key, minute, hits)
+                        VALUES %(counters)s
+                        ON CONFLICT (referral_code, kind, key, minute)
+                        DO UPDATE SET hits = referral_click_counter.hits + 1
+                     )
+                INSERT INTO referral_click_queue (referral_code, click_date, click, ip_hits, device_hits,
+                                                  visitor_hits, is_unique)
+                     SELECT %(code)s, %(click_date)s, %(click)s::jsonb, %(ip_hits)s, %(device_hits)s,
+                            %(visitor_hits)s, EXISTS (SELECT 1 FROM device)
+            """,
+                device=device,
+                counters=SQL(", ").join(
+                    SQL("(%s, %s, %s, %s, 1)", referral_code, kind, key, minute) for kind, key in counters
+                ),
+                code=referral_code,
+                click_date=click_date,
+                click=json.dumps(click),
+                ip_hits=hits('ip', ip_address, day) if ip_address else None,
+                device_hits=hits('device', device_fingerprint, day) if device_fingerprint else None,
+                visitor_hits=hits('visitor', counters[0][1], hour),
+            ))
+            _logger.info(f"Tracked click for referral code {referral_code}")
+            return True
         except Exception as e:
             _logger.error(f"Error tracking click: {str(e)}", exc_info=True)
             return False
 
+    @api.model
+    def _flush_click_queue(self, referral_code=None, limit=FLUSH_BATCH_SIZE):
+        """Write the oldest ``limit`` clicks queued by track_click(), all codes or ``referral_code`` only,
+        and create the fraud detections they raised
+
+        Queued rows locked by a concurrent flush are skipped.
+        """
+        condition = SQL("referral_code = %s", referral_code) if referral_code else SQL("TRUE")
+        self.env.cr.execute(SQL("""
+            DELETE FROM referral_click_queue
+             WHERE id IN (SELECT id FROM referral_click_queue WHERE %s
+                          ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)
+         RETURNING id, referral_code, click_date, click, ip_hits, device_hits, visitor_hits, is_unique
+        """, condition, limit))
+        rows = sorted(self.env.cr.fetchall())
+        if not rows:
+            return self.browse()
+
+        Partner = self.env['res.partner']
+        vals_list, detections = [], []
+        for _id, code, click_date, click, ip_hits, device_hits, visitor_hits, is_unique in rows:
+            vals_list.append(dict(
+                click,
+                referral_code=code,
+                partner_id=Partner._get_referral_partner_id(code),
+                click_date=click_date,
+                is_unique=is_unique,
+            ))
+            raised = []
+            if ip_hits and ip_hits > DUPLICATE_THRESHOLD:
+                raised.append(dict(detection_type='duplicate_ip', count=ip_hits, window=24,
+                                   limit=DUPLICATE_THRESHOLD))
+            if device_hits and device_hits > DUPLICATE_THRESHOLD:
+                raised.append(dict(detection_type='duplicate_device', count=device_hits, window=24,
+                                   limit=DUPLICATE_THRESHOLD))
+            if visitor_hits > VELOCITY_THRESHOLD:
+                raised.append(dict(detection_type='velocity_exceeded', count=visitor_hits, window=1,
+                                   limit=VELOCITY_THRESHOLD))
+            for detection in raised:
+                detection.update(referral_code=code, ip_address=click['ip_address'],
+                                 device_fingerprint=click['device_fingerprint'])
+            detections += raised
+        clicks = self.create(vals_list)
+        if detections:
+            self.env['referral.fraud.detection']._create_click_detections(detections)
+        return clicks
+
+    @api.model
+    def _cron_flush_click_queue(self, batch_size=FLUSH_BATCH_SIZE):
+        """Write the clicks queued by track_click(), one transaction per batch"""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        flushed = 0
+        while True:
+            clicks = self._flush_click_queue(limit=batch_size)
+            flushed += len(clicks)
+            if auto_commit:
+                self.env.cr.commit()
+            if len(clicks) < batch_size:
+                break
+        if flushed:
+            _logger.info("Wrote %s queued referral clicks", flushed)
+        return flushed
+
+    @api.autovacuum
+    def _gc_click_counters(self):
+        """Drop the click counters older than the longest fraud check window"""
+        self.env.cr.execute(SQL(
+            "DELETE FROM referral_click_counter WHERE minute <= %s",
+            fields.Datetime.now() - timedelta(days=1) - timedelta(minutes=1),
+        ))
+
     def mark_as_converted(self, partner_id):
         """Mark this click as converted (led to signup)"""
         self.write({
@@ -245,10 +461,7 @@ class ReferralShare(models.Model):
         """Find partner by referral code"""
         for share in self:
             if share.referral_code:
-                partner = self.env['res.partner'].sudo().search([
-                    ('referral_code', '=', share.referral_code)
-                ], limit=1)
-                share.partner_id = partner.id if partner else False
+                share.partner_id = self.env['res.partner']._get_referral_partner_id(share.referral_code)
 
     @api.depends('referral_code', 'share_date')
     def _compute_clicks_generated(self):
@@ -370,9 +583,7 @@ class ReferralFraudDetection(models.Model):
         
         if len(recent_clicks) > 10:  # Threshold: more than 10 clicks from same IP
             self.sudo().create({
-                'partner_id': self.env['res.partner'].sudo().search([
-                    ('referral_code', '=', referral_code)
-                ], limit=1).id,
+                'partner_id': self.env['res.partner']._get_referral_partner_id(referral_code),
                 'referral_code': referral_code,
                 'detection_type': 'duplicate_ip',
                 'severity': 'high' if len(recent_clicks) > 50 else 'medium',
@@ -398,9 +609,7 @@ class ReferralFraudDetection(models.Model):
         
         if len(recent_clicks) > 10:
             self.sudo().create({
-                'partner_id': self.env['res.partner'].sudo().search([
-                    ('referral_code', '=', referral_code)
-                ], limit=1).id,
+                'partner_id': self.env['res.partner']._get_referral_partner_id(referral_code),
                 'referral_code': referral_code,
                 'detection_type': 'duplicate_device',
                 'severity': 'high' if len(recent_clicks) > 50 else 'medium',
@@ -432,9 +641,7 @@ class ReferralFraudDetection(models.Model):
         
         if len(recent_clicks) > max_clicks_per_hour:
             self.sudo().create({
-                'partner_id': self.env['res.partner'].sudo().search([
-                    ('referral_code', '=', referral_code)
-                ], limit=1).id,
+                'partner_id': self.env['res.partner']._get_referral_partner_id(referral_code),
                 'referral_code': referral_code,
                 'detection_type': 'velocity_exceeded',
                 'severity': 'high' if len(recent_clicks) > max_clicks_per_hour * 2 else 'medium',
@@ -446,12 +653,66 @@ class ReferralFraudDetection(models.Model):
             return True
         return False
 
+    @api.model
+    def _create_click_detections(self, detections):
+        """Create the detections raised by tracked clicks
+
+        A burst of clicks raises the same detection on every click; only the one
+        with the highest count is kept per batch.
+        """
+        latest = {}
+        for detection in detections:
+            key = (detection['detection_type'], detection['referral_code'],
+                   detection['ip_address'], detection['device_fingerprint'])
+            if key not in latest or latest[key]['count'] < detection['count']:
+                latest[key] = detection
+
+        vals_list = []
+        for detection in latest.values():
+            count = detection['count']
+            window = detection['window']
+            domain = [
+                ('referral_code', '=', detection['referral_code']),
+                ('click_date', '>=', fields.Datetime.now() - timedelta(hours=window)),
+            ]
+            vals = {
+                'partner_id': self.env['res.partner']._get_referral_partner_id(detection['referral_code']),
+                'referral_code': detection['referral_code'],
+                'detection_type': detection['detection_type'],
+            }
+            if detection['detection_type'] == 'duplicate_ip':
+                domain.append(('ip_address', '=', detection['ip_address']))
+                vals.update(
+                    severity='high' if count > 50 else 'medium',
+                    description=f'Multiple clicks ({count}) from same IP ({detection["ip_address"]}) within {window} hours',
+                    ip_address=detection['ip_address'],
+                )
+            elif detection['detection_type'] == 'duplicate_device':
+                domain.append(('device_fingerprint', '=', detection['device_fingerprint']))
+                vals.update(
+                    severity='high' if count > 50 else 'medium',
+                    description=f'Multiple clicks ({count}) from same device within {window} hours',
+                    device_fingerprint=detection['device_fingerprint'],
+                )
+            else:
+                if detection['ip_address']:
+                    domain.append(('ip_address', '=', detection['ip_address']))
+                if detection['device_fingerprint']:
+                    domain.append(('device_fingerprint', '=', detection['device_fingerprint']))
+                vals.update(
+                    severity='high' if count > detection['limit'] * 2 else 'medium',
+                    description=f'Velocity check failed: {count} clicks in last hour (limit: {detection["limit"]})',
+                    ip_address=detection['ip_address'],
+                    device_fingerprint=detection['device_fingerprint'],
+                )
+            vals['flagged_clicks'] = [(6, 0, self.env['referral.link.click'].search(domain).ids)]
+            vals_list.append(vals)
+        return self.sudo().create(vals_list)
+
     @api.model
     def check_self_referral(self, referral_code, ip_address, device_fingerprint):
         """Check if someone is trying to refer themselves"""
-        partner = self.env['res.partner'].search([
-            ('referral_code', '=', referral_code)
-        ], limit=1)
+        partner = self.env['res.partner'].get_partner_by_referral_code(referral_code)
         
         if not partner:
             return False
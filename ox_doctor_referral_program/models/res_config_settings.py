@@ -21,6 +21,13 @@ class ResConfigSettings(models.TransientModel):
         help='Automatically grant promo rewards when conditions are met'
     )
     
+    live_referral_stats = fields.Boolean(
+        string='Live Referral Statistics',
+        config_parameter='ox_doctor_referral_program.live_referral_stats',
+        help='Compute the click and revenue statistics of referrers from clicks and orders on every read, '
+             'instead of the daily statistics refreshed when orders are confirmed'
+    )
+    
     reward_rules_count = fields.Integer(
         string='Reward Rules Count',
         compute='_compute_reward_rules_count',
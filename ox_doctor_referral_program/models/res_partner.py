@@ -1,13 +1,53 @@
 # -*- coding: utf-8 -*-
 
-import secrets
-import string
+import hashlib
+import hmac
+
+import psycopg2
 from odoo import models, fields, api, SUPERUSER_ID
 from odoo.exceptions import UserError, ValidationError
+from odoo.osv import expression
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+from odoo.tools.sql import create_index
 import logging
 
+from .cache_version import bump_cache_version
+
 _logger = logging.getLogger(__name__)
 
+# Referral codes are 8 Crockford base32 characters (40 bits) encoding a number of a database sequence
+REFERRAL_CODE_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+REFERRAL_CODE_LENGTH = 8
+REFERRAL_CODE_BITS = 5 * REFERRAL_CODE_LENGTH
+# Sequence numbers go through a Feistel network keyed by the database secret: a permutation of
+# the 40-bit numbers (distinct numbers, distinct codes) that can't be inverted without the key
+REFERRAL_CODE_ROUNDS = 4
+REFERRAL_CODE_HALF_BITS = REFERRAL_CODE_BITS // 2
+REFERRAL_CODE_HALF_MASK = (1 << REFERRAL_CODE_HALF_BITS) - 1
+
+# Owners of referral codes looked up by this process, {(dbname, code): (version, partner id)}.
+# Only codes that exist are kept, so random codes sent to the public routes never fill it.
+REFERRAL_CODE_CACHE = LRU(4096)
+# Version of the cached owners, see cache_version
+REFERRAL_CODE_VERSION_KEY = 'ox_doctor_referral_program.referral_code_version'
+REFERRAL_CODE_VERSION_SEQUENCE = 'res_partner_referral_code_version_seq'
+
+
+def encode_referral_code(number, key):
+    """Referral code of a sequence number, for the secret ``key`` (bytes)"""
+    left, right = divmod(number % (1 << REFERRAL_CODE_BITS), 1 << REFERRAL_CODE_HALF_BITS)
+    for index in range(REFERRAL_CODE_ROUNDS):
+        digest = hmac.new(key, b'%d:%d' % (index, right), hashlib.sha256).digest()
+        left, right = right, left ^ (int.from_bytes(digest[:4], 'big') & REFERRAL_CODE_HALF_MASK)
+    value = (left << REFERRAL_CODE_HALF_BITS) | right
+    chars = []
+    for _index in range(REFERRAL_CODE_LENGTH):
+        chars.append(REFERRAL_CODE_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
 # Try to import request (available in HTTP context)
 try:
     from odoo.http import request
@@ -22,7 +62,7 @@ class ResPartner(models.Model):
     referral_code = fields.Char(
         string='Referral Code',
         copy=False,
-        index=True,
+        index=False,  # partial unique index, see init()
         help='Unique referral code for generating affiliate links'
     )
     referral_link = fields.Char(
@@ -35,6 +75,7 @@ class ResPartner(models.Model):
         'res.partner',
         string='Referred By',
         ondelete='set null',
+        index=True,
         help='The doctor/partner who referred this doctor'
     )
     referral_level = fields.Integer(
@@ -101,9 +142,24 @@ class ResPartner(models.Model):
         'res.partner',
         string='Doctor 1',
         compute='_compute_doctor_1_id',
-        store=False,
+        store=True,
+        index=True,
         help='The Doctor 1 in this referral chain (for promo rewards)'
     )
+
+    # Materialized referral tree, maintained like Odoo's parent_path (see _update_referral_path)
+    referral_path = fields.Char(
+        string='Referral Path',
+        readonly=True,
+        copy=False,
+        help='Ids of the referral chain from its root down to this partner, as "12/45/78/"'
+    )
+    referral_depth = fields.Integer(
+        string='Referral Depth',
+        compute='_compute_referral_depth',
+        store=True,
+        help='Number of referrers above this partner in the referral chain'
+    )
     
     # Analytics fields (computed from tracking data)
     total_clicks = fields.Integer(
@@ -160,6 +216,58 @@ class ResPartner(models.Model):
         readonly=True
     )
 
+    def init(self):
+        super().init()
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS res_partner_referral_code_seq")
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {REFERRAL_CODE_VERSION_SEQUENCE}")
+        self._create_unique_code_index()
+        # prefix searches on the path ("everyone below X") need the pattern operator class
+        create_index(self.env.cr, 'res_partner_referral_path_index', self._table,
+                     ['referral_path text_pattern_ops'], where='referral_path IS NOT NULL')
+        self.env.cr.execute("SELECT 1 FROM res_partner WHERE referral_path IS NULL LIMIT 1")
+        if self.env.cr.rowcount:
+            self._init_referral_tree()
+
+    def _create_unique_code_index(self):
+        """Unique index on the set referral codes; a plain one if existing codes are duplicated"""
+        cr = self.env.cr
+        where = "referral_code IS NOT NULL AND referral_code != ''"
+        cr.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'res_partner_referral_code_uniq'")
+        if cr.rowcount:
+            return
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute(f"CREATE UNIQUE INDEX res_partner_referral_code_uniq ON res_partner (referral_code) WHERE {where}")
+        except psycopg2.IntegrityError:
+            _logger.warning("Duplicate referral codes exist, referral_code is indexed without uniqueness")
+            create_index(cr, 'res_partner_referral_code_index', self._table, ['referral_code'], where=where)
+
+    def _init_referral_tree(self):
+        """Compute the referral path of every partner from referred_by_id"""
+        self.env.cr.execute("""
+            WITH RECURSIVE tree AS (
+                SELECT id, id || '/' AS path
+                  FROM res_partner
+                 WHERE referred_by_id IS NULL
+             UNION ALL
+                SELECT partner.id, tree.path || partner.id || '/'
+                  FROM res_partner partner
+                  JOIN tree ON tree.id = partner.referred_by_id
+            )
+            UPDATE res_partner partner
+               SET referral_path = tree.path
+              FROM tree
+             WHERE tree.id = partner.id AND partner.referral_path IS DISTINCT FROM tree.path
+         RETURNING partner.id
+        """)
+        updated = self.browse([row[0] for row in self.env.cr.fetchall()])
+        self.env.cr.execute("SELECT id FROM res_partner WHERE referral_path IS NULL")
+        cyclic_ids = [row[0] for row in self.env.cr.fetchall()]
+        if cyclic_ids:
+            _logger.warning("Partners %s are in a referral cycle, they have no referral path", cyclic_ids)
+        updated.invalidate_recordset(['referral_path'])
+        updated.modified(['referral_path'])
+
     @api.depends('is_salesperson_onboarded', 'is_doctor_referred', 'referral_level', 'referral_type')
     def _compute_referral_type(self):
         """Compute referral type based on flags and level
@@ -246,6 +354,12 @@ class ResPartner(models.Model):
               Internal user = has base.group_user in groups_id
         """
         user_group_id = self.env['ir.model.data']._xmlid_to_res_id('base.group_user')
+        # Doctor 1 of everyone below a partner whose flag flips must be recomputed
+        stored = self.filtered('id')
+        was_doctor_1 = set()
+        if stored:
+            self.env.cr.execute(SQL("SELECT id FROM res_partner WHERE id IN %s AND is_doctor_1", tuple(stored.ids)))
+            was_doctor_1 = {row[0] for row in self.env.cr.fetchall()}
         for partner in self:
             # CRITICAL: Internal users (salespersons) CANNOT be Doctor 1
             # Only portal users (doctors) can be Doctor 1
@@ -294,33 +408,108 @@ class ResPartner(models.Model):
                 (is_referred_by_internal_user or not partner.referred_by_id)
             )
 
-    @api.depends('referred_by_id', 'referred_by_id.is_doctor_1', 'referred_by_id.referred_by_id', 'is_doctor_1')
+        flipped = stored.filtered(lambda partner: partner.is_doctor_1 != (partner.id in was_doctor_1))
+        descendants = flipped.sudo().with_context(active_test=False)._get_referral_descendants()
+        if descendants:
+            self.env.add_to_compute(self._fields['doctor_1_id'], descendants)
+
+    @api.depends('referral_path', 'is_doctor_1')
     def _compute_doctor_1_id(self):
-        """Find Doctor 1 in the referral chain by traversing up
+        """Find Doctor 1 in the referral chain: the nearest referrer above that is Doctor 1
         
         If current partner IS Doctor 1, returns False (empty) - they are Doctor 1 themselves.
-        Otherwise, traverses up the referral chain to find Doctor 1.
+        The chain comes from the materialized referral path, so all the referrers of
+        the batch are read at once instead of walking referred_by_id partner by partner.
+        Changes of is_doctor_1 up the chain are propagated by _compute_is_doctor_1.
         """
+        ancestor_ids = {
+            ancestor_id
+            for partner in self
+            for ancestor_id in partner._get_referral_ancestor_ids()
+        }
+        doctor_1_ids = set(self.browse(ancestor_ids).filtered('is_doctor_1').ids)
         for partner in self:
             # If this partner IS Doctor 1, they don't have a Doctor 1 above them
             if partner.is_doctor_1:
                 partner.doctor_1_id = False
                 continue
-            
-            doctor_1 = False
-            current = partner.referred_by_id
-            # Traverse up the referral chain (max depth protection)
-            visited = set()
-            max_depth = 10  # Prevent infinite loops
-            depth = 0
-            while current and current.id not in visited and depth < max_depth:
-                visited.add(current.id)
-                if current.is_doctor_1:
-                    doctor_1 = current
-                    break
-                current = current.referred_by_id
-                depth += 1
-            partner.doctor_1_id = doctor_1
+            partner.doctor_1_id = next(
+                (ancestor_id for ancestor_id in reversed(partner._get_referral_ancestor_ids())
+                 if ancestor_id in doctor_1_ids),
+                False,
+            )
+
+    @api.depends('referral_path')
+    def _compute_referral_depth(self):
+        for partner in self:
+            partner.referral_depth = len(partner._get_referral_ancestor_ids())
+
+    def _get_referral_ancestor_ids(self):
+        """Ids of the referrers above this partner, from the root of the chain down"""
+        self.ensure_one()
+        return [int(partner_id) for partner_id in (self.referral_path or '').split('/')[:-2]]
+
+    def _get_referral_descendants(self):
+        """Partners referred directly or indirectly by these partners"""
+        paths = [path for path in self.mapped('referral_path') if path]
+        if not paths:
+            return self.browse()
+        return self.search(expression.OR([[('referral_path', '=like', f'{path}%')] for path in paths])) - self
+
+    def _init_referral_path(self):
+        """Set the referral path of new partners, who cannot have referred anyone yet"""
+        if not self:
+            return
+        self.flush_recordset(['referred_by_id'])
+        self.env.cr.execute(SQL("""
+            UPDATE res_partner partner
+               SET referral_path = COALESCE(referrer.referral_path, '') || partner.id || '/'
+              FROM res_partner created
+         LEFT JOIN res_partner referrer ON referrer.id = created.referred_by_id
+             WHERE created.id = partner.id AND partner.id IN %s
+        """, tuple(self.ids)))
+        self.invalidate_recordset(['referral_path'])
+        self.modified(['referral_path'])
+
+    def _update_referral_path(self):
+        """Recompute the referral path of these partners and of everyone they referred
+
+        Mirrors Model._parent_store_update(): a move rewrites the path prefix of the
+        whole subtree with one UPDATE, and the stored fields depending on the path
+        (depth, Doctor 1, orders' Doctor 1) are marked to recompute.
+        """
+        self.flush_recordset(['referred_by_id'])
+        cr = self.env.cr
+        updated_ids = []
+        for partner in self:
+            cr.execute(SQL("""
+                SELECT partner.referral_path, COALESCE(referrer.referral_path, '')
+                  FROM res_partner partner
+             LEFT JOIN res_partner referrer ON referrer.id = partner.referred_by_id
+                 WHERE partner.id = %s
+            """, partner.id))
+            old_path, referrer_path = cr.fetchone()
+            if str(partner.id) in referrer_path.split('/'):
+                raise ValidationError(f"Partner {partner.display_name} cannot be referred by someone they referred.")
+            new_path = f'{referrer_path}{partner.id}/'
+            if old_path == new_path:
+                continue
+            if old_path:
+                cr.execute(SQL("""
+                    UPDATE res_partner
+                       SET referral_path = %s || substr(referral_path, %s)
+                     WHERE referral_path LIKE %s
+                 RETURNING id
+                """, new_path, len(old_path) + 1, f'{old_path}%'))
+            else:
+                cr.execute(SQL(
+                    "UPDATE res_partner SET referral_path = %s WHERE id = %s RETURNING id", new_path, partner.id
+                ))
+            updated_ids.extend(row[0] for row in cr.fetchall())
+        if updated_ids:
+            updated = self.browse(updated_ids)
+            updated.invalidate_recordset(['referral_path'])
+            updated.modified(['referral_path'])
 
     @api.depends('referral_code')
     def _compute_referral_link(self):
@@ -335,15 +524,37 @@ class ResPartner(models.Model):
     @api.model
     def _generate_referral_code(self):
         """Generate a unique referral code"""
-        while True:
-            # Generate 8-character alphanumeric code
-            code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
-            if not self.search([('referral_code', '=', code)], limit=1):
-                return code
+        return self._generate_referral_codes(1)[0]
+
+    @api.model
+    def _get_referral_code_key(self):
+        """Key of the referral code permutation, derived from the database secret"""
+        secret = self.env['ir.config_parameter'].sudo().get_param('database.secret') or self.env.cr.dbname
+        return hmac.new(secret.encode(), b'ox_doctor_referral_program.referral_code', hashlib.sha256).digest()
+
+    def _generate_referral_codes(self, count):
+        """``count`` unique referral codes, from the referral code sequence
+
+        Generated codes never collide with each other; the few that may match a
+        code set by hand or by the former random generator are replaced.
+        """
+        if count <= 0:
+            return []
+        cr = self.env.cr
+        cr.execute(SQL("SELECT nextval('res_partner_referral_code_seq') FROM generate_series(1, %s)", count))
+        key = self._get_referral_code_key()
+        codes = [encode_referral_code(number, key) for number, in cr.fetchall()]
+        self.flush_model(['referral_code'])
+        cr.execute(SQL("SELECT referral_code FROM res_partner WHERE referral_code IN %s", tuple(codes)))
+        taken = {code for code, in cr.fetchall()}
+        if taken:
+            codes = [code for code in codes if code not in taken] + self._generate_referral_codes(len(taken))
+        return codes
 
     @api.depends('click_ids', 'click_ids.converted')
     def _compute_referral_stats(self):
-        """Compute referral statistics from tracking data"""
+        """Compute referral statistics from tracking data, for the whole recordset at once"""
+        stats = self._get_referral_stats()
         for partner in self:
             if not partner.referral_code:
                 partner.total_clicks = 0
@@ -352,26 +563,63 @@ class ResPartner(models.Model):
                 partner.total_revenue = 0.0
                 continue
             
-            clicks = partner.click_ids
-            partner.total_clicks = len(clicks)
-            partner.unique_clicks = len(clicks.filtered('is_unique'))
+            total_clicks, unique_clicks, converted_clicks, revenue = stats.get(partner._origin.id, (0, 0, 0, 0.0))
+            partner.total_clicks = total_clicks
+            partner.unique_clicks = unique_clicks
             
             # Calculate conversion rate
-            converted_clicks = len(clicks.filtered('converted'))
             if partner.total_clicks > 0:
                 partner.conversion_rate = (converted_clicks / partner.total_clicks) * 100
             else:
                 partner.conversion_rate = 0.0
             
-            # Calculate total revenue from referred partners
-            referred_partners = self.env['res.partner'].search([
-                ('referred_by_id', '=', partner.id)
-            ])
-            orders = self.env['sale.order'].search([
-                ('partner_id', 'in', referred_partners.ids),
-                ('state', 'in', ['sale', 'done'])
-            ])
-            partner.total_revenue = sum(orders.mapped('amount_total'))
+            # Total revenue of the confirmed orders of referred partners
+            partner.total_revenue = revenue
+
+    def _get_referral_stats(self):
+        """{partner id: (clicks, unique clicks, converted clicks, referred customers revenue)}
+
+        Read from the daily rollup (referral.daily.stat), which is refreshed when
+        orders are confirmed, or straight from clicks and orders with grouped
+        queries when the "live referral stats" setting is on.
+        """
+        partner_ids = tuple(partner_id for partner_id in self._origin.ids if partner_id)
+        if not partner_ids:
+            return {}
+        cr = self.env.cr
+        live = self.env['ir.config_parameter'].sudo().get_param('ox_doctor_referral_program.live_referral_stats')
+        if not live:
+            self.env['referral.daily.stat'].flush_model()
+            cr.execute(SQL("""
+                SELECT partner_id, SUM(clicks), SUM(unique_clicks), SUM(conversions), SUM(revenue)
+                  FROM referral_daily_stat
+                 WHERE partner_id IN %s
+              GROUP BY partner_id
+            """, partner_ids))
+            return {partner_id: tuple(counters) for partner_id, *counters in cr.fetchall()}
+
+        self.env['referral.link.click'].flush_model(['partner_id', 'is_unique', 'converted'])
+        self.env['sale.order'].flush_model(['partner_id', 'state', 'amount_total'])
+        self.flush_model(['referred_by_id', 'active'])
+        stats = {}
+        cr.execute(SQL("""
+            SELECT partner_id, COUNT(*), COUNT(*) FILTER (WHERE is_unique), COUNT(*) FILTER (WHERE converted)
+              FROM referral_link_click
+             WHERE partner_id IN %s
+          GROUP BY partner_id
+        """, partner_ids))
+        for partner_id, clicks, unique_clicks, converted_clicks in cr.fetchall():
+            stats[partner_id] = (clicks, unique_clicks, converted_clicks, 0.0)
+        cr.execute(SQL("""
+            SELECT referred.referred_by_id, SUM(so.amount_total)
+              FROM sale_order so
+              JOIN res_partner referred ON referred.id = so.partner_id
+             WHERE referred.referred_by_id IN %s AND referred.active AND so.state IN ('sale', 'done')
+          GROUP BY referred.referred_by_id
+        """, partner_ids))
+        for partner_id, revenue in cr.fetchall():
+            stats[partner_id] = stats.get(partner_id, (0, 0, 0))[:3] + (float(revenue),)
+        return stats
 
     @api.depends('referral_code')
     def _compute_qr_code_url(self):
@@ -447,12 +695,13 @@ class ResPartner(models.Model):
             else:
                 _logger.info(f"[res.partner.create] No referral code in context either. Context keys: {list(self.env.context.keys())}")
         
+        # Generate referral codes if not provided
+        missing_codes = [vals for vals in vals_list if not vals.get('referral_code')]
+        for vals, code in zip(missing_codes, self._generate_referral_codes(len(missing_codes))):
+            vals['referral_code'] = code
+
         # Process referral code for each partner if not already set
         for vals in vals_list:
-            # Generate referral code if not provided
-            if 'referral_code' not in vals or not vals.get('referral_code'):
-                vals['referral_code'] = self._generate_referral_code()
-            
             # If referral code found and referred_by_id not set, look it up
             if referral_code and 'referred_by_id' not in vals:
                 referring_partner = self.get_partner_by_referral_code(referral_code)
@@ -466,6 +715,7 @@ class ResPartner(models.Model):
         # Call super() - this will call ox_own_contacts_visibility.create() if installed
         # which sets user_id to creator if not already set
         partners = super().create(vals_list)
+        partners._init_referral_path()
         
         # Post-process: update referral chain and salesperson assignment
         # This runs AFTER ox_own_contacts_visibility logic, so we can override if needed
@@ -473,7 +723,9 @@ class ResPartner(models.Model):
             # Mark click as converted if partner was created from referral link
             if referral_code:
                 try:
-                    # Find recent click for this referral code and mark as converted
+                    # Find recent click for this referral code and mark as converted;
+                    # it may still be queued, see track_click()
+                    self.env['referral.link.click'].sudo()._flush_click_queue(referral_code)
                     click = self.env['referral.link.click'].sudo().search([
                         ('referral_code', '=', referral_code),
                         ('converted', '=', False)
@@ -1032,8 +1284,21 @@ class ResPartner(models.Model):
             f"is_doctor_1: {vals.get('is_doctor_1', 'NOT SET')}"
         )
 
+        if 'referred_by_id' in vals:
+            # orders of these partners move to another referrer in the daily rollup
+            self.env['referral.daily.stat'].sudo()._mark_orders_dirty(partners=self)
+
+        # codes changing hands or archived partners: cached owners are stale
+        stale_codes = (('referral_code' in vals or ('active' in vals and not vals['active']))
+                       and any(self.mapped('referral_code')))
+
         result = super().write(vals)
 
+        if 'referred_by_id' in vals:
+            self._update_referral_path()
+        if stale_codes:
+            self._bump_referral_code_version()
+
         # Log state after write
         for partner in self:
             _logger.info(
@@ -1077,7 +1342,51 @@ class ResPartner(models.Model):
     @api.model
     def get_partner_by_referral_code(self, code):
         """Get partner by referral code"""
-        return self.search([('referral_code', '=', code)], limit=1)
+        return self.browse(self._get_referral_partner_id(code))
+
+    @api.model
+    def _get_referral_partner_id(self, code):
+        """Id of the active partner owning a referral code, or False
+
+        Owners are cached in the process until a referral code is changed or
+        removed; unknown codes are never cached.
+        """
+        if not code:
+            return False
+        cr = self.env.cr
+        cache_key = (cr.dbname, code)
+        version = cr.cache.get(REFERRAL_CODE_VERSION_KEY)
+        if version is not None:
+            cached = REFERRAL_CODE_CACHE.get(cache_key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        self.flush_model(['referral_code', 'active'])
+        cr.execute(SQL("""
+            SELECT (SELECT value FROM ir_config_parameter WHERE key = %s),
+                   (SELECT id FROM res_partner WHERE referral_code = %s AND active ORDER BY id LIMIT 1)
+        """, REFERRAL_CODE_VERSION_KEY, code))
+        version, partner_id = cr.fetchone()
+        version = cr.cache[REFERRAL_CODE_VERSION_KEY] = version or '0'
+        if not partner_id:
+            return False
+        REFERRAL_CODE_CACHE[cache_key] = (version, partner_id)
+        return partner_id
+
+    def _bump_referral_code_version(self):
+        """Invalidate the cached owners of referral codes, in every process once committed"""
+        bump_cache_version(self.env, REFERRAL_CODE_VERSION_KEY, REFERRAL_CODE_VERSION_SEQUENCE)
+
+    def unlink(self):
+        has_codes = any(self.mapped('referral_code'))
+        # the database sets their referred_by_id to null, they become roots of their own chain
+        orphans = self.with_context(active_test=False).search([
+            ('referred_by_id', 'in', self.ids), ('id', 'not in', self.ids),
+        ])
+        result = super().unlink()
+        orphans._update_referral_path()
+        if has_codes:
+            self._bump_referral_code_version()
+        return result
     
     @api.model
     def fix_internal_user_referral_flags(self):
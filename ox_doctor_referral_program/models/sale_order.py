@@ -48,10 +48,17 @@ class SaleOrder(models.Model):
             else:
                 order.referral_doctor_1_id = False
 
+    def _compute_amounts(self):
+        super()._compute_amounts()
+        confirmed = self._origin.filtered(lambda order: order.state in ('sale', 'done'))
+        if confirmed:
+            self.env['referral.daily.stat'].sudo()._mark_orders_dirty(orders=confirmed, current_keys=False)
+
     @api.model_create_multi
     def create(self, vals_list):
         """Assign salesperson based on referral chain"""
         orders = super().create(vals_list)
+        self.env['referral.daily.stat'].sudo()._mark_orders_dirty(orders=orders, current_keys=False)
         
         # Process salesperson assignment after creation
         for order in orders:
@@ -61,6 +68,8 @@ class SaleOrder(models.Model):
 
     def write(self, vals):
         """Handle salesperson assignment when partner changes"""
+        if not {'state', 'date_order', 'partner_id'}.isdisjoint(vals):
+            self.env['referral.daily.stat'].sudo()._mark_orders_dirty(orders=self)
         result = super().write(vals)
         
         # If partner_id changed, check for salesperson assignment
@@ -106,65 +115,57 @@ class SaleOrder(models.Model):
         return result
 
     def _check_promo_reward_eligibility(self):
-        """Check if Doctor 1 is eligible for promo reward using reward rules"""
-        for order in self:
-            # Only process if:
-            # 1. Order is confirmed
-            # 2. Has Doctor 1 in referral chain
-            # 3. Promo reward not already granted
-            if (order.state not in ['sale', 'done'] or 
-                not order.referral_doctor_1_id or 
-                order.promo_reward_granted):
-                continue
-            
-            # Check referral level - only grant if referred by Doctor 1, 2, 3, or 4
-            # (Level 1 or 2 in referral chain, where level 0 = Doctor 1, level 1 = Doctor 2/3/4)
-            # Doctor 1 boundary is 1 level - so Doctor 1 gets rewards for referrals of Doctor 2, 3, 4
-            if order.partner_id.referral_level not in [1, 2]:
-                continue
-            
-            # Get active reward rules for current company
-            reward_rules = self.env['referral.reward.rule'].search([
-                ('active', '=', True),
-                ('company_id', '=', order.company_id.id)
-            ], order='sequence, id')
-            
-            if not reward_rules:
-                # Fallback to legacy configuration if no rules exist
-                self._check_legacy_reward_eligibility(order)
-                continue
-            
-            # Check each reward rule
-            for rule in reward_rules:
-                is_eligible, matched_qty, matched_revenue, reward_product = rule.check_order_eligibility(order)
-                
-                if is_eligible and reward_product:
-                    _logger.info(
-                        f"[sale.order] Order {order.id} qualifies for reward rule '{rule.name}'. "
-                        f"Matched Qty: {matched_qty}, Revenue: {matched_revenue}. "
-                        f"Reward Product: {reward_product.name}. "
-                        f"Doctor 1: {order.referral_doctor_1_id.id}"
-                    )
-                    
-                    # Create promo reward record
-                    self.env['referral.reward'].create({
-                        'doctor_1_id': order.referral_doctor_1_id.id,
-                        'referred_doctor_id': order.partner_id.id,
-                        'sale_order_id': order.id,
-                        'vials_purchased': matched_qty,  # Store matched quantity
-                        'reward_type': 'promo_vial',
-                        'product_id': reward_product.id,
-                        'quantity': rule.reward_quantity,
-                        'state': 'pending',
-                    })
-                    
-                    order.promo_reward_granted = True
-                    _logger.info(
-                        f"[sale.order] Created promo reward for Doctor 1 {order.referral_doctor_1_id.id} "
-                        f"from order {order.id} using rule '{rule.name}'"
-                    )
-                    # Only apply first matching rule
-                    break
+        """Check if Doctor 1 is eligible for promo reward using reward rules
+
+        All orders are evaluated at once by the rule engine (see
+        referral.reward.rule._match_orders) and their rewards created in bulk.
+        """
+        # Only process if:
+        # 1. Order is confirmed
+        # 2. Has Doctor 1 in referral chain
+        # 3. Promo reward not already granted
+        # 4. Referred by Doctor 1, 2, 3, or 4 (level 1 or 2 in referral chain)
+        orders = self.filtered(lambda order: (
+            order.state in ['sale', 'done'] and
+            order.referral_doctor_1_id and
+            not order.promo_reward_granted and
+            order.partner_id.referral_level in [1, 2]
+        ))
+        if not orders:
+            return
+
+        rule_model = self.env['referral.reward.rule']
+        for order in orders.filtered(lambda order: not rule_model._get_compiled_rules(order.company_id.id)):
+            # Fallback to legacy configuration if no rules exist
+            self._check_legacy_reward_eligibility(order)
+
+        matches = rule_model._match_orders(orders)
+        if not matches:
+            return
+
+        reward_vals_list = []
+        for order in orders.filtered(lambda order: order.id in matches):
+            rule, matched_qty, matched_revenue, reward_product_id = matches[order.id]
+            _logger.info(
+                f"[sale.order] Order {order.id} qualifies for reward rule '{rule.name}'. "
+                f"Matched Qty: {matched_qty}, Revenue: {matched_revenue}. "
+                f"Reward Product: {reward_product_id}. "
+                f"Doctor 1: {order.referral_doctor_1_id.id}"
+            )
+            reward_vals_list.append({
+                'doctor_1_id': order.referral_doctor_1_id.id,
+                'referred_doctor_id': order.partner_id.id,
+                'sale_order_id': order.id,
+                'vials_purchased': matched_qty,  # Store matched quantity
+                'reward_type': 'promo_vial',
+                'product_id': reward_product_id,
+                'quantity': rule.reward_quantity,
+                'state': 'pending',
+            })
+
+        self.env['referral.reward'].create(reward_vals_list)
+        orders.filtered(lambda order: order.id in matches).promo_reward_granted = True
+        _logger.info(f"[sale.order] Created {len(reward_vals_list)} promo rewards from orders {list(matches)}")
     
     def _check_legacy_reward_eligibility(self, order):
         """Legacy reward check - only used if no reward rules exist"""
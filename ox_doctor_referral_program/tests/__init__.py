@@ -0,0 +1,7 @@
+from . import test_click_tracking
+from . import test_referral_tree
+from . import test_referral_stats
+from . import test_reward_engine
+from . import test_qr_image
+from . import test_referral_codes
+from . import test_referral_daily_stat
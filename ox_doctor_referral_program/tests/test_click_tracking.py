@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.ox_doctor_referral_program.models import res_partner
+
+
+@tagged("post_install", "-at_install")
+class TestClickTracking(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.referrer = cls.env["res.partner"].create({"name": "Dr. Referrer", "referral_code": "TESTCLICK1"})
+        cls.clicks = cls.env["referral.link.click"]
+
+    def _click(self, ip_address="10.0.0.1", user_agent="Mozilla/5.0 (iPhone)"):
+        return self.clicks.track_click("TESTCLICK1", ip_address=ip_address, user_agent=user_agent)
+
+    def _detections(self):
+        return self.env["referral.fraud.detection"].search([("referral_code", "=", "TESTCLICK1")])
+
+    def test_click_referrer_and_uniqueness(self):
+        self.assertTrue(self._click())
+        self.assertTrue(self._click())
+        self.assertTrue(self._click(ip_address="10.0.0.2"))
+        # clicks are queued until the cron writes them
+        self.assertFalse(self.clicks.search([("referral_code", "=", "TESTCLICK1")]))
+        self.assertEqual(len(self.clicks._flush_click_queue()), 3)
+        clicks = self.clicks.search([("referral_code", "=", "TESTCLICK1")], order="id")
+        self.assertEqual(clicks.partner_id, self.referrer)
+        self.assertEqual(clicks.mapped("is_unique"), [True, False, True])
+
+        # a device known from clicks created otherwise does not make a unique click
+        self.clicks.create({
+            "referral_code": "TESTCLICK1",
+            "device_fingerprint": self.clicks._generate_device_fingerprint("10.0.0.3", "Mozilla/5.0 (iPhone)"),
+        })
+        self._click(ip_address="10.0.0.3")
+        self.assertFalse(self.clicks._flush_click_queue().is_unique)
+
+    def test_duplicate_ip_detection(self):
+        for _index in range(10):
+            self._click()
+        self.clicks._flush_click_queue()
+        self.assertFalse(self._detections())
+
+        self._click()
+        self.clicks._flush_click_queue()
+        detections = self._detections()
+        self.assertEqual(set(detections.mapped("detection_type")), {"duplicate_ip", "duplicate_device"})
+        self.assertEqual(detections.partner_id, self.referrer)
+        self.assertEqual(len(detections[0].flagged_clicks), 11)
+
+    def test_queued_clicks_counted(self):
+        # counters are shared and updated when the click is queued, not when it is written
+        for _index in range(12):
+            self._click()
+        self.assertEqual(self.clicks._cron_flush_click_queue(batch_size=5), 12)
+        detections = self._detections()
+        self.assertEqual(sorted(detections.mapped("detection_type")), ["duplicate_device", "duplicate_ip"])
+        self.assertIn("(12)", detections[0].description)
+
+    def test_click_counters_gc(self):
+        self._click()
+        self.env.cr.execute("UPDATE referral_click_counter SET minute = minute - interval '2 days'")
+        self.clicks._gc_click_counters()
+        self.env.cr.execute("SELECT COUNT(*) FROM referral_click_counter WHERE referral_code = 'TESTCLICK1'")
+        self.assertEqual(self.env.cr.fetchone()[0], 0)
+
+    def test_referral_code_cache(self):
+        partners = self.env["res.partner"]
+        self.assertEqual(partners._get_referral_partner_id("TESTCLICK1"), self.referrer.id)
+        self.assertIn((self.env.cr.dbname, "TESTCLICK1"), res_partner.REFERRAL_CODE_CACHE)
+        self.assertFalse(partners._get_referral_partner_id("TESTUNKNOWN"))
+        self.assertNotIn((self.env.cr.dbname, "TESTUNKNOWN"), res_partner.REFERRAL_CODE_CACHE)
+
+        other = partners.create({"name": "Dr. Other", "referral_code": "TESTUNKNOWN"})
+        self.assertEqual(partners._get_referral_partner_id("TESTUNKNOWN"), other.id)
+        self.referrer.active = False
+        self.assertFalse(partners._get_referral_partner_id("TESTCLICK1"))
+        self.referrer.active = True
+        self.referrer.referral_code = "TESTCLICK2"
+        self.assertFalse(partners._get_referral_partner_id("TESTCLICK1"))
+        self.assertEqual(partners._get_referral_partner_id("TESTCLICK2"), self.referrer.id)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from unittest import skipUnless
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.ox_doctor_referral_program.models import referral_qr_image
+
+
+@tagged("post_install", "-at_install")
+@skipUnless(referral_qr_image.HAS_QRCODE, "qrcode library not installed")
+class TestQrImage(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        referral_qr_image.QR_IMAGE_CACHE.clear()
+        self.addCleanup(referral_qr_image.QR_IMAGE_CACHE.clear)
+        self.images = self.env["referral.qr.image"]
+
+    def test_rendered_once(self):
+        url = "https://example.com/ref/click/TESTQR1"
+        key, image = self.images._get_image(url, store=True)
+        self.assertTrue(image.startswith(b"\x89PNG"))
+
+        referral_qr_image.QR_IMAGE_CACHE.clear()
+        with patch.object(referral_qr_image, "render_qr", side_effect=AssertionError("rendered twice")):
+            self.assertEqual(self.images._get_image(url), (key, image))
+
+        svg_key, svg = self.images._get_image(url, image_format="svg")
+        self.assertNotEqual(svg_key, key)
+        self.assertIn(b"<svg", svg)
+        # not a default variant: kept in memory only
+        self.assertFalse(self.images.search_count([("key", "=", svg_key)]))
+
+    def test_prerender(self):
+        self.env["ir.config_parameter"].set_param("web.base.url", "https://example.com")
+        partner = self.env["res.partner"].create({"name": "Dr. QR", "referral_code": "TESTQR2"})
+        self.assertGreaterEqual(self.images._cron_prerender(), 2)
+        self.assertEqual(self.images._cron_prerender(), 0)
+
+        variant = self.images._get_link_variants("https://example.com", partner.referral_code)[0]
+        with patch.object(referral_qr_image, "render_qr", side_effect=AssertionError("not pre-rendered")):
+            key, image = self.images._get_image(*variant)
+        self.assertTrue(image)
+
+    def test_stale_images_removed(self):
+        self.env["ir.config_parameter"].set_param("web.base.url", "https://example.com")
+        partner = self.env["res.partner"].create({"name": "Dr. QR", "referral_code": "TESTQR3"})
+        self.images._cron_prerender()
+        self.images._get_image("https://example.com/ref/click/TESTQR3", box_size=30, store=True)
+        self.assertEqual(self.images.search_count([("url", "like", "%/TESTQR3")]), 3)
+
+        # other sizes go away, then every image of an archived code
+        self.images._cron_prerender()
+        self.assertEqual(self.images.search_count([("url", "like", "%/TESTQR3")]), 2)
+        partner.active = False
+        self.images._cron_prerender()
+        self.assertFalse(self.images.search_count([("url", "like", "%/TESTQR3")]))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.ox_doctor_referral_program.models.res_partner import (
+    REFERRAL_CODE_ALPHABET,
+    REFERRAL_CODE_LENGTH,
+    encode_referral_code,
+)
+
+
+@tagged("post_install", "-at_install")
+class TestReferralCodes(TransactionCase):
+
+    def test_encode_is_unique(self):
+        key = self.env["res.partner"]._get_referral_code_key()
+        codes = {encode_referral_code(number, key) for number in range(1, 10001)}
+        self.assertEqual(len(codes), 10000)
+        for code in codes:
+            self.assertEqual(len(code), REFERRAL_CODE_LENGTH)
+            self.assertTrue(set(code) <= set(REFERRAL_CODE_ALPHABET))
+        # another database (secret) gets other codes
+        self.assertNotEqual(encode_referral_code(1, key), encode_referral_code(1, b"other secret"))
+
+    def test_batch_create(self):
+        partners = self.env["res.partner"].create([{"name": f"Doctor {index}"} for index in range(20)])
+        self.assertEqual(len(set(partners.mapped("referral_code"))), 20)
+        self.assertTrue(all(partners.mapped("referral_code")))
+        partner = partners[5]
+        self.assertEqual(self.env["res.partner"].get_partner_by_referral_code(partner.referral_code), partner)
+
+    def test_taken_code_replaced(self):
+        self.env.cr.execute("SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM res_partner_referral_code_seq")
+        next_code = encode_referral_code(self.env.cr.fetchone()[0], self.env["res.partner"]._get_referral_code_key())
+        manual = self.env["res.partner"].create({"name": "Manual", "referral_code": next_code})
+        generated = self.env["res.partner"].create({"name": "Generated"})
+        self.assertEqual(manual.referral_code, next_code)
+        self.assertTrue(generated.referral_code)
+        self.assertNotEqual(generated.referral_code, next_code)
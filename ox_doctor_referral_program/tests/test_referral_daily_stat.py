@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+MOBILE_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile"
+DESKTOP_AGENT = "Mozilla/5.0 (X11; Linux x86_64)"
+
+
+@tagged("post_install", "-at_install")
+class TestReferralDailyStat(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        partners = cls.env["res.partner"]
+        cls.referrer, cls.other_referrer = partners.create([
+            {"name": "Referrer A", "referral_code": "TESTROLLUPA"},
+            {"name": "Referrer B", "referral_code": "TESTROLLUPB"},
+        ])
+        cls.referred = partners.create({"name": "Referred", "referred_by_id": cls.referrer.id})
+        cls.product = cls.env["product.product"].create({"name": "Vial", "list_price": 100.0})
+
+    def _counters(self, partner):
+        self.env.cr.precommit.run()
+        rows = self.env["referral.daily.stat"].search_read(
+            [("partner_id", "=", partner.id)],
+            ["clicks", "unique_clicks", "conversions", "mobile_clicks", "order_count", "revenue"],
+        )
+        keys = ("clicks", "unique_clicks", "conversions", "mobile_clicks", "order_count", "revenue")
+        return {key: sum(row[key] for row in rows) for key in keys}
+
+    def _assert_rebuild_matches(self):
+        partners = self.referrer | self.other_referrer
+        counters = [self._counters(partner) for partner in partners]
+        self.env["referral.daily.stat"]._rebuild()
+        self.assertEqual([self._counters(partner) for partner in partners], counters)
+
+    def test_clicks_and_orders(self):
+        clicks = self.env["referral.link.click"].create([
+            {"referral_code": "TESTROLLUPA", "ip_address": "10.0.0.1", "user_agent": DESKTOP_AGENT,
+             "device_fingerprint": "device-1"},
+            {"referral_code": "TESTROLLUPA", "ip_address": "10.0.0.2", "user_agent": MOBILE_AGENT,
+             "device_fingerprint": "device-2"},
+            {"referral_code": "TESTROLLUPA", "ip_address": "10.0.0.3", "user_agent": MOBILE_AGENT},
+        ])
+        counters = self._counters(self.referrer)
+        self.assertEqual((counters["clicks"], counters["unique_clicks"], counters["mobile_clicks"]), (3, 2, 2))
+
+        clicks[1].converted = True
+        self.assertEqual(self._counters(self.referrer)["conversions"], 1)
+
+        order = self.env["sale.order"].create({
+            "partner_id": self.referred.id,
+            "order_line": [(0, 0, {"product_id": self.product.id, "product_uom_qty": 2, "price_unit": 100.0})],
+        })
+        self.assertEqual(self._counters(self.referrer)["order_count"], 0)
+        order.action_confirm()
+        counters = self._counters(self.referrer)
+        self.assertEqual((counters["order_count"], counters["revenue"]), (1, order.amount_total))
+        self._assert_rebuild_matches()
+
+        # re-referral moves the orders to the new referrer
+        self.referred.referred_by_id = self.other_referrer
+        self.assertEqual(self._counters(self.referrer)["order_count"], 0)
+        counters = self._counters(self.other_referrer)
+        self.assertEqual((counters["order_count"], counters["revenue"]), (1, order.amount_total))
+
+        # clicks moved to another code or deleted are no longer counted
+        clicks[2].referral_code = "TESTROLLUPB"
+        self.assertEqual(self._counters(self.other_referrer)["clicks"], 1)
+        clicks[1].unlink()
+        counters = self._counters(self.referrer)
+        self.assertEqual((counters["clicks"], counters["conversions"], counters["mobile_clicks"]), (1, 0, 0))
+        self._assert_rebuild_matches()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestReferralStats(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        partners = cls.env["res.partner"]
+        cls.referrers = partners.create([
+            {"name": f"Referrer {index}", "referral_code": f"TESTSTATS{index}"} for index in range(3)
+        ])
+        cls.referred = partners.create({"name": "Referred", "referred_by_id": cls.referrers[0].id})
+        product = cls.env["product.product"].create({"name": "Vial", "list_price": 100.0})
+        order = cls.env["sale.order"].create({
+            "partner_id": cls.referred.id,
+            "order_line": [(0, 0, {"product_id": product.id, "product_uom_qty": 2, "price_unit": 100.0})],
+        })
+        order.action_confirm()
+        cls.revenue = order.amount_total
+
+    def setUp(self):
+        super().setUp()
+        clicks = self.env["referral.link.click"]
+        clicks.track_click("TESTSTATS0", ip_address="10.0.0.1", user_agent="Mozilla/5.0")
+        clicks.track_click("TESTSTATS0", ip_address="10.0.0.1", user_agent="Mozilla/5.0")
+        clicks.track_click("TESTSTATS1", ip_address="10.0.0.2", user_agent="Mozilla/5.0")
+        clicks._flush_click_queue()
+        clicks.search([("referral_code", "=", "TESTSTATS0")], limit=1).mark_as_converted(self.referred.id)
+
+    def _stats(self):
+        self.referrers.invalidate_recordset()
+        return [
+            (partner.total_clicks, partner.unique_clicks, partner.conversion_rate, partner.total_revenue)
+            for partner in self.referrers
+        ]
+
+    def test_rollup_and_live_stats_match(self):
+        expected = [(2, 1, 50.0, self.revenue), (1, 1, 0.0, 0.0), (0, 0, 0.0, 0.0)]
+        self.assertEqual(self._stats(), expected)
+
+        self.env["ir.config_parameter"].set_param("ox_doctor_referral_program.live_referral_stats", True)
+        self.assertEqual(self._stats(), expected)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from odoo.exceptions import ValidationError
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestReferralTree(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        partners = cls.env["res.partner"]
+        cls.doctor_1 = partners.create({"name": "Doctor 1", "is_salesperson_onboarded": True})
+        cls.doctor_2 = partners.create({"name": "Doctor 2", "referred_by_id": cls.doctor_1.id})
+        cls.doctor_3 = partners.create({"name": "Doctor 3", "referred_by_id": cls.doctor_2.id})
+        cls.doctor_4 = partners.create({"name": "Doctor 4", "referred_by_id": cls.doctor_3.id})
+
+    def _path(self, *partners):
+        return "".join(f"{partner.id}/" for partner in partners)
+
+    def test_paths_and_doctor_1(self):
+        self.assertTrue(self.doctor_1.is_doctor_1)
+        self.assertEqual(self.doctor_4.referral_path, self._path(self.doctor_1, self.doctor_2, self.doctor_3, self.doctor_4))
+        self.assertEqual(self.doctor_4.referral_depth, 3)
+        self.assertFalse(self.doctor_1.doctor_1_id)
+        self.assertEqual((self.doctor_2 | self.doctor_3 | self.doctor_4).doctor_1_id, self.doctor_1)
+        self.assertEqual(
+            self.doctor_1._get_referral_descendants(), self.doctor_2 | self.doctor_3 | self.doctor_4
+        )
+        self.assertEqual(self.env["res.partner"].search([("doctor_1_id", "=", self.doctor_1.id)]),
+                         self.doctor_2 | self.doctor_3 | self.doctor_4)
+
+    def test_move_subtree(self):
+        other_root = self.env["res.partner"].create({"name": "Other Root"})
+        self.doctor_3.referred_by_id = other_root
+        self.assertEqual(self.doctor_4.referral_path, self._path(other_root, self.doctor_3, self.doctor_4))
+        self.assertEqual(self.doctor_4.referral_depth, 2)
+        self.assertFalse(self.doctor_4.doctor_1_id)
+
+        with self.assertRaises(ValidationError):
+            other_root.referred_by_id = self.doctor_4
+
+    def test_doctor_1_flag_propagates_down(self):
+        self.doctor_1.is_salesperson_onboarded = False
+        self.assertFalse(self.doctor_1.is_doctor_1)
+        self.assertFalse(self.doctor_4.doctor_1_id)
+
+    def test_unlink_referrer(self):
+        self.doctor_2.unlink()
+        self.assertEqual(self.doctor_4.referral_path, self._path(self.doctor_3, self.doctor_4))
+        self.assertFalse(self.doctor_4.doctor_1_id)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import random
+
+from odoo.tests import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+class RewardReplayMixin:
+    """Replays orders through the rule engine and through the rule-by-rule checks it replaces"""
+
+    def _legacy_matches(self, orders):
+        matches = {}
+        for order in orders:
+            rules = self.env["referral.reward.rule"].search([
+                ("active", "=", True), ("company_id", "=", order.company_id.id)
+            ], order="sequence, id")
+            for rule in rules:
+                is_eligible, matched_qty, matched_revenue, reward_product = rule.check_order_eligibility(order)
+                if is_eligible and reward_product:
+                    matches[order.id] = (rule.id, matched_qty, matched_revenue, reward_product.id)
+                    break
+        return matches
+
+    def _engine_matches(self, orders):
+        return {
+            order_id: (rule.id, matched_qty, matched_revenue, reward_product_id)
+            for order_id, (rule, matched_qty, matched_revenue, reward_product_id)
+            in self.env["referral.reward.rule"]._match_orders(orders).items()
+        }
+
+    def _replay(self, orders):
+        expected = self._legacy_matches(orders)
+        actual = self._engine_matches(orders)
+        self.assertEqual(set(actual), set(expected))
+        for order_id, (rule_id, matched_qty, matched_revenue, reward_product_id) in expected.items():
+            self.assertEqual(actual[order_id][0], rule_id, f"order {order_id}")
+            self.assertAlmostEqual(actual[order_id][1], matched_qty, msg=f"order {order_id}")
+            self.assertAlmostEqual(actual[order_id][2], matched_revenue, places=2, msg=f"order {order_id}")
+            self.assertEqual(actual[order_id][3], reward_product_id, f"order {order_id}")
+        return actual
+
+
+@tagged("post_install", "-at_install")
+class TestRewardEngine(RewardReplayMixin, TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env["referral.reward.rule"].search([]).active = False
+        category_model = cls.env["product.category"]
+        cls.vials = category_model.create({"name": "Vials"})
+        cls.kits = category_model.create({"name": "Kits"})
+        product_model = cls.env["product.product"]
+        cls.platinum = product_model.create({"name": "Platinum Vial", "categ_id": cls.vials.id, "list_price": 100.0})
+        cls.gold = product_model.create({"name": "Gold Vial", "categ_id": cls.vials.id, "list_price": 60.0})
+        cls.kit = product_model.create({"name": "Starter Kit", "categ_id": cls.kits.id, "list_price": 250.0})
+        cls.promo = product_model.create({"name": "Promo Vial", "list_price": 0.0})
+
+        rule_model = cls.env["referral.reward.rule"]
+        cls.qty_rule = rule_model.create({
+            "name": "5 Platinum vials", "sequence": 1, "apply_to_type": "product",
+            "product_ids": [(6, 0, cls.platinum.ids)], "reward_type": "qty", "minimum_qty": 5,
+            "reward_product_id": cls.promo.id, "reward_quantity": 1,
+        })
+        cls.revenue_rule = rule_model.create({
+            "name": "500 on vials", "sequence": 2, "apply_to_type": "category",
+            "product_category_ids": [(6, 0, cls.vials.ids)], "reward_type": "revenue", "minimum_revenue": 500,
+            "reward_product_id": cls.promo.id, "reward_quantity": 2,
+        })
+        cls.kit_rule = rule_model.create({
+            "name": "2 kits", "sequence": 3, "apply_to_type": "product",
+            "product_ids": [(6, 0, cls.kit.ids)], "reward_type": "qty", "minimum_qty": 2,
+            "reward_product_id": cls.promo.id, "reward_quantity": 1,
+        })
+
+        partner_model = cls.env["res.partner"]
+        cls.doctor_1 = partner_model.create({"name": "Doctor 1", "is_salesperson_onboarded": True, "referral_level": 1})
+        cls.doctor_2 = partner_model.create({
+            "name": "Doctor 2", "referred_by_id": cls.doctor_1.id, "referral_level": 2, "is_doctor_referred": True,
+        })
+
+        # "historical" orders: random baskets, seeded so failures replay identically
+        generator = random.Random(48)
+        products = [cls.platinum, cls.gold, cls.kit]
+        cls.orders = cls.env["sale.order"].create([{
+            "partner_id": cls.doctor_2.id,
+            "order_line": [
+                (0, 0, {"product_id": product.id, "product_uom_qty": generator.randint(1, 6)})
+                for product in generator.sample(products, generator.randint(1, 3))
+            ],
+        } for _index in range(60)])
+
+    def test_replay_matches_rule_by_rule_checks(self):
+        matches = self._replay(self.orders)
+        self.assertEqual(
+            {rule_id for rule_id, *_rest in matches.values()},
+            {self.qty_rule.id, self.revenue_rule.id, self.kit_rule.id},
+        )
+
+    def test_rule_change_invalidates_compiled_rules(self):
+        self.kit_rule.minimum_qty = 1
+        self.platinum.active = False
+        self._replay(self.orders)
+
+    def test_confirm_and_grant_in_bulk(self):
+        self.orders.action_confirm()
+        rewards = self.env["referral.reward"].search([("sale_order_id", "in", self.orders.ids)])
+        self.assertEqual(rewards.sale_order_id, self.orders.filtered("promo_reward_granted"))
+        self.assertEqual(set(rewards.mapped("doctor_1_id")), {self.doctor_1})
+
+        self.env["referral.reward"].cron_grant_pending_rewards(batch_size=7)
+        self.assertEqual(set(rewards.mapped("state")), {"granted"})
+        self.assertEqual(len(rewards.reward_order_id), len(rewards))
+        self.assertEqual(set(rewards.reward_order_id.mapped("state")), {"sale"})
+
+
+@tagged("post_install", "-at_install", "-standard", "referral_reward_replay")
+class TestRewardEngineReplay(RewardReplayMixin, TransactionCase):
+    """Replays the confirmed orders of the database through the rule engine.
+
+    Not part of the standard test run, start it with
+    ``--test-tags referral_reward_replay`` on a copy of a production database.
+    ``REFERRAL_REPLAY_ORDERS`` limits the number of orders (latest first).
+    """
+
+    def test_replay_historical_orders(self):
+        orders = self.env["sale.order"].search(
+            [("state", "in", ["sale", "done"])],
+            order="id desc",
+            limit=int(os.environ.get("REFERRAL_REPLAY_ORDERS", 5000)),
+        )
+        matches = self._replay(orders)
+        _logger.info("Replayed %s orders, %s qualify for a reward", len(orders), len(matches))
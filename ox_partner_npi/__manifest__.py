@@ -19,6 +19,9 @@
     "data": [
         # Security
         "security/ir.model.access.csv",
+
+        # Data
+        "data/ir_cron_data.xml",
         
         # Views
         "views/res_partner_view.xml",
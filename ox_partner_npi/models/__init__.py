@@ -1,4 +1,5 @@
 from . import res_partner
+from . import npi_registry
 from . import sale_order
 from . import purchase_order
 from . import account_move
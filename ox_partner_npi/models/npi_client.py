@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import logging
+
+import requests
+
+from odoo.tools.lru import LRU
+
+_logger = logging.getLogger(__name__)
+
+NPI_API_URL = "https://npiregistry.cms.hhs.gov/api/?version=2.1&number={npi}"
+NPI_API_TIMEOUT = 10
+
+# CMS API results shared by the workers of this process, {npi: (expiry, result or None when not found)}.
+NPI_CACHE = LRU(8192)
+NPI_CACHE_STATS = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+# Lookups in progress, {npi: _PendingLookup}; callers asking for the same NPI wait for it.
+_PENDING_LOOKUPS = {}
+_PENDING_LOCK = threading.Lock()
+
+
+class RateLimiter:
+    """Spaces calls of all threads sharing it at least ``1 / rate`` seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def fetch_npi(npi, rate_limiter=None):
+    """Registry entry of an NPI from the CMS API.
+
+    Does not use the environment, so it can run in worker threads.
+
+    Returns:
+        dict: CMS API result, or None when the registry has no such NPI
+
+    Raises:
+        requests.exceptions.RequestException: when the CMS API cannot be reached
+    """
+    if rate_limiter:
+        rate_limiter.wait()
+    api_url = NPI_API_URL.format(npi=npi)
+    _logger.info("Calling NPI API: %s", api_url)
+    response = requests.get(api_url, timeout=NPI_API_TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    _logger.info("NPI API response - Result count: %s", data.get('result_count', 0))
+    if data.get('result_count', 0) == 0:
+        return None
+    return data.get('results', [{}])[0]
+
+
+class _PendingLookup:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def fetch_npi_cached(npi, ttl=3600, negative_ttl=300):
+    """:func:`fetch_npi` behind a process-wide cache.
+
+    Results are kept ``ttl`` seconds, "not found" answers ``negative_ttl`` seconds;
+    errors are not cached. Concurrent calls for the same NPI share one API call.
+    """
+    cached = NPI_CACHE.get(npi)
+    if cached is not None and cached[0] > time.monotonic():
+        NPI_CACHE_STATS['hits' if cached[1] is not None else 'negative_hits'] += 1
+        return cached[1]
+
+    with _PENDING_LOCK:
+        pending = _PENDING_LOOKUPS.get(npi)
+        owner = pending is None
+        if owner:
+            pending = _PENDING_LOOKUPS[npi] = _PendingLookup()
+    if not owner:
+        NPI_CACHE_STATS['coalesced'] += 1
+        pending.done.wait(NPI_API_TIMEOUT * 2)
+        if pending.error is not None:
+            raise pending.error
+        if not pending.done.is_set():
+            raise requests.exceptions.Timeout(f"Timed out waiting for the NPI lookup of {npi}")
+        return pending.result
+
+    NPI_CACHE_STATS['misses'] += 1
+    try:
+        pending.result = fetch_npi(npi)
+    except Exception as e:
+        NPI_CACHE_STATS['errors'] += 1
+        pending.error = e
+        raise
+    else:
+        expiry = time.monotonic() + (ttl if pending.result is not None else negative_ttl)
+        NPI_CACHE[npi] = (expiry, pending.result)
+        return pending.result
+    finally:
+        with _PENDING_LOCK:
+            _PENDING_LOOKUPS.pop(npi, None)
+        pending.done.set()
+
+
+def npi_cache_stats():
+    return dict(NPI_CACHE_STATS, size=len(NPI_CACHE))
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import logging
+
+from odoo import fields, models, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Columns of the mirror and the NPPES dissemination file header they are read from.
+NPPES_COLUMNS = [
+    ('npi', 'NPI'),
+    ('entity_type', 'Entity Type Code'),
+    ('replacement_npi', 'Replacement NPI'),
+    ('organization_name', 'Provider Organization Name (Legal Business Name)'),
+    ('last_name', 'Provider Last Name (Legal Name)'),
+    ('first_name', 'Provider First Name'),
+    ('middle_name', 'Provider Middle Name'),
+    ('name_prefix', 'Provider Name Prefix Text'),
+    ('name_suffix', 'Provider Name Suffix Text'),
+    ('credential', 'Provider Credential Text'),
+    ('mailing_address_1', 'Provider First Line Business Mailing Address'),
+    ('mailing_address_2', 'Provider Second Line Business Mailing Address'),
+    ('mailing_city', 'Provider Business Mailing Address City Name'),
+    ('mailing_state', 'Provider Business Mailing Address State Name'),
+    ('mailing_postal_code', 'Provider Business Mailing Address Postal Code'),
+    ('mailing_country_code', 'Provider Business Mailing Address Country Code (If outside U.S.)'),
+    ('mailing_telephone', 'Provider Business Mailing Address Telephone Number'),
+    ('mailing_fax', 'Provider Business Mailing Address Fax Number'),
+    ('location_address_1', 'Provider First Line Business Practice Location Address'),
+    ('location_address_2', 'Provider Second Line Business Practice Location Address'),
+    ('location_city', 'Provider Business Practice Location Address City Name'),
+    ('location_state', 'Provider Business Practice Location Address State Name'),
+    ('location_postal_code', 'Provider Business Practice Location Address Postal Code'),
+    ('location_country_code', 'Provider Business Practice Location Address Country Code (If outside U.S.)'),
+    ('location_telephone', 'Provider Business Practice Location Address Telephone Number'),
+    ('location_fax', 'Provider Business Practice Location Address Fax Number'),
+    ('enumeration_date', 'Provider Enumeration Date'),
+    ('last_update_date', 'Last Update Date'),
+    ('deactivation_date', 'NPI Deactivation Date'),
+    ('reactivation_date', 'NPI Reactivation Date'),
+    ('certification_date', 'Certification Date'),
+    ('sex', 'Provider Sex Code'),
+    ('official_last_name', 'Authorized Official Last Name'),
+    ('official_first_name', 'Authorized Official First Name'),
+    ('official_middle_name', 'Authorized Official Middle Name'),
+    ('official_title', 'Authorized Official Title or Position'),
+    ('official_telephone', 'Authorized Official Telephone Number'),
+    ('sole_proprietor', 'Is Sole Proprietor'),
+    ('organizational_subpart', 'Is Organization Subpart'),
+]
+NPPES_DATE_COLUMNS = {'enumeration_date', 'last_update_date', 'deactivation_date', 'reactivation_date',
+                      'certification_date'}
+# The file repeats taxonomy code, license and primary switch in 15 numbered slots.
+NPPES_TAXONOMY_SLOTS = 15
+NPPES_BATCH_SIZE = 50000
+YES_NO = {'Y': 'YES', 'N': 'NO'}
+
+
+class NpiRegistry(models.Model):
+    """Local mirror of the NPPES dissemination file, so NPIs are resolved without calling the CMS API.
+
+    Entries are loaded with :meth:`import_nppes_file` (monthly full file and weekly
+    delta files alike) and served by :meth:`_lookup` in the shape of a CMS API result.
+    The file only carries taxonomy codes, descriptions stay empty for mirrored NPIs.
+    """
+    _name = 'npi.registry'
+    _description = 'NPPES Registry Mirror'
+    _rec_name = 'npi'
+    _log_access = False
+
+    npi = fields.Char(string="NPI", required=True)
+    entity_type = fields.Char(string="Entity Type", help="1: Individual, 2: Organization")
+    replacement_npi = fields.Char(string="Replacement NPI")
+    organization_name = fields.Char(string="Organization Name")
+    last_name = fields.Char(string="Last Name")
+    first_name = fields.Char(string="First Name")
+    middle_name = fields.Char(string="Middle Name")
+    name_prefix = fields.Char(string="Name Prefix")
+    name_suffix = fields.Char(string="Name Suffix")
+    credential = fields.Char(string="Credential")
+    mailing_address_1 = fields.Char(string="Mailing Address")
+    mailing_address_2 = fields.Char(string="Mailing Address 2")
+    mailing_city = fields.Char(string="Mailing City")
+    mailing_state = fields.Char(string="Mailing State")
+    mailing_postal_code = fields.Char(string="Mailing Postal Code")
+    mailing_country_code = fields.Char(string="Mailing Country Code")
+    mailing_telephone = fields.Char(string="Mailing Telephone")
+    mailing_fax = fields.Char(string="Mailing Fax")
+    location_address_1 = fields.Char(string="Location Address")
+    location_address_2 = fields.Char(string="Location Address 2")
+    location_city = fields.Char(string="Location City")
+    location_state = fields.Char(string="Location State")
+    location_postal_code = fields.Char(string="Location Postal Code")
+    location_country_code = fields.Char(string="Location Country Code")
+    location_telephone = fields.Char(string="Location Telephone")
+    location_fax = fields.Char(string="Location Fax")
+    enumeration_date = fields.Date(string="Enumeration Date")
+    last_update_date = fields.Date(string="Last Update Date")
+    deactivation_date = fields.Date(string="Deactivation Date")
+    reactivation_date = fields.Date(string="Reactivation Date")
+    certification_date = fields.Date(string="Certification Date")
+    sex = fields.Char(string="Sex")
+    official_last_name = fields.Char(string="Auth Official Last Name")
+    official_first_name = fields.Char(string="Auth Official First Name")
+    official_middle_name = fields.Char(string="Auth Official Middle Name")
+    official_title = fields.Char(string="Auth Official Title")
+    official_telephone = fields.Char(string="Auth Official Telephone")
+    sole_proprietor = fields.Char(string="Sole Proprietor")
+    organizational_subpart = fields.Char(string="Organizational Subpart")
+    taxonomies = fields.Text(string="Taxonomies (JSON)")
+
+    _sql_constraints = [
+        ('npi_unique', 'UNIQUE(npi)', 'NPI must be unique in the registry mirror!')
+    ]
+
+    @api.model
+    def import_nppes_file(self, file, batch_size=NPPES_BATCH_SIZE):
+        """Stream an NPPES dissemination CSV (full or weekly delta) into the mirror.
+
+        Only the columns of :data:`NPPES_COLUMNS` and the taxonomy slots are kept.
+        Rows are COPYed into a staging table batch by batch and upserted by NPI; an
+        entry is only replaced by a row with the same or a newer Last Update Date, so
+        delta files can be applied in any order after the full file.
+
+        Args:
+            file: path of the CSV file or a text file object
+            batch_size: rows staged per COPY
+
+        Returns:
+            int: number of rows read from the file
+        """
+        if isinstance(file, str):
+            with open(file, newline='', encoding='utf-8', errors='replace') as csv_file:
+                return self.import_nppes_file(csv_file, batch_size=batch_size)
+
+        self.flush_model()
+        columns = [column for column, _header in NPPES_COLUMNS] + ['taxonomies']
+        cr = self.env.cr
+        cr.execute(SQL(
+            "CREATE TEMP TABLE IF NOT EXISTS npi_registry_stage (%s) ON COMMIT DROP",
+            SQL(", ").join(SQL("%s varchar", SQL.identifier(column)) for column in columns),
+        ))
+        cr.execute("TRUNCATE npi_registry_stage")
+
+        reader = csv.reader(file)
+        header = {name: index for index, name in enumerate(next(reader))}
+        positions = [header.get(name) for _column, name in NPPES_COLUMNS]
+        taxonomy_positions = [
+            (header.get(f'Healthcare Provider Taxonomy Code_{slot}'),
+             header.get(f'Provider License Number_{slot}'),
+             header.get(f'Provider License Number State Code_{slot}'),
+             header.get(f'Healthcare Provider Primary Taxonomy Switch_{slot}'))
+            for slot in range(1, NPPES_TAXONOMY_SLOTS + 1)
+        ]
+
+        total = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        staged = 0
+        for row in reader:
+            if not row:
+                continue
+            values = [row[position] if position is not None and position < len(row) else ''
+                      for position in positions]
+            taxonomies = [
+                {'code': row[code], 'license': row[license_num] if license_num is not None else '',
+                 'state': row[state] if state is not None else '',
+                 'primary': primary is not None and row[primary] == 'Y'}
+                for code, license_num, state, primary in taxonomy_positions
+                if code is not None and code < len(row) and row[code]
+            ]
+            values.append(json.dumps(taxonomies) if taxonomies else '')
+            writer.writerow(values)
+            staged += 1
+            if staged >= batch_size:
+                self._upsert_staged(buffer, columns)
+                total += staged
+                staged = 0
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+        if staged:
+            self._upsert_staged(buffer, columns)
+            total += staged
+        self.invalidate_model()
+        _logger.info("Imported %s NPPES rows into the NPI registry mirror", total)
+        return total
+
+    def _upsert_staged(self, buffer, columns):
+        cr = self.env.cr
+        buffer.seek(0)
+        cr._obj.copy_expert(SQL(
+            "COPY npi_registry_stage (%s) FROM STDIN WITH (FORMAT csv)",
+            SQL(", ").join(SQL.identifier(column) for column in columns),
+        ).code, buffer)
+        cr.execute(SQL(
+            """
+            INSERT INTO npi_registry (%(columns)s)
+                 SELECT DISTINCT ON (npi) %(values)s
+                   FROM npi_registry_stage
+                  WHERE npi <> ''
+               ORDER BY npi, to_date(NULLIF(last_update_date, ''), 'MM/DD/YYYY') DESC NULLS LAST
+            ON CONFLICT (npi) DO UPDATE SET %(updates)s
+                  WHERE npi_registry.last_update_date IS NULL
+                     OR EXCLUDED.last_update_date IS NULL
+                     OR EXCLUDED.last_update_date >= npi_registry.last_update_date
+            """,
+            columns=SQL(", ").join(SQL.identifier(column) for column in columns),
+            values=SQL(", ").join(
+                SQL("to_date(NULLIF(%s, ''), 'MM/DD/YYYY')", SQL.identifier(column))
+                if column in NPPES_DATE_COLUMNS else SQL("NULLIF(%s, '')", SQL.identifier(column))
+                for column in columns
+            ),
+            updates=SQL(", ").join(
+                SQL("%s = EXCLUDED.%s", SQL.identifier(column), SQL.identifier(column))
+                for column in columns if column != 'npi'
+            ),
+        ))
+        cr.execute("TRUNCATE npi_registry_stage")
+
+    @api.model
+    def _lookup(self, npi):
+        """Registry entry of ``npi`` in the shape of a CMS API result, or ``None`` when the mirror doesn't hold it."""
+        return self._lookup_many([npi]).get(npi)
+
+    @api.model
+    def _lookup_many(self, npis):
+        """Registry entries of several NPIs in one query, {npi: CMS API result} for those the mirror holds."""
+        if not npis:
+            return {}
+        self.flush_model()
+        self.env.cr.execute(SQL(
+            "SELECT %s FROM npi_registry WHERE npi IN %s",
+            SQL(", ").join(SQL.identifier(column) for column, _header in NPPES_COLUMNS + [('taxonomies', None)]),
+            tuple(npis),
+        ))
+        return {row['npi']: self._to_api_result(row) for row in self.env.cr.dictfetchall()}
+
+    @api.model
+    def _to_api_result(self, row):
+        def date(value):
+            return value.isoformat() if value else ''
+
+        deactivated = row['deactivation_date'] and not (
+            row['reactivation_date'] and row['reactivation_date'] >= row['deactivation_date'])
+        basic = {
+            'enumeration_date': date(row['enumeration_date']),
+            'last_updated': date(row['last_update_date']),
+            'certification_date': date(row['certification_date']),
+            'status': 'D' if deactivated else 'A',
+        }
+        if row['entity_type'] == '2':
+            enumeration_type = 'NPI-2'
+            basic.update({
+                'organization_name': row['organization_name'] or '',
+                'organizational_subpart': YES_NO.get(row['organizational_subpart'], ''),
+                'authorized_official_first_name': row['official_first_name'] or '',
+                'authorized_official_last_name': row['official_last_name'] or '',
+                'authorized_official_middle_name': row['official_middle_name'] or '',
+                'authorized_official_title_or_position': row['official_title'] or '',
+                'authorized_official_telephone_number': row['official_telephone'] or '',
+            })
+        else:
+            enumeration_type = 'NPI-1'
+            basic.update({
+                'first_name': row['first_name'] or '',
+                'middle_name': row['middle_name'] or '',
+                'last_name': row['last_name'] or '',
+                'name_prefix': row['name_prefix'] or '',
+                'name_suffix': row['name_suffix'] or '',
+                'credential': row['credential'] or '',
+                'sex': row['sex'] or '',
+                'sole_proprietor': YES_NO.get(row['sole_proprietor'], ''),
+            })
+        addresses = [
+            {
+                'address_purpose': purpose,
+                'address_1': row[f'{prefix}_address_1'] or '',
+                'address_2': row[f'{prefix}_address_2'] or '',
+                'city': row[f'{prefix}_city'] or '',
+                'state': row[f'{prefix}_state'] or '',
+                'postal_code': row[f'{prefix}_postal_code'] or '',
+                'country_code': row[f'{prefix}_country_code'] or 'US',
+                'telephone_number': row[f'{prefix}_telephone'] or '',
+                'fax_number': row[f'{prefix}_fax'] or '',
+            }
+            for purpose, prefix in (('LOCATION', 'location'), ('MAILING', 'mailing'))
+            if row[f'{prefix}_address_1']
+        ]
+        result = {
+            'number': row['npi'],
+            'enumeration_type': enumeration_type,
+            'basic': basic,
+            'addresses': addresses,
+            'taxonomies': [dict(taxonomy, desc='') for taxonomy in json.loads(row['taxonomies'] or '[]')],
+            'identifiers': [],
+            'endpoints': [],
+            'other_names': [],
+            'practiceLocations': [],
+        }
+        if row['deactivation_date']:
+            result['deactivation_date'] = date(row['deactivation_date'])
+        if row['reactivation_date']:
+            result['reactivation_date'] = date(row['reactivation_date'])
+        if row['replacement_npi']:
+            result['replacement_npi'] = row['replacement_npi']
+        return result
@@ -34,6 +34,42 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='ox_partner_npi.otp_max_per_email_per_10min'
     )
     
+    # NPI Revalidation Settings
+    npi_revalidation_days = fields.Integer(
+        string="Revalidate NPI Data After (days)",
+        default=30,
+        help="Provider NPI data older than this is re-checked against the registry by the scheduled action",
+        config_parameter='ox_partner_npi.npi_revalidation_days'
+    )
+
+    npi_revalidation_workers = fields.Integer(
+        string="Concurrent NPI Lookups",
+        default=4,
+        help="Number of parallel NPI registry API calls during revalidation",
+        config_parameter='ox_partner_npi.npi_revalidation_workers'
+    )
+
+    npi_revalidation_rate = fields.Float(
+        string="NPI API Requests per Second",
+        default=5,
+        help="Maximum rate of NPI registry API calls during revalidation",
+        config_parameter='ox_partner_npi.npi_revalidation_rate'
+    )
+
+    npi_cache_ttl = fields.Integer(
+        string="NPI Lookup Cache (seconds)",
+        default=3600,
+        help="How long NPI registry API answers are reused before calling the API again",
+        config_parameter='ox_partner_npi.npi_cache_ttl'
+    )
+
+    npi_cache_negative_ttl = fields.Integer(
+        string="NPI Not Found Cache (seconds)",
+        default=300,
+        help="How long a 'not found' answer of the NPI registry API is reused",
+        config_parameter='ox_partner_npi.npi_cache_negative_ttl'
+    )
+
     @api.model
     def get_values(self):
         """Get current configuration values"""
@@ -1,12 +1,45 @@
 # -*- coding: utf-8 -*-
 from odoo import fields, models, api
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
 import requests
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from .npi_client import RateLimiter, fetch_npi, fetch_npi_cached, npi_cache_stats
 
 _logger = logging.getLogger(__name__)
 
+# Partner fields filled by _extract_npi_data from a registry entry; a field missing from the
+# extracted values means the registry no longer has it.
+NPI_REGISTRY_FIELDS = (
+    'npi_enumeration_type', 'npi_provider_name', 'npi_first_name', 'npi_middle_name', 'npi_last_name',
+    'npi_name_prefix', 'npi_name_suffix', 'npi_credential', 'npi_gender', 'npi_sole_proprietor',
+    'npi_organization_name', 'npi_organizational_subpart', 'npi_authorized_official_first_name',
+    'npi_authorized_official_last_name', 'npi_authorized_official_middle_name', 'npi_authorized_official_title',
+    'npi_authorized_official_telephone', 'npi_enumeration_date', 'npi_certification_date', 'npi_created_date',
+    'npi_created_epoch', 'npi_last_updated_date', 'npi_last_updated_epoch', 'npi_deactivation_date',
+    'npi_reactivation_date', 'npi_replacement_npi', 'npi_status', 'npi_primary_practice_location',
+    'npi_mailing_address', 'npi_location_telephone', 'npi_location_fax', 'npi_mailing_telephone',
+    'npi_mailing_fax', 'npi_taxonomies', 'npi_primary_taxonomy', 'npi_primary_taxonomy_code',
+    'npi_primary_taxonomy_license', 'npi_identifiers', 'npi_endpoints', 'npi_other_names',
+    'npi_practice_locations',
+)
+# Registry fields the NPPES file doesn't carry (taxonomy descriptions, identifiers, endpoints,
+# other names, practice locations, CMS epochs): only CMS API results update them.
+NPI_API_ONLY_FIELDS = (
+    'npi_created_date', 'npi_created_epoch', 'npi_last_updated_epoch', 'npi_taxonomies', 'npi_primary_taxonomy',
+    'npi_identifiers', 'npi_endpoints', 'npi_other_names', 'npi_practice_locations',
+)
+NPI_MIRROR_FIELDS = tuple(name for name in NPI_REGISTRY_FIELDS if name not in NPI_API_ONLY_FIELDS)
+# Status stored on partners whose NPI the registry no longer knows.
+NPI_STATUS_NOT_FOUND = 'N'
+
+
 class ResPartner(models.Model):
     _inherit = "res.partner"
 
@@ -74,24 +107,41 @@ class ResPartner(models.Model):
     npi_practice_locations = fields.Text(string="Practice Locations", readonly=True, help="Additional practice locations beyond primary")
     npi_lookup_data = fields.Text(string="NPI Lookup Data (JSON)", readonly=True)
 
-    # Note: We use Python constraint instead of SQL constraint to handle:
+    # Note: Uniqueness is enforced by the Python constraint below, which ignores:
     # 1. Multiple NULL/empty values (NPI is optional)
-    # 2. Better error messages
-    # 3. Avoids database constraint errors on existing duplicate data
-    # SQL UNIQUE constraint would fail if there are existing duplicates or empty strings
+    # 2. Archived partners
+    # The partial index created in init only makes its lookup an index scan; it is not
+    # unique, as a unique index would reject duplicates before the constraint could
+    # report them with a readable message.
+
+    def init(self):
+        super().init()
+        cr = self.env.cr
+        cr.execute("DROP INDEX IF EXISTS res_partner_npi_number_uniq")
+        create_index(cr, 'res_partner_npi_number_index', self._table, ['npi_number'],
+                     where="npi_number IS NOT NULL AND npi_number != '' AND active")
 
-    @api.constrains('npi_number')
+    @api.constrains('npi_number', 'active')
     def _check_npi_unique(self):
-        """Check that NPI number is unique across all partners"""
-        for partner in self:
-            if partner.npi_number:
-                # Check for duplicates excluding current record
-                duplicate = self.env['res.partner'].search([
-                    ('npi_number', '=', partner.npi_number),
-                    ('id', '!=', partner.id)
-                ], limit=1)
-                if duplicate:
-                    raise ValidationError(f"NPI Number {partner.npi_number} is already assigned to partner: {duplicate.name}")
+        """Check that NPI number is unique across all partners, with one query for the whole batch"""
+        partners = self.filtered('npi_number')
+        if not partners:
+            return
+        self.flush_model(['npi_number', 'active'])
+        self.env.cr.execute(SQL("""
+            SELECT npi_number, array_agg(id ORDER BY id)
+              FROM res_partner
+             WHERE npi_number IN %s AND (active OR id IN %s)
+          GROUP BY npi_number
+            HAVING COUNT(*) > 1
+             LIMIT 1
+        """, tuple(set(partners.mapped('npi_number'))), tuple(partners.ids)))
+        row = self.env.cr.fetchone()
+        if row:
+            npi_number, partner_ids = row
+            partner = partners.filtered(lambda partner: partner.npi_number == npi_number)[:1]
+            duplicate = self.browse([partner_id for partner_id in partner_ids if partner_id != partner.id][:1])
+            raise ValidationError(f"NPI Number {npi_number} is already assigned to partner: {duplicate.name}")
 
     def action_lookup_npi(self):
         """Lookup NPI data from CMS API and update partner"""
@@ -104,19 +154,13 @@ class ResPartner(models.Model):
         if not npi.isdigit() or len(npi) != 10:
             raise ValidationError("NPI number must be exactly 10 digits.")
         
-        # Call NPI API
+        # Resolve NPI (local NPPES mirror first, CMS API otherwise)
         try:
-            api_url = f"https://npiregistry.cms.hhs.gov/api/?version=2.1&number={npi}"
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            result = self._get_npi_result(npi)
             
-            if data.get('result_count', 0) == 0:
+            if not result:
                 raise ValidationError(f"No NPI data found for number: {npi}")
             
-            # Extract first result
-            result = data.get('results', [{}])[0]
-            
             # Extract all NPI data using helper method
             npi_data = self._extract_npi_data(result)
             
@@ -140,6 +184,158 @@ class ResPartner(models.Model):
             _logger.error(f"Error processing NPI data: {e}")
             raise ValidationError(f"Error processing NPI data: {str(e)}")
 
+    def _get_npi_result(self, npi):
+        """Registry entry of an NPI from the local NPPES mirror, or from the CMS API when the mirror doesn't hold it.
+
+        Returns:
+            dict: CMS API result, or None when the registry has no such NPI
+
+        Raises:
+            requests.exceptions.RequestException: when the CMS API cannot be reached
+        """
+        result = self.env['npi.registry'].sudo()._lookup(npi)
+        if result is not None:
+            _logger.info("NPI %s resolved from the local NPPES mirror", npi)
+            return result
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        return fetch_npi_cached(
+            npi,
+            ttl=int(get_param('ox_partner_npi.npi_cache_ttl', 3600)),
+            negative_ttl=int(get_param('ox_partner_npi.npi_cache_negative_ttl', 300)),
+        )
+
+    @api.model
+    def get_npi_cache_stats(self):
+        """Hits, misses and coalesced calls of the NPI API cache of this worker."""
+        return npi_cache_stats()
+
+    @api.model
+    def _resolve_npis(self, npis, max_workers=4, rate=5.0):
+        """Registry entries of several NPIs: the local mirror in one query, the CMS API in
+        ``max_workers`` threads sharing a ``rate`` requests per second budget for the rest.
+
+        Returns:
+            tuple: ({npi: CMS API result or None when not found}, {npi: error message},
+                    set of the NPIs resolved from the mirror)
+        """
+        results = self.env['npi.registry'].sudo()._lookup_many(npis)
+        mirrored = set(results)
+        missing = [npi for npi in npis if npi not in results]
+        errors = {}
+        if missing:
+            rate_limiter = RateLimiter(rate)
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='npi_revalidation') as executor:
+                futures = {npi: executor.submit(fetch_npi, npi, rate_limiter) for npi in missing}
+            for npi, future in futures.items():
+                try:
+                    results[npi] = future.result()
+                except Exception as e:
+                    # unreachable API as well as unexpected answers (invalid JSON...): retried next run
+                    _logger.warning("NPI revalidation - Could not resolve NPI %s: %s", npi, e)
+                    errors[npi] = str(e)
+        return results, errors, mirrored
+
+    def _get_npi_changes(self, npi_data, field_names=NPI_REGISTRY_FIELDS):
+        """Registry fields ``field_names`` of this partner that differ from freshly extracted ``npi_data``."""
+        self.ensure_one()
+        return {
+            name: npi_data.get(name) or False
+            for name in field_names
+            if (self[name] or False) != (npi_data.get(name) or False)
+        }
+
+    def _revalidate_npi(self, max_workers=4, rate=5.0):
+        """Re-resolve the NPI of these partners and write the partners whose registry data changed.
+
+        Partners are written only when a registry field changed; the others just get
+        their ``npi_last_updated`` bumped, all in one write. Partners whose NPI couldn't
+        be reached are left untouched so they are picked up again. NPIs resolved from
+        the local mirror only fill in the fields the CMS API provides when they are empty.
+
+        Returns:
+            dict: counters and the list of status changes
+                  ``(partner id, NPI, old status, new status, replacement NPI)``
+        """
+        partners = self.filtered(lambda partner: partner.npi_number and partner.npi_number.strip().isdigit())
+        npis = list({partner.npi_number.strip() for partner in partners})
+        results, errors, mirrored = self._resolve_npis(npis, max_workers=max_workers, rate=rate)
+        now = fields.Datetime.now()
+        summary = {'checked': 0, 'changed': 0, 'not_found': 0, 'errors': 0, 'status_changes': []}
+        unchanged = self.browse()
+        for partner in partners:
+            npi = partner.npi_number.strip()
+            if npi in errors:
+                summary['errors'] += 1
+                continue
+            summary['checked'] += 1
+            result = results.get(npi)
+            if result:
+                npi_data = self._extract_npi_data(result)
+            else:
+                summary['not_found'] += 1
+                npi_data = dict.fromkeys(NPI_REGISTRY_FIELDS, False)
+                npi_data['npi_status'] = NPI_STATUS_NOT_FOUND
+            from_mirror = npi in mirrored
+            changes = partner._get_npi_changes(npi_data, NPI_MIRROR_FIELDS if from_mirror else NPI_REGISTRY_FIELDS)
+            if from_mirror:
+                # fill in, never overwrite, what only the CMS API knows better
+                changes.update({name: npi_data[name] for name in NPI_API_ONLY_FIELDS
+                                if npi_data.get(name) and not partner[name]})
+            if not changes:
+                unchanged |= partner
+                continue
+            summary['changed'] += 1
+            if 'npi_status' in changes or 'npi_replacement_npi' in changes:
+                summary['status_changes'].append((
+                    partner.id, npi, partner.npi_status or False, npi_data.get('npi_status') or False,
+                    npi_data.get('npi_replacement_npi') or False,
+                ))
+            changes['npi_last_updated'] = now
+            if result and not (from_mirror and partner.npi_lookup_data):
+                changes['npi_lookup_data'] = npi_data['npi_lookup_data']
+            partner.write(changes)
+        if unchanged:
+            unchanged.write({'npi_last_updated': now})
+        return summary
+
+    @api.model
+    def _cron_revalidate_npi(self, batch_size=200, limit=5000):
+        """Revalidate the NPI of partners whose registry data is older than the configured number of days.
+
+        Partners are processed by batches of ``batch_size``, committing after each
+        batch, at most ``limit`` per run. Status changes are logged at the end.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        stale_days = int(get_param('ox_partner_npi.npi_revalidation_days', 30))
+        max_workers = int(get_param('ox_partner_npi.npi_revalidation_workers', 4))
+        rate = float(get_param('ox_partner_npi.npi_revalidation_rate', 5))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        domain = [
+            ('npi_number', '!=', False),
+            '|', ('npi_last_updated', '=', False),
+            ('npi_last_updated', '<', fields.Datetime.now() - timedelta(days=stale_days)),
+        ]
+        partners = self.with_context(active_test=False).search(domain, limit=limit, order='npi_last_updated asc, id')
+        totals = {'checked': 0, 'changed': 0, 'not_found': 0, 'errors': 0, 'status_changes': []}
+        for start in range(0, len(partners), batch_size):
+            summary = partners[start:start + batch_size]._revalidate_npi(max_workers=max_workers, rate=rate)
+            for key, value in summary.items():
+                totals[key] += value
+            self.env['ir.cron']._notify_progress(done=min(start + batch_size, len(partners)),
+                                                 remaining=max(len(partners) - start - batch_size, 0))
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+        for partner_id, npi, old_status, new_status, replacement_npi in totals['status_changes']:
+            _logger.info("NPI revalidation - Partner %s, NPI %s: status %s -> %s%s", partner_id, npi,
+                         old_status, new_status, f", replaced by {replacement_npi}" if replacement_npi else '')
+        _logger.info("NPI revalidation done - Checked: %s, Changed: %s, Not found: %s, Errors: %s, "
+                     "Status changes: %s", totals['checked'], totals['changed'], totals['not_found'],
+                     totals['errors'], len(totals['status_changes']))
+        return totals
+
     def _extract_npi_data(self, result):
         """Extract all NPI data from API result into dictionary for partner update"""
         from datetime import datetime
@@ -391,20 +587,14 @@ class ResPartner(models.Model):
             _logger.warning("NPI validation failed: Already exists - Partner: %s (ID: %s)", existing.name, existing.id)
             return False, f"NPI number {npi} is already registered to another partner.", None, 'npi_number'
         
-        # Call NPI API
+        # Resolve NPI (local NPPES mirror first, CMS API otherwise)
         try:
-            api_url = f"https://npiregistry.cms.hhs.gov/api/?version=2.1&number={npi}"
-            _logger.info("Calling NPI API: %s", api_url)
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            _logger.info("NPI API response - Result count: %s", data.get('result_count', 0))
+            result = self._get_npi_result(npi)
             
-            if data.get('result_count', 0) == 0:
+            if not result:
                 _logger.warning("NPI validation failed: No results found for NPI: %s", npi)
                 return False, f"No valid NPI found for number: {npi}. Please provide a valid NPI number.", None, 'npi_number'
             
-            result = data.get('results', [{}])[0]
             basic = result.get('basic', {})
             enumeration_type = result.get('enumeration_type', '')
             
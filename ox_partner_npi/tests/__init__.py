@@ -0,0 +1,4 @@
+from . import test_npi_registry
+from . import test_npi_revalidation
+from . import test_npi_cache
+from . import test_npi_unique
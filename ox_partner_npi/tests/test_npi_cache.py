@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.ox_partner_npi.models import npi_client
+
+
+@tagged("post_install", "-at_install")
+class TestNpiCache(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        npi_client.NPI_CACHE.clear()
+        self.addCleanup(npi_client.NPI_CACHE.clear)
+
+    def _fake_fetch(self, npi, rate_limiter=None):
+        self.calls.append(npi)
+        time.sleep(0.05)
+        return None if npi == "1999999999" else {"number": npi, "basic": {"status": "A"}}
+
+    def test_coalesced_and_cached(self):
+        results = []
+        with patch.object(npi_client, "fetch_npi", side_effect=self._fake_fetch):
+            threads = [
+                threading.Thread(target=lambda: results.append(npi_client.fetch_npi_cached("1000000004")))
+                for _index in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(self.calls, ["1000000004"])
+            self.assertEqual([result["number"] for result in results], ["1000000004"] * 5)
+
+            npi_client.fetch_npi_cached("1000000004")
+            self.assertEqual(len(self.calls), 1)
+
+    def test_negative_cache_and_ttl(self):
+        with patch.object(npi_client, "fetch_npi", side_effect=self._fake_fetch):
+            self.assertIsNone(npi_client.fetch_npi_cached("1999999999", negative_ttl=300))
+            self.assertIsNone(npi_client.fetch_npi_cached("1999999999", negative_ttl=300))
+            self.assertEqual(len(self.calls), 1)
+
+            npi_client.fetch_npi_cached("1000000012", ttl=0)
+            npi_client.fetch_npi_cached("1000000012", ttl=0)
+            self.assertEqual(self.calls.count("1000000012"), 2)
+        stats = self.env["res.partner"].get_npi_cache_stats()
+        self.assertGreaterEqual(stats["negative_hits"], 1)
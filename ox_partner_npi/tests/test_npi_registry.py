@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools.misc import file_path
+
+
+@tagged("post_install", "-at_install")
+class TestNpiRegistry(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.registry_mirror = cls.env["npi.registry"]
+        cls.imported = cls.registry_mirror.import_nppes_file(
+            file_path("ox_partner_npi/tests/data/nppes_sample.csv"), batch_size=2
+        )
+
+    def test_import_full_file(self):
+        self.assertEqual(self.imported, 3)
+        self.assertEqual(self.registry_mirror.search_count([]), 3)
+        individual = self.registry_mirror.search([("npi", "=", "1000000004")])
+        self.assertEqual(individual.last_name, "SMITH")
+        self.assertEqual(str(individual.enumeration_date), "2005-05-23")
+        self.assertFalse(individual.replacement_npi)
+
+    def test_lookup_individual(self):
+        result = self.registry_mirror._lookup("1000000004")
+        self.assertEqual(result["enumeration_type"], "NPI-1")
+        self.assertEqual(result["basic"]["first_name"], "JANE")
+        self.assertEqual(result["basic"]["status"], "A")
+        self.assertEqual(result["basic"]["sole_proprietor"], "NO")
+        self.assertEqual(result["basic"]["enumeration_date"], "2005-05-23")
+        self.assertEqual(
+            [(tax["code"], tax["primary"]) for tax in result["taxonomies"]],
+            [("207Q00000X", True), ("207R00000X", False)],
+        )
+        self.assertEqual(
+            [address["address_purpose"] for address in result["addresses"]], ["LOCATION", "MAILING"]
+        )
+
+        npi_data = self.env["res.partner"]._extract_npi_data(result)
+        self.assertEqual(npi_data["npi_provider_name"], "JANE SMITH")
+        self.assertEqual(npi_data["npi_gender"], "Female")
+        self.assertEqual(npi_data["npi_primary_taxonomy_code"], "207Q00000X")
+        self.assertEqual(npi_data["npi_primary_practice_location"], "100 MAIN ST\nSUITE 2\nAUSTIN, TX, 78701")
+
+    def test_lookup_organization_and_deactivated(self):
+        organization = self.registry_mirror._lookup("1000000012")
+        self.assertEqual(organization["enumeration_type"], "NPI-2")
+        self.assertEqual(organization["basic"]["organization_name"], "NORTH CLINIC, LLC")
+        self.assertEqual(organization["basic"]["authorized_official_first_name"], "JOHN")
+
+        deactivated = self.registry_mirror._lookup("1000000020")
+        self.assertEqual(deactivated["basic"]["status"], "D")
+        self.assertEqual(deactivated["deactivation_date"], "2015-06-30")
+        self.assertIsNone(self.registry_mirror._lookup("1999999999"))
+
+    def test_weekly_delta(self):
+        imported = self.registry_mirror.import_nppes_file(
+            file_path("ox_partner_npi/tests/data/nppes_sample_weekly.csv")
+        )
+        self.assertEqual(imported, 3)
+        self.assertEqual(self.registry_mirror.search_count([]), 4)
+        # newer row replaces the entry
+        self.assertEqual(self.registry_mirror._lookup("1000000004")["basic"]["last_name"], "SMITH-JONES")
+        # older row is ignored
+        self.assertEqual(
+            self.registry_mirror._lookup("1000000012")["basic"]["organization_name"], "NORTH CLINIC, LLC"
+        )
+        self.assertEqual(self.registry_mirror._lookup("1000000038")["basic"]["first_name"], "AN")
+
+    def test_validate_npi_uses_mirror(self):
+        partner_model = self.env["res.partner"]
+        with patch(
+            "odoo.addons.ox_partner_npi.models.npi_client.requests.get",
+            side_effect=AssertionError("the CMS API must not be called for mirrored NPIs"),
+        ):
+            is_valid, _message, data, _field = partner_model.validate_npi("1000000004", signup_name="Jane Smith")
+            self.assertTrue(is_valid)
+            self.assertEqual(data["number"], "1000000004")
+
+            is_valid, _message, _data, error_field = partner_model.validate_npi("1000000020")
+            self.assertFalse(is_valid)
+            self.assertEqual(error_field, "npi_number")
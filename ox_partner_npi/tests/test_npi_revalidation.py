@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+from odoo.tools.misc import file_path
+
+
+@tagged("post_install", "-at_install")
+class TestNpiRevalidation(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        registry_mirror = cls.env["npi.registry"]
+        registry_mirror.import_nppes_file(file_path("ox_partner_npi/tests/data/nppes_sample.csv"))
+        partner_model = cls.env["res.partner"]
+        stale = fields.Datetime.now() - timedelta(days=90)
+        cls.individual = partner_model.create({"name": "Jane Smith", "npi_number": "1000000004"})
+        cls.individual.write(dict(
+            partner_model._extract_npi_data(registry_mirror._lookup("1000000004")), npi_last_updated=stale
+        ))
+        cls.deactivated = partner_model.create({"name": "Former Provider", "npi_number": "1000000020"})
+        cls.deactivated.write({"npi_status": "A", "npi_last_updated": stale})
+
+    def test_revalidation(self):
+        with patch(
+            "odoo.addons.ox_partner_npi.models.npi_client.requests.get",
+            side_effect=AssertionError("the CMS API must not be called for mirrored NPIs"),
+        ):
+            summary = self.env["res.partner"]._cron_revalidate_npi()
+
+        self.assertEqual(summary["checked"], 2)
+        self.assertEqual(summary["changed"], 1)
+        self.assertEqual(
+            summary["status_changes"], [(self.deactivated.id, "1000000020", "A", "D", False)]
+        )
+        self.assertEqual(self.deactivated.npi_status, "D")
+        self.assertEqual(str(self.deactivated.npi_deactivation_date), "2015-06-30")
+        self.assertGreater(self.individual.npi_last_updated, fields.Datetime.now() - timedelta(days=1))
+
+        summary = self.env["res.partner"]._cron_revalidate_npi()
+        self.assertEqual(summary["checked"], 0)
+
+    def test_mirror_keeps_api_only_fields(self):
+        self.individual.write({
+            "npi_primary_taxonomy": "Family Medicine",
+            "npi_identifiers": "MEDICAID (Code: 05) - Identifier: 248903 - State: TX",
+            "npi_created_epoch": "1116806400000",
+            "npi_lookup_data": '{"number": "1000000004"}',
+            "npi_last_updated": fields.Datetime.now() - timedelta(days=90),
+        })
+        self.deactivated.npi_last_updated = fields.Datetime.now()
+        summary = self.env["res.partner"]._cron_revalidate_npi()
+
+        self.assertEqual(summary["changed"], 0)
+        self.assertEqual(self.individual.npi_primary_taxonomy, "Family Medicine")
+        self.assertTrue(self.individual.npi_identifiers)
+        self.assertEqual(self.individual.npi_created_epoch, "1116806400000")
+        self.assertEqual(self.individual.npi_lookup_data, '{"number": "1000000004"}')
+
+    def test_unexpected_api_error(self):
+        partner = self.env["res.partner"].create({"name": "Unknown", "npi_number": "1999999999"})
+        with patch(
+            "odoo.addons.ox_partner_npi.models.res_partner.fetch_npi",
+            side_effect=ValueError("Expecting value: line 1 column 1 (char 0)"),
+        ):
+            summary = partner._revalidate_npi()
+        self.assertEqual(summary["errors"], 1)
+        self.assertFalse(partner.npi_last_updated)
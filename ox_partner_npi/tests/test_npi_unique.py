@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from odoo.exceptions import ValidationError
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestNpiUnique(TransactionCase):
+
+    def test_duplicates(self):
+        partners = self.env["res.partner"]
+        first = partners.create({"name": "First", "npi_number": "1000000004"})
+        with self.assertRaisesRegex(ValidationError, "already assigned to partner: First"):
+            partners.create({"name": "Second", "npi_number": "1000000004"})
+        with self.assertRaises(ValidationError):
+            partners.create([
+                {"name": "Third", "npi_number": "1000000012"},
+                {"name": "Fourth", "npi_number": "1000000012"},
+            ])
+        partners.create([{"name": "Empty 1"}, {"name": "Empty 2"}])
+
+        first.active = False
+        archived_duplicate = partners.create({"name": "Second", "npi_number": "1000000004"})
+        with self.assertRaises(ValidationError):
+            first.active = True
+        self.assertTrue(archived_duplicate.active)
@@ -7,7 +7,8 @@ from odoo import api, SUPERUSER_ID
 
 
 def uninstall_hook(env):
-    env['ir.config_parameter'].search([('key', '=', 'uninstall_check')]).unlink()
+    env['ir.config_parameter'].search([('key', 'in', ['uninstall_check', 'simplify_access_management.policy_version'])]).unlink()
+    env.cr.execute("DROP SEQUENCE IF EXISTS simplify_access_management_policy_version_seq")
 
 
 def post_install_action_dup_hook(env):
@@ -2,6 +2,7 @@ from odoo import http
 from odoo.exceptions import UserError
 from odoo.addons.web.controllers.export import Export
 from odoo.http import request
+from odoo.addons.simplify_access_management.models.access_policy import get_model_policy
 
 class Export(Export):
 
@@ -30,18 +31,9 @@ class Export(Export):
                    import_compat=import_compat, parent_field_type=parent_field_type,
                    parent_field=parent_field, exclude=exclude)
         
-        invisible_field_ids = request.env['hide.field'].sudo().search(
-                        [('model_id.model', '=', request.params.get('model')),
-                         ('access_management_id.active', '=', True),
-                         ('access_management_id.user_ids', 'in', request.env.user.id),
-                         ('invisible','=',True)])
-        
-        invisible_field_ids -= invisible_field_ids.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and request.env.company.id not in x.access_management_id.company_ids.ids)
-        
-        invisible_field_list = invisible_field_ids.mapped('field_id.name')
-
-        for fields in result:
-            if fields.get('id') in invisible_field_list:
-                result.remove(fields)
+        invisible_field_list = {name for name, rule in get_model_policy(request.env, request.params.get('model')).fields.items()
+                                if rule.invisible}
+        if invisible_field_list:
+            result = [fields for fields in result if fields.get('id') not in invisible_field_list]
 
         return result        
\ No newline at end of file
@@ -1,3 +1,4 @@
+from . import access_policy
 from . import action_data
 from . import view_data
 from . import remove_action
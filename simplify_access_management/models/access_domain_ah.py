@@ -4,6 +4,7 @@ from odoo.exceptions import ValidationError, UserError
 
 class access_domain_ah(models.Model):
     _name = 'access.domain.ah'
+    _inherit = 'access.policy.mixin'
     _description = 'Access Domain'
 
     model_id = fields.Many2one(
@@ -13,7 +14,7 @@ class access_domain_ah(models.Model):
     domain = fields.Char(string='Filter', default='[]',
                          help="The create customised domain rule where we can customise rule by selecting specific fields and records")
 
-    access_management_id = fields.Many2one('access.management', 'Access Management')
+    access_management_id = fields.Many2one('access.management', 'Access Management', index=True)
 
     read_right = fields.Boolean('Read', default=True, help="The set 'Read' access of the selected model for the specified users")
     create_right = fields.Boolean('Create', help="The set 'Create' access of the selected model for the specified users")
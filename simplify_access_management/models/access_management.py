@@ -1,10 +1,12 @@
-from odoo import fields, models, api, _
+from odoo import fields, models, api, tools, _
 from odoo.exceptions import UserError
-from odoo.http import request
-from .query_prepare import search_data
+from odoo.tools import SQL
+from .access_policy import build_access_policy, build_rule_index, fast_path_stats, get_access_policy, \
+    get_model_policy, POLICY_VERSION_SEQUENCE
 
 class access_management(models.Model):
     _name = 'access.management'
+    _inherit = 'access.policy.mixin'
     _description = "Access Management"
 
     name = fields.Char('Name')
@@ -75,7 +77,6 @@ class access_management(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         res = super(access_management, self).create(vals_list)
-        request.registry.clear_cache()
         for record in res:
             if record.readonly:
                 for user in record.user_ids:
@@ -85,7 +86,6 @@ class access_management(models.Model):
 
     def unlink(self):
         res = super(access_management, self).unlink()
-        request.env.registry.clear_cache()
         return res
 
     def write(self, vals):
@@ -95,64 +95,65 @@ class access_management(models.Model):
             for user in self.user_ids:
                 if user.has_group('base.group_system') or user.has_group('base.group_erp_manager'):
                     raise UserError(_('Admin user can not be set as a read-only..!'))
-        request.env.registry.clear_cache()
         return res
 
+    def init(self):
+        self.env.cr.execute(SQL("CREATE SEQUENCE IF NOT EXISTS %s", SQL.identifier(POLICY_VERSION_SEQUENCE)))
+
+    @api.model
+    @tools.ormcache('self.env.uid', 'self.env.company.id', 'self.env.lang', 'version')
+    def _get_access_policy(self, version):
+        """Compiled rules of the current user and company for a given policy version (immutable, shared)."""
+        return build_access_policy(self.env)
+
+    @api.model
+    @tools.ormcache('version')
+    def _get_rule_index(self, version):
+        """Models having rules for a given policy version, shared by all users (immutable)."""
+        return build_rule_index(self.sudo().env)
+
+    @api.model
+    def get_fast_path_stats(self):
+        """Calls of each ORM hook in this worker and how many returned at once because no rule covers the model."""
+        return fast_path_stats()
+
     def get_remove_options(self, model):
-        restrict_export = search_data(self, self._name, model, ('hide_export','=',True), 'AND')
-        remove_action = search_data(self, 'remove.action', model)
+        policy = get_access_policy(self.env)
+        model_policy = get_model_policy(self.env, model)
         options = []
         added_export = False
 
-        if restrict_export:
+        if policy and 'hide_export' in policy.flags:
             options.append('export')
             added_export = True
 
-        if remove_action:
-            for action in remove_action:
-                if not added_export and action.restrict_export:
-                    options.append('export')
-                if action.restrict_archive_unarchive:
-                    options.append('archive')
-                    options.append('unarchive')
-                if action.restrict_duplicate:
-                    options.append('duplicate')
+        if model_policy.remove_action:
+            if not added_export and 'restrict_export' in model_policy.restrictions:
+                options.append('export')
+            if 'restrict_archive_unarchive' in model_policy.restrictions:
+                options.append('archive')
+                options.append('unarchive')
+            if 'restrict_duplicate' in model_policy.restrictions:
+                options.append('duplicate')
         return options
 
     @api.model
     def get_chatter_hide_details(self, user_id, company_id, model=False):
-        hide_send_mail = hide_log_notes = hide_schedule_activity = False
-        chatter_access_id = search_data(self, self._name, condition=('hide_chatter','=',True), operator='AND', limit=1)
-        if chatter_access_id:
+        policy = get_access_policy(self.env)
+        flags = policy.flags if policy else frozenset()
+        if 'hide_chatter' in flags:
             return {'hide_send_mail': True, 'hide_log_notes': True, 'hide_schedule_activity': True}
-        else:
-            hide_send_mail_id = search_data(self, self._name, condition=('hide_send_mail','=',True), operator='AND',limit=1)
-            if hide_send_mail_id:
-                hide_send_mail = True
-            hide_log_notes_id = search_data(self, self._name, condition=('hide_log_notes','=',True), operator='AND',limit=1)
-            if hide_log_notes_id:
-                hide_log_notes = True
-            hide_schedule_activity_id = search_data(self, self._name, condition=('hide_schedule_activity','=',True), operator='AND',limit=1)
-            if hide_schedule_activity_id:
-                hide_schedule_activity = True
+        hide_send_mail = 'hide_send_mail' in flags
+        hide_log_notes = 'hide_log_notes' in flags
+        hide_schedule_activity = 'hide_schedule_activity' in flags
 
         if model:
-            hide_ids = search_data(self, 'hide.chatter', model, condition=('hide_chatter','=',True), operator='AND', limit=1)
-            if hide_ids:
+            chatter = get_model_policy(self.env, model).chatter
+            if 'hide_chatter' in chatter:
                 return {'hide_send_mail': True, 'hide_log_notes': True, 'hide_schedule_activity': True}
-            else:
-                if not hide_send_mail:
-                    hide_send_mail_id = search_data(self, 'hide.chatter', model, condition=('hide_send_mail','=',True), operator='AND',limit=1)
-                    if hide_send_mail_id:
-                        hide_send_mail = True
-                if not hide_log_notes:
-                    hide_log_notes_id = search_data(self, 'hide.chatter', model, condition=('hide_log_notes','=',True), operator='AND',limit=1)
-                    if hide_log_notes_id:
-                        hide_log_notes = True
-                if not hide_schedule_activity:
-                    hide_schedule_activity_id = search_data(self, 'hide.chatter', model, condition=('hide_schedule_activity','=',True), operator='AND',limit=1)
-                    if hide_schedule_activity_id:
-                        hide_schedule_activity = True
+            hide_send_mail = hide_send_mail or 'hide_send_mail' in chatter
+            hide_log_notes = hide_log_notes or 'hide_log_notes' in chatter
+            hide_schedule_activity = hide_schedule_activity or 'hide_schedule_activity' in chatter
         return {
             'hide_send_mail': hide_send_mail,
             'hide_log_notes': hide_log_notes,
@@ -162,33 +163,22 @@ class access_management(models.Model):
     def is_spread_sheet_available(self, action_model, action_id):
         if action_model and action_id:
             model = self.env[action_model].sudo().browse(action_id).res_model
-            hide_spreadsheet = search_data(self, self._name, model, ('hide_spreadsheet','=',True), 'AND',limit=1)
-            
-            if hide_spreadsheet:
+            policy = get_access_policy(self.env)
+            if policy and 'hide_spreadsheet' in policy.flags:
                 return True
             
-            if model:
-                restrict_spreadsheet = search_data(self, 'remove.action', model, ('restrict_spreadsheet','=',True), 'AND')
-                if restrict_spreadsheet:
-                    return True
+            if model and 'restrict_spreadsheet' in get_model_policy(self.env, model).restrictions:
+                return True
 
         return False
 
     def is_add_property_available(self, model):
-        hide_property = search_data(self, self._name, model, ('hide_add_property','=',True), 'AND')
-        if hide_property:
-            return True
-        return False
+        policy = get_access_policy(self.env)
+        return bool(policy and 'hide_add_property' in policy.flags)
 
     def get_hidden_field(self, model=False):
         if model:
-            hidden_fields = []
-            hide_fields = search_data(self, 'hide.field', model, ('invisible','=',True), 'AND')
-            for hide_field in hide_fields:
-                for field in hide_field.field_id:
-                    if field.name:
-                        hidden_fields.append(field.name)
-            return hidden_fields
+            return [name for name, rule in get_model_policy(self.env, model).fields.items() if rule.invisible]
         return []
     
     def get_hidden_field_by_action(self, action_id=False):
@@ -197,13 +187,7 @@ class access_management(models.Model):
             model = action.res_model or False
             if not model:
                 return []
-            hidden_fields = []
-            hide_fields = search_data(self, 'hide.field', model, ('invisible','=',True), 'AND')
-            for hide_field in hide_fields:
-                for field in hide_field.field_id:
-                    if field.name:
-                        hidden_fields.append(field.name)
-            return hidden_fields
+            return self.get_hidden_field(model)
         return []
 
     # def ishide_sale_product_ext_link(self):
@@ -0,0 +1,319 @@
+import hashlib
+from collections import defaultdict, namedtuple
+
+from odoo import models, api
+from odoo.tools import SQL, frozendict
+
+POLICY_VERSION_KEY = 'simplify_access_management.policy_version'
+POLICY_STATE_CACHE_KEY = 'simplify_access_management.policy_state'
+# non-transactional, so a version seen by a rolled back transaction is never handed out again
+POLICY_VERSION_SEQUENCE = 'simplify_access_management_policy_version_seq'
+
+# Global switches of the module, read once per transaction.
+PolicyState = namedtuple('PolicyState', ['version', 'uninstalling', 'installed'])
+
+# Everything the hooks need to know about the access rules of one user in one company.
+# ``view_key`` digests everything views depend on, so users with the same rules share cached views.
+AccessPolicy = namedtuple('AccessPolicy', ['access_ids', 'readonly', 'flags', 'hidden_menu_ids', 'models', 'view_key'])
+
+ModelPolicy = namedtuple('ModelPolicy', [
+    'domains',          # tuple of DomainRule
+    'remove_action',    # True when a remove.action line exists for the model
+    'restrictions',     # frozenset of the remove.action restrict_* flags set
+    'hidden_action_ids',  # frozenset of server/report action ids
+    'hidden_views',     # frozenset of view type technical names
+    'fields',           # frozendict {field name: FieldRule}
+    'buttons',          # frozenset of button names
+    'pages',            # tuple of (attribute_name, attribute_string, lang_code)
+    'links',            # frozenset of kanban link names
+    'filters',          # frozenset of filter and group by names
+    'chatter',          # frozenset of the hide.chatter flags set
+])
+
+# Models on which any active access pack (with users) has a rule, and the global switches set on any of them.
+RuleIndex = namedtuple('RuleIndex', ['domain_models', 'models', 'flags'])
+
+# Tables of the per-model rule lines; access_domain_ah is the only one used by record-level hooks.
+RULE_TABLES = ('access_domain_ah', 'remove_action', 'hide_field', 'hide_chatter', 'hide_view_nodes',
+               'hide_filters_groups')
+
+# Per worker, {hook: [calls, calls answered without the user policy]}.
+FAST_PATH_STATS = defaultdict(lambda: [0, 0])
+
+DomainRule = namedtuple('DomainRule', ['id', 'access_name', 'domain', 'apply_domain', 'rights', 'in_company'])
+FieldRule = namedtuple('FieldRule', ['invisible', 'readonly', 'required', 'external_link', 'descriptions'])
+
+ACCESS_FLAGS = ('hide_chatter', 'hide_send_mail', 'hide_log_notes', 'hide_schedule_activity', 'hide_export',
+                'hide_import', 'hide_spreadsheet', 'hide_add_property', 'disable_login', 'disable_debug_mode')
+RESTRICT_FLAGS = ('restrict_export', 'restrict_import', 'restrict_create', 'restrict_edit', 'restrict_delete',
+                  'restrict_archive_unarchive', 'restrict_duplicate', 'restrict_chatter', 'restrict_spreadsheet')
+# global switches that change the arch returned by _get_view
+VIEW_FLAGS = ('readonly', 'hide_chatter', 'hide_import', 'hide_export')
+CHATTER_FLAGS = ('hide_chatter', 'hide_send_mail', 'hide_log_notes', 'hide_schedule_activity')
+
+EMPTY_MODEL_POLICY = ModelPolicy((), False, frozenset(), frozenset(), frozenset(), frozendict(), frozenset(), (),
+                                 frozenset(), frozenset(), frozenset())
+
+
+def get_policy_state(env):
+    """Version of the access rules and module state, queried once per transaction."""
+    state = env.cr.cache.get(POLICY_STATE_CACHE_KEY)
+    if state is None:
+        env.cr.execute(SQL("""
+            SELECT (SELECT value FROM ir_config_parameter WHERE key = %s),
+                   EXISTS(SELECT 1 FROM ir_config_parameter WHERE key = 'uninstall_simplify_access_management'),
+                   (SELECT state FROM ir_module_module WHERE name = 'simplify_access_management')
+        """, POLICY_VERSION_KEY))
+        version, uninstalling, module_state = env.cr.fetchone()
+        state = PolicyState(version or '0', uninstalling, module_state == 'installed')
+        env.cr.cache[POLICY_STATE_CACHE_KEY] = state
+    return state
+
+
+def get_access_policy(env):
+    """Compiled access policy of the current user and company, or ``None`` when the module is not active."""
+    state = get_policy_state(env)
+    if state.uninstalling or not state.installed or not env.uid:
+        return None
+    return env['access.management']._get_access_policy(state.version)
+
+
+def get_model_policy(env, model_name):
+    policy = get_access_policy(env)
+    if policy is None:
+        return EMPTY_MODEL_POLICY
+    return policy.models.get(model_name, EMPTY_MODEL_POLICY)
+
+
+def get_rule_index(env):
+    """Index of the models having rules, or ``None`` when the module is not active."""
+    state = get_policy_state(env)
+    if state.uninstalling or not state.installed:
+        return None
+    return env['access.management']._get_rule_index(state.version)
+
+
+def has_rules(env, model_name, hook, domain=False, flags=()):
+    """
+    Whether an active rule may apply to ``model_name`` in ``hook``. Hooks
+    return at once on ``False``, without compiling the policy of the user.
+
+    :param domain: only access.domain.ah lines matter for this hook
+    :param flags: global switches (:data:`ACCESS_FLAGS`, ``readonly``) that matter for this hook
+    """
+    stats = FAST_PATH_STATS[hook]
+    stats[0] += 1
+    index = get_rule_index(env)
+    if index is not None and (model_name in (index.domain_models if domain else index.models)
+                              or not index.flags.isdisjoint(flags)):
+        return True
+    stats[1] += 1
+    return False
+
+
+def fast_path_stats():
+    """Calls of each hook in this worker and how many of them were short-circuited."""
+    return {hook: {'calls': calls, 'short_circuited': skipped} for hook, (calls, skipped) in FAST_PATH_STATS.items()}
+
+
+def build_rule_index(env):
+    for model_name in ('access.management', 'res.users') + tuple(table.replace('_', '.') for table in RULE_TABLES):
+        env[model_name].flush_model()
+    env.cr.execute(SQL("""
+        SELECT im.model, bool_or(rule.is_domain)
+          FROM (%s) AS rule
+          JOIN access_management am ON am.id = rule.access_management_id AND am.active
+          JOIN ir_model im ON im.id = rule.model_id
+         WHERE EXISTS (SELECT 1 FROM access_management_users_rel_ah rel WHERE rel.access_management_id = am.id)
+         GROUP BY im.model
+    """, SQL(" UNION ALL ").join(
+        SQL("SELECT model_id, access_management_id, %s AS is_domain FROM %s",
+            table == 'access_domain_ah', SQL.identifier(table))
+        for table in RULE_TABLES
+    )))
+    rows = env.cr.fetchall()
+    flag_names = ('readonly',) + ACCESS_FLAGS
+    env.cr.execute(SQL("""
+        SELECT %s
+          FROM access_management am
+         WHERE am.active
+           AND EXISTS (SELECT 1 FROM access_management_users_rel_ah rel WHERE rel.access_management_id = am.id)
+    """, SQL(", ").join(SQL("bool_or(am.%s)", SQL.identifier(flag)) for flag in flag_names)))
+    flag_values = env.cr.fetchone()
+    return RuleIndex(
+        domain_models=frozenset(model for model, is_domain in rows if is_domain),
+        models=frozenset(model for model, is_domain in rows),
+        flags=frozenset(flag for flag, value in zip(flag_names, flag_values) if value),
+    )
+
+
+def _canonical(value):
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((_canonical(item) for item in value), key=repr))
+    if isinstance(value, dict):
+        return tuple(sorted((key, _canonical(item)) for key, item in value.items()))
+    if isinstance(value, tuple):
+        return tuple(_canonical(item) for item in value)
+    return value
+
+
+def policy_digest(*values):
+    """Stable digest of immutable policy parts, cheap to hash in cache keys."""
+    return hashlib.sha1(repr(_canonical(values)).encode()).hexdigest()
+
+
+def bump_policy_version(env):
+    """Invalidate every compiled policy. The version is a plain row so the change follows the transaction."""
+    env.cr.execute(SQL("""
+        INSERT INTO ir_config_parameter (key, value, create_uid, create_date, write_uid, write_date)
+        VALUES (%s, nextval(%s)::varchar, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, write_date = EXCLUDED.write_date
+    """, POLICY_VERSION_KEY, POLICY_VERSION_SEQUENCE, env.uid, env.uid))
+    env.cr.cache.pop(POLICY_STATE_CACHE_KEY, None)
+    env['ir.config_parameter'].invalidate_model(['value'])
+
+
+# Access packs of a user that apply in a company, with their domain lines, in one round trip.
+# The statement text never changes, only the parameters (user id, company id) do.
+USER_ACCESS_QUERY = """
+    SELECT am.id, am.name, cmp.company_id IS NOT NULL,
+           ad.id, im.model, ad.domain, ad.apply_domain,
+           ad.read_right, ad.create_right, ad.write_right, ad.delete_right
+      FROM access_management_users_rel_ah rel
+      JOIN access_management am ON am.id = rel.access_management_id AND am.active
+ LEFT JOIN access_management_comapnay_rel cmp ON cmp.access_management_id = am.id AND cmp.company_id = %s
+ LEFT JOIN access_domain_ah ad ON ad.access_management_id = am.id
+ LEFT JOIN ir_model im ON im.id = ad.model_id
+     WHERE rel.user_id = %s
+       AND (am.is_apply_on_without_company OR cmp.company_id IS NOT NULL)
+  ORDER BY am.id, ad.id
+"""
+
+
+def fetch_user_accesses(env):
+    """
+    Access packs applying to the user of ``env`` in its current company, and
+    their domain lines as :class:`DomainRule`.
+
+    :return: (access ids, list of (model name, DomainRule))
+    """
+    env['access.management'].flush_model(['name', 'active', 'is_apply_on_without_company', 'user_ids',
+                                           'company_ids'])
+    env['access.domain.ah'].flush_model()
+    env.cr.execute(SQL(USER_ACCESS_QUERY, env.company.id, env.uid))
+    access_ids = []
+    domain_rules = []
+    for (access_id, access_name, in_company, rule_id, model_name, domain, apply_domain,
+         read_right, create_right, write_right, delete_right) in env.cr.fetchall():
+        if not access_ids or access_ids[-1] != access_id:
+            access_ids.append(access_id)
+        if rule_id is None:
+            continue
+        rights = {mode for mode, right in (('read', read_right), ('create', create_right),
+                                           ('write', write_right), ('unlink', delete_right)) if right}
+        domain_rules.append((model_name, DomainRule(
+            rule_id, access_name, domain or False, apply_domain, frozenset(rights), in_company)))
+    return access_ids, domain_rules
+
+
+def build_access_policy(env):
+    """Read every rule that applies to the user of ``env`` in its current company."""
+    access_ids, domain_rules = fetch_user_accesses(env)
+    accesses = env['access.management'].sudo().browse(access_ids)
+
+    models = {}
+
+    def model_data(model_name):
+        return models.setdefault(model_name, {
+            'domains': [], 'remove_action': False, 'restrictions': set(), 'hidden_action_ids': set(),
+            'hidden_views': set(), 'fields': {}, 'buttons': set(), 'pages': [], 'links': set(),
+            'filters': set(), 'chatter': set(),
+        })
+
+    for model_name, rule in domain_rules:
+        model_data(model_name)['domains'].append(rule)
+
+    for remove_action in accesses.remove_action_ids.filtered('model_id'):
+        data = model_data(remove_action.model_id.model)
+        data['remove_action'] = True
+        data['restrictions'].update(flag for flag in RESTRICT_FLAGS if remove_action[flag])
+        data['hidden_action_ids'].update(remove_action.server_action_ids.action_id.ids)
+        data['hidden_action_ids'].update(remove_action.report_action_ids.action_id.ids)
+        data['hidden_views'].update(remove_action.view_data_ids.filtered('techname').mapped('techname'))
+
+    for hide_field in accesses.hide_field_ids.filtered('model_id'):
+        data = model_data(hide_field.model_id.model)
+        for field in hide_field.field_id:
+            invisible, readonly, required, external_link, descriptions = data['fields'].get(
+                field.name, (False, False, False, False, frozenset()))
+            data['fields'][field.name] = FieldRule(
+                invisible or hide_field.invisible, readonly or hide_field.readonly,
+                required or hide_field.required, external_link or hide_field.external_link,
+                descriptions | {field.field_description})
+
+    for hide_nodes in accesses.hide_view_nodes_ids:
+        data = model_data(hide_nodes.model_id.model)
+        data['buttons'].update(hide_nodes.btn_store_model_nodes_ids.mapped('attribute_name'))
+        data['links'].update(hide_nodes.link_store_model_nodes_ids.mapped('attribute_name'))
+        data['pages'].extend((page.attribute_name, page.attribute_string, page.lang_code)
+                             for page in hide_nodes.page_store_model_nodes_ids)
+
+    for hide_filters in accesses.hide_filters_groups_ids:
+        data = model_data(hide_filters.model_id.model)
+        data['filters'].update(hide_filters.filters_store_model_nodes_ids.mapped('attribute_name'))
+        data['filters'].update(hide_filters.groups_store_model_nodes_ids.mapped('attribute_name'))
+
+    for hide_chatter in accesses.hide_chatter_ids.filtered('model_id'):
+        model_data(hide_chatter.model_id.model)['chatter'].update(
+            flag for flag in CHATTER_FLAGS if hide_chatter[flag])
+
+    readonly = any(accesses.mapped('readonly'))
+    flags = frozenset(flag for flag in ACCESS_FLAGS if any(accesses.mapped(flag)))
+    model_policies = frozendict({
+        model_name: ModelPolicy(
+            domains=tuple(data['domains']),
+            remove_action=data['remove_action'],
+            restrictions=frozenset(data['restrictions']),
+            hidden_action_ids=frozenset(data['hidden_action_ids']),
+            hidden_views=frozenset(data['hidden_views']),
+            fields=frozendict(data['fields']),
+            buttons=frozenset(name for name in data['buttons'] if name),
+            pages=tuple(data['pages']),
+            links=frozenset(name for name in data['links'] if name),
+            filters=frozenset(name for name in data['filters'] if name),
+            chatter=frozenset(data['chatter']),
+        ) for model_name, data in models.items()
+    })
+    return AccessPolicy(
+        access_ids=frozenset(accesses.ids),
+        readonly=readonly,
+        flags=flags,
+        hidden_menu_ids=frozenset(accesses.hide_menu_ids.mapped('menu_id')),
+        models=model_policies,
+        view_key=policy_digest(readonly, flags, {
+            model_name: model_policy._replace(domains=tuple(rule.rights for rule in model_policy.domains))
+            for model_name, model_policy in model_policies.items()
+        }),
+    )
+
+
+class AccessPolicyMixin(models.AbstractModel):
+    """Bump the access policy version whenever a record holding access rules changes."""
+    _name = 'access.policy.mixin'
+    _description = 'Access Policy Invalidation'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        bump_policy_version(self.env)
+        return res
+
+    def write(self, vals):
+        res = super().write(vals)
+        bump_policy_version(self.env)
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        bump_policy_version(self.env)
+        return res
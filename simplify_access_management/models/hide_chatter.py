@@ -4,6 +4,7 @@ from lxml import etree
 
 class hide_chatter(models.Model):
     _name = 'hide.chatter'
+    _inherit = 'access.policy.mixin'
     _description = "Chatter Rights"
 
     access_management_id = fields.Many2one('access.management', 'Access Management')
@@ -4,6 +4,7 @@ from lxml import etree
 
 class hide_field(models.Model):
     _name = 'hide.field'
+    _inherit = 'access.policy.mixin'
     _description = "Fields Rights"
 
     access_management_id = fields.Many2one('access.management', 'Access Management')
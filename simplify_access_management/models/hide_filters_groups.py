@@ -5,6 +5,7 @@ import ast
 
 class hide_filters_groups(models.Model):
     _name = 'hide.filters.groups'
+    _inherit = 'access.policy.mixin'
     _description = 'Hide Filters Groups'
 
     model_id = fields.Many2one('ir.model', string='Model', index=True, required=True, ondelete='cascade')
@@ -98,6 +99,7 @@ class hide_filters_groups(models.Model):
 
 class store_model_nodes(models.Model):
     _name = 'store.filters.groups'
+    _inherit = 'access.policy.mixin'
     _description = 'Store Filters Groups'
     _rec_name = 'attribute_string'
 
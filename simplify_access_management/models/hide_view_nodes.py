@@ -1,10 +1,14 @@
-from odoo import fields, models, api, _
-from odoo.tools.translate import TranslationModuleReader
-from lxml import etree
+import logging
+
+from odoo import fields, models, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
 
 
 class hide_view_nodes(models.Model):
     _name = 'hide.view.nodes'
+    _inherit = 'access.policy.mixin'
     _description = 'Hide View Nodes'
 
     model_id = fields.Many2one(
@@ -27,27 +31,8 @@ class hide_view_nodes(models.Model):
 
     access_management_id = fields.Many2one('access.management', 'Access Management')
 
-    def _store_btn_data(self, btn, smart_button=False, smart_button_string=False):
-        # string_value is used in case of kanban view button store, 
-        string_value = 'string_value' in self._context.keys() and self._context['string_value'] or False
-
-        store_model_button_obj = self.env['store.model.nodes'].sudo()
-        name = btn.get('string') or string_value
-        if smart_button:
-            name = smart_button_string
-        store_model_button_obj.create({
-            'model_id': self.model_id.id,
-            'node_option': 'button',
-            'attribute_name': btn.get('name'),
-            'attribute_string': name,
-            'button_type': btn.get('type'),
-            'is_smart_button': smart_button,
-            'lang_code': self.env.lang,
-        })
-
-    def _get_smart_btn_string(self, btn_list, type=False):
-        store_model_button_obj = self.env['store.model.nodes'].sudo()
-
+    @api.model
+    def _get_smart_btn_string(self, btn):
         def _get_span_text(span_list):
             name = ''
             for sp in span_list:
@@ -56,161 +41,158 @@ class hide_view_nodes(models.Model):
             name = name.strip()
             return name
 
-        for btn in btn_list:
-            name = ''
-            field_list = btn.findall('field')
-            if field_list:
-                name = field_list[0].get('string')
+        name = ''
+        field_list = btn.findall('field')
+        if field_list:
+            name = field_list[0].get('string')
+        else:
+            span_list = btn.findall('span')
+            if span_list:
+                name = _get_span_text(span_list)
             else:
-                span_list = btn.findall('span')
-                if span_list:
-                    name = _get_span_text(span_list)
-                else:
-                    div_list = btn.findall('div')
-                    if div_list:
-                        span_list = div_list[0].findall('span')
-                        if span_list:
-                            name = _get_span_text(span_list)
-            if not name:
-                try:
-                    name = btn.get('string')
-                except:
-                    pass
-            if name and (type == 'object' or type == 'action'):
-                domain = [('button_type', '=', btn.get('type')), ('attribute_string', '=', name),
-                          ('model_id', '=', self.model_id.id), ('node_option', '=', 'button')]
-                if type == 'object':
-                    domain += [('attribute_name', '=', btn.get('name'))]
-                if type == 'action':
-                    domain += [('attribute_name', '=', btn.get('name'))]
-                smart_button_id = store_model_button_obj.search(domain)
-                if not smart_button_id:
-                    self._store_btn_data(btn, smart_button=True, smart_button_string=name)
-                else:
-                    smart_button_id[0].is_smart_button = True
+                div_list = btn.findall('div')
+                if div_list:
+                    span_list = div_list[0].findall('span')
+                    if span_list:
+                        name = _get_span_text(span_list)
+        return name or btn.get('string')
 
     @api.model
-    @api.onchange('model_id')
-    def _get_button(self):
+    def _collect_view_nodes(self, doc, view_type, model_name):
+        """Buttons, kanban links and pages of one combined arch, as store.model.nodes values (without model)."""
+        nodes = []
+        for btn in doc.xpath("//a"):
+            if btn.text and '\n' not in btn.text and btn.get('type') and btn.get('name'):
+                nodes.append({'node_option': 'link', 'attribute_name': btn.get('name'),
+                              'attribute_string': btn.text, 'button_type': btn.get('type')})
+
+        for button_type in ('object', 'action'):
+            for btn in doc.xpath("//button[@type='%s']" % button_type):
+                string_value = btn.get('string')
+                if view_type == 'kanban' and not string_value and btn.text and not btn.text.startswith('\n'):
+                    string_value = btn.text
+                if not string_value and button_type == 'object':
+                    for stat_text in btn.findall(".//*[@class='o_stat_text']"):
+                        if stat_text.text:
+                            string_value = (string_value or "") + " " + stat_text.text
+                if btn.get('name') and string_value:
+                    nodes.append({'node_option': 'button', 'attribute_name': btn.get('name'),
+                                  'attribute_string': string_value, 'button_type': button_type})
+
+        if view_type == 'form':
+            ## Smart Buttons Extraction
+            button_box = doc.xpath("//div[@class='oe_button_box']")
+            if button_box:
+                for button_type in ('object', 'action'):
+                    for btn in button_box[0].xpath(".//button[@type='%s']" % button_type):
+                        name = self._get_smart_btn_string(btn)
+                        if name:
+                            nodes.append({'node_option': 'button', 'attribute_name': btn.get('name'),
+                                          'attribute_string': name, 'button_type': btn.get('type'),
+                                          'is_smart_button': True})
+
+            ## Tab Extraction
+            pages = doc.xpath("//page")
+            if model_name == 'res.config.settings':
+                pages += doc.xpath("//app")
+            for page in pages:
+                if page.get('string'):
+                    nodes.append({'node_option': 'page', 'attribute_string': page.get('string'),
+                                  'attribute_name': page.get('name') or ('' if page.tag == 'app' else False)})
+        return nodes
+
+    @api.model
+    def _discover_view_nodes(self, ir_models):
+        """
+        Store the buttons, links and pages found in the form, list and kanban
+        views of ``ir_models`` (ir.model records). Each primary view is combined
+        and parsed once, the nodes are compared in memory with the stored ones
+        and the new ones are inserted in one batch.
+        """
         store_model_nodes_obj = self.env['store.model.nodes'].sudo()
-        view_obj = self.env['ir.ui.view'].sudo()
+        ir_models = ir_models.filtered(lambda model: model.model in self.env)
+        if not ir_models:
+            return store_model_nodes_obj
+
+        def _key(model_id, vals):
+            if vals['node_option'] == 'page':
+                return (model_id, 'page', vals['attribute_string'], vals['attribute_name'] or None)
+            return (model_id, vals['node_option'], vals['button_type'], vals['attribute_string'],
+                    vals['attribute_name'])
+
+        existing = {}
+        smart_ids = set()
+        for node in store_model_nodes_obj.search_read(
+                [('model_id', 'in', ir_models.ids)],
+                ['model_id', 'node_option', 'attribute_name', 'attribute_string', 'button_type', 'is_smart_button']):
+            model_id = node['model_id'][0]
+            existing.setdefault(_key(model_id, node), node['id'])
+            if node['node_option'] == 'page':
+                # a page stored without name matches any page with the same string
+                existing.setdefault((model_id, 'page', node['attribute_string'], None), node['id'])
+            if node['is_smart_button']:
+                smart_ids.add(node['id'])
+
+        model_by_name = {model.model: model for model in ir_models}
+        views = self.env['ir.ui.view'].sudo().search([('model', 'in', list(model_by_name)),
+                                                      ('type', 'in', ['form', 'list', 'kanban']),
+                                                      ('mode', '=', 'primary')])
+        vals_list = []
+        new_smart_ids = set()
+        for view in views:
+            model = model_by_name[view.model]
+            try:
+                doc, _view = self.env[view.model].sudo()._get_view(view_id=view.id, view_type=view.type)
+            except Exception as e:
+                _logger.warning("Could not read the nodes of view %s (%s): %s", view.xml_id or view.id, view.model, e)
+                continue
+            for vals in self._collect_view_nodes(doc, view.type, view.model):
+                key = _key(model.id, vals)
+                node = existing.get(key)
+                if node is None:
+                    # new nodes are kept as their values, stored ones as their id
+                    node = existing[key] = dict(vals, model_id=model.id, lang_code=self.env.lang)
+                    if vals['node_option'] == 'page':
+                        existing.setdefault((model.id, 'page', vals['attribute_string'], None), node)
+                    vals_list.append(node)
+                elif vals.get('is_smart_button'):
+                    if isinstance(node, dict):
+                        node['is_smart_button'] = True
+                    elif node not in smart_ids:
+                        new_smart_ids.add(node)
+        if new_smart_ids:
+            store_model_nodes_obj.browse(new_smart_ids).write({'is_smart_button': True})
+        return store_model_nodes_obj.create(vals_list)
 
+    @api.model
+    @api.onchange('model_id')
+    def _get_button(self):
         if self.model_id and self.model_name:
+            self._discover_view_nodes(self.model_id)
 
-            view_list = ['form', 'list', 'kanban']
-            for view in view_list:
-                for views in view_obj.search([('model', '=', self.model_name), ('type', '=', view)]):
-                    res = self.env[self.model_name].sudo().get_view(view_id=views.id, view_type=view)
-                    # res = self.env[self.model_name].sudo().fields_view_get(view_id=views.id,view_type=view)
-                    doc = etree.XML(res['arch'])
-
-                    object_link = doc.xpath("//a")
-                    for btn in object_link:
-                        if btn.text and '\n' not in btn.text and 'type' in btn.attrib.keys() and btn.attrib[
-                            'type'] and 'name' in btn.attrib.keys() and btn.attrib['name']:
-                            domain = [('button_type', '=', btn.get('type')), ('attribute_string', '=', btn.text),
-                                      ('attribute_name', '=', btn.get('name')), ('model_id', '=', self.model_id.id),
-                                      ('node_option', '=', 'link')]
-                            if not store_model_nodes_obj.search(domain):
-                                store_model_nodes_obj.create({
-                                    'model_id': self.model_id.id,
-                                    'node_option': 'link',
-                                    'attribute_name': btn.get('name'),
-                                    'attribute_string': btn.text,
-                                    'button_type': btn.get('type'),
-                                    'lang_code': self.env.lang,
-                                })
-
-                    object_button = doc.xpath("//button[@type='object']")
-                    for btn in object_button:
-                        string_value = btn.get('string')
-                        if view == 'kanban' and not string_value:
-                            try:
-                                string_value = btn.text if not btn.text.startswith('\n') else False
-                            except:
-                                pass
-
-                        if not string_value:
-                            fields = btn.findall(".//*[@class='o_stat_text']")
-                            if fields:
-                                string_value = ""
-                            for f in fields:
-                                if f.text:
-                                    string_value += " " + f.text
-
-                        if btn.get('name') and string_value:
-                            domain = [('button_type', '=', btn.get('type')), ('attribute_string', '=', string_value),
-                                      ('attribute_name', '=', btn.get('name')), ('model_id', '=', self.model_id.id),
-                                      ('node_option', '=', 'button')]
-                            if not store_model_nodes_obj.search(domain):
-                                self.with_context(string_value=string_value)._store_btn_data(btn)
-
-                    action_button = doc.xpath("//button[@type='action']")
-                    for btn in action_button:
-                        string_value = btn.get('string')
-                        if view == 'kanban' and not string_value:
-                            try:
-                                string_value = btn.text if not btn.text.startswith('\n') else False
-                            except:
-                                pass
-                        if btn.get('name') and string_value:
-                            domain = [('button_type', '=', btn.get('type')), ('attribute_string', '=', string_value),
-                                      ('attribute_name', '=', btn.get('name')), ('model_id', '=', self.model_id.id),
-                                      ('node_option', '=', 'button')]
-                            if not store_model_nodes_obj.search(domain):
-                                self.with_context(string_value=string_value)._store_btn_data(btn)
-
-                    if view == 'form':
-                        ## Smart Buttons Extraction
-                        smt_button_division = doc.xpath("//div[@class='oe_button_box']")
-                        if smt_button_division:
-                            smt_button_division = etree.tostring(smt_button_division[0])
-                            smt_button_division = etree.XML(smt_button_division)
-
-                            smt_object_button = smt_button_division.xpath("//button[@type='object']")
-                            self._get_smart_btn_string(smt_object_button, type='object')
-
-                            smt_action_button = smt_button_division.xpath("//button[@type='action']")
-                            self._get_smart_btn_string(smt_action_button, type='action')
-
-                        ## Tab Extraction
-                        page_list = doc.xpath("//page")
-                        if page_list:
-                            for page in page_list:
-                                if page.get('string'):
-                                    domain = [('attribute_string', '=', page.get('string')),
-                                              ('model_id', '=', self.model_id.id), ('node_option', '=', 'page')]
-                                    if page.get('name'):
-                                        domain += [('attribute_name', '=', page.get('name'))]
-                                    store_model_nodes_id = store_model_nodes_obj.search(domain, limit=1)
-                                    if not store_model_nodes_id:
-                                        store_model_nodes_obj.create({
-                                            'model_id': self.model_id.id,
-                                            'attribute_name': page.get('name'),
-                                            'attribute_string': page.get('string'),
-                                            'node_option': 'page',
-                                            'lang_code': self.env.lang,
-                                        })
-                        if self.model_name == 'res.config.settings':
-                            for setting_page in doc.xpath("//app"):
-                                if setting_page.get('string'):
-                                    domain = [('attribute_string', '=', setting_page.get('string')),
-                                              ('model_id', '=', self.model_id.id), ('node_option', '=', 'page')]
-                                    if setting_page.get('name'):
-                                        domain += [('attribute_name', '=', setting_page.get('name'))]
-                                    store_model_nodes_id = store_model_nodes_obj.search(domain, limit=1)
-                                    if not store_model_nodes_id:
-                                        store_model_nodes_obj.create({
-                                            'model_id': self.model_id.id,
-                                            'attribute_name': setting_page.get('name') or '',
-                                            'attribute_string': setting_page.get('string'),
-                                            'node_option': 'page',
-                                            'lang_code': self.env.lang,
-                                        })
+    @api.model
+    def _discover_changed_view_nodes(self):
+        """Precommit hook: rescan the models whose views changed and whose nodes are already stored."""
+        model_names = self.env.cr.precommit.data.pop('simplify_access_management.view_node_models', set())
+        if not model_names:
+            return
+        self.env['store.model.nodes'].flush_model()
+        self.env.cr.execute(SQL("""
+            SELECT DISTINCT im.id
+              FROM store_model_nodes smn
+              JOIN ir_model im ON im.id = smn.model_id
+             WHERE im.model IN %s
+        """, tuple(model_names)))
+        model_ids = [row[0] for row in self.env.cr.fetchall()]
+        if model_ids:
+            self._discover_view_nodes(self.env['ir.model'].browse(model_ids))
+            # precommit hooks run after the environment is flushed
+            self.env.flush_all()
 
 
 class store_model_nodes(models.Model):
     _name = 'store.model.nodes'
+    _inherit = 'access.policy.mixin'
     _description = 'Store Model Nodes'
     _rec_name = 'attribute_string'
 
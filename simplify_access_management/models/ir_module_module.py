@@ -1,4 +1,5 @@
 from odoo import models,fields,api,_
+from .access_policy import bump_policy_version
 
 class ir_module_module(models.Model):
     _inherit = "ir.module.module"
@@ -12,6 +13,7 @@ class ir_module_module(models.Model):
                 value.value = 'True'
             else:
                 config_parameter_obj.create({'key':'uninstall_simplify_access_management','value':'True'})
+            bump_policy_version(self.env)
             
         res = super(ir_module_module,self).button_immediate_uninstall()
         config_parameter_obj.search([('key','=','uninstall_simplify_access_management')],limit=1).unlink()
@@ -1,35 +1,55 @@
-from odoo import fields, models, api, _
-from odoo.http import request
+from odoo import fields, models, api, tools, _
+from .access_policy import get_access_policy
 
 class ir_ui_menu(models.Model):
     _inherit = 'ir.ui.menu'
 
     @api.model
     def search(self, args, offset=0, limit=None, order=None):
-        ids = super(ir_ui_menu, self).search(args, offset=0, limit=None, order=order)
-        all_menu =ids.ids
-        # user = self.env.user
-        # # user.clear_caches()
-        # self.env['ir.ui.view'].sudo().clear_caches()
-        # request.registry.clear_cache()
-        # self.sudo().clear_caches()
-        try:
-            cids = request.httprequest.cookies.get('cids') and request.httprequest.cookies.get('cids').split('-')[0] or self.env.company.id
-            for menu_id in self.env.user.access_management_ids.filtered(lambda line: line.is_apply_on_without_company == True or int(cids) in line.company_ids.ids).mapped('hide_menu_ids.menu_id'):
-                if menu_id in all_menu:
-                    all_menu.remove(menu_id)
-                # menu_id = self.browse(menu_id)
-                # if menu_id in ids:
-                #     ids = ids - menu_id
-            # if offset:
-            #     ids = ids[offset:]
-            # if limit:
-            #     ids = ids[:limit]
-        except:
-            pass
-        return self.browse(all_menu)
-        # return len(ids) if count else ids
-    
+        policy = get_access_policy(self.env)
+        if (not policy or not policy.hidden_menu_ids or self._context.get('access_management_all_menus')
+                or self._context.get('ir.ui.menu.full_list')):
+            return super(ir_ui_menu, self).search(args, offset=offset, limit=limit, order=order)
+        # like the visibility filter of the base search, hidden menus go before offset/limit
+        menus = super(ir_ui_menu, self).search(args, order=order)
+        hidden_menu_ids = policy.hidden_menu_ids
+        menus = self.browse([menu_id for menu_id in menus._ids if menu_id not in hidden_menu_ids])
+        if offset:
+            menus = menus[offset:]
+        if limit:
+            menus = menus[:limit]
+        return menus
+
+    @api.model
+    def load_menus(self, debug):
+        # the stock menu tree is cached per user; hidden menus are removed from a copy of it,
+        # so a change of access rules needs no cache flush
+        policy = get_access_policy(self.env)
+        if not policy or not policy.hidden_menu_ids:
+            return super(ir_ui_menu, self.with_context(access_management_all_menus=True)).load_menus(debug)
+        return self._load_menus_without(debug, policy.hidden_menu_ids)
+
+    @api.model
+    @tools.ormcache('self._uid', 'debug', 'self.env.lang', 'hidden_menu_ids')
+    def _load_menus_without(self, debug, hidden_menu_ids):
+        menus = super(ir_ui_menu, self.with_context(access_management_all_menus=True)).load_menus(debug)
+        return self._filter_hidden_menus(menus, hidden_menu_ids)
+
+    @api.model
+    def _filter_hidden_menus(self, menus, hidden_menu_ids):
+        """Copy of a ``load_menus`` tree without the hidden menus and their children."""
+        filtered = {}
+        todo = ['root']
+        while todo:
+            menu_id = todo.pop()
+            menu = menus.get(menu_id)
+            if not menu:
+                continue
+            children = [child for child in menu.get('children', []) if child not in hidden_menu_ids]
+            filtered[menu_id] = dict(menu, children=children)
+            todo.extend(children)
+        return filtered
+
     @api.model_create_multi
     def create(self, vals_list):
         res = super(ir_ui_menu, self).create(vals_list)
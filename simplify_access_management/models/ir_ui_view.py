@@ -1,12 +1,71 @@
-from odoo import models, SUPERUSER_ID, _
+from odoo import api, models, SUPERUSER_ID, _
 from odoo.tools.translate import _
 from odoo.http import request
 import ast
-from .query_prepare import search_data
+from .access_policy import get_model_policy, has_rules, EMPTY_MODEL_POLICY
+
+# ir.ui.view fields that change the nodes of a combined arch
+VIEW_NODE_FIELDS = {'arch', 'arch_db', 'arch_fs', 'arch_base', 'inherit_id', 'mode', 'active', 'model', 'type'}
 
 class ir_ui_view(models.Model):
     _inherit = 'ir.ui.view'
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        views = super().create(vals_list)
+        views._queue_view_node_discovery()
+        return views
+
+    def write(self, vals):
+        res = super().write(vals)
+        if VIEW_NODE_FIELDS.intersection(vals):
+            self._queue_view_node_discovery()
+        return res
+
+    def _queue_view_node_discovery(self):
+        """Rescan the buttons/pages of the models of these views once, when the transaction commits."""
+        if not self.pool.ready:
+            return
+        model_names = {view.model for view in self if view.model and view.type in ('form', 'list', 'kanban')}
+        if not model_names:
+            return
+        queued = self.env.cr.precommit.data.setdefault('simplify_access_management.view_node_models', set())
+        if not queued:
+            self.env.cr.precommit.add(self.env['hide.view.nodes'].sudo()._discover_changed_view_nodes)
+        queued.update(model_names)
+
+    def _get_access_model_policy(self, name_manager):
+        """Access policy of the model of ``name_manager``, looked up once per view build."""
+        model_policy = getattr(name_manager, '_access_model_policy', None)
+        if model_policy is None:
+            model_name = name_manager.model._name
+            if has_rules(self.env, model_name, 'view postprocessing'):
+                model_policy = get_model_policy(self.env, model_name)
+            else:
+                model_policy = EMPTY_MODEL_POLICY
+            name_manager._access_model_policy = model_policy
+        return model_policy
+
+    def _get_access_hidden_pages(self, name_manager):
+        """Names and strings (in the current language) of the hidden pages, computed once per view build."""
+        hidden_pages = getattr(name_manager, '_access_hidden_pages', None)
+        if hidden_pages is None:
+            names, strings = set(), set()
+            translations = {}
+            for attribute_name, attribute_string, lang_code in self._get_access_model_policy(name_manager).pages:
+                names.add(attribute_name)
+                if lang_code != self.env.lang:
+                    if lang_code not in translations:
+                        field = self.env['ir.ui.view']._fields['arch_db']
+                        translations[lang_code] = field.get_translation_dictionary(
+                            self.with_context(lang=lang_code).arch_db,
+                            {self.env.lang: self.with_context(lang=self.env.lang)['arch_db']})
+                    attribute_string = translations[lang_code].get(attribute_string, {}).get(self.env.lang)
+                if attribute_string:
+                    strings.add(attribute_string)
+            hidden_pages = name_manager._access_hidden_pages = (frozenset(names), frozenset(strings))
+        return hidden_pages
+
     def _postprocess_tag_field(self, node, name_manager, node_info):
         super()._postprocess_tag_field(node, name_manager, node_info)
         try:
@@ -17,44 +76,40 @@ class ir_ui_view(models.Model):
             
             # hide_fields -= hide_fields.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
 
-            hide_fields = search_data(self, 'hide.field', name_manager.model._name)
+            hide_fields = self._get_access_model_policy(name_manager).fields
             if node.tag == 'field' or node.tag == 'label':
-                for hide_field in hide_fields:
-                    for field_id in hide_field.field_id:
-                        # print(node.get('name'), '\n')
-                        if (node.tag == 'field' and node.get('name') == field_id.name) or (
-                                node.tag == 'label' and 'for' in node.attrib.keys() and node.attrib[
-                            'for'] == field_id.name):
-                            # if node.tag == 'field':
-                            if hide_field.external_link:
-                                options_dict = {}
-                                if 'widget' in node.attrib.keys():
-                                    if node.attrib['widget'] == 'product_configurator' or node.attrib['widget'] == 'many2one_avatar_user':
-                                        del node.attrib['widget']
+                hide_field = hide_fields.get(node.get('name') if node.tag == 'field' else node.get('for'))
+                if hide_field:
+                    # if node.tag == 'field':
+                    if hide_field.external_link:
+                        options_dict = {}
+                        if 'widget' in node.attrib.keys():
+                            if node.attrib['widget'] == 'product_configurator' or node.attrib['widget'] == 'many2one_avatar_user':
+                                del node.attrib['widget']
                                         
-                                if 'options' in node.attrib.keys():
-                                    options_dict = ast.literal_eval(node.attrib['options'])
-                                    options_dict.update({"no_edit": True, "no_create": True, "no_open": True})
-                                    node.attrib['options'] = str(options_dict)
-                                else:
-                                    # node.attrib.update({'can_create': 'false', 'can_write': 'false','no_open':'true'})
-                                    options_dict.update({'no_create': True, 'no_edit': True,'no_open': True})
-                                    node.attrib['options'] = str(options_dict)
+                        if 'options' in node.attrib.keys():
+                            options_dict = ast.literal_eval(node.attrib['options'])
+                            options_dict.update({"no_edit": True, "no_create": True, "no_open": True})
+                            node.attrib['options'] = str(options_dict)
+                        else:
+                            # node.attrib.update({'can_create': 'false', 'can_write': 'false','no_open':'true'})
+                            options_dict.update({'no_create': True, 'no_edit': True,'no_open': True})
+                            node.attrib['options'] = str(options_dict)
                                     
-                                # node.attrib.update({'can_create': 'false', 'can_write': 'false','no_open':'true'})
+                        # node.attrib.update({'can_create': 'false', 'can_write': 'false','no_open':'true'})
                                     
-                            if hide_field.invisible:
-                                node_info['column_invisible'] = True
-                                node.set('column_invisible', 'True')
-                                node_info['invisible'] = True
-                                node.set('invisible', '1')
-                            if hide_field.readonly:
-                                node_info['readonly'] = True
-                                node.set('readonly', '1')
-                                node.set('force_save', '1')
-                            if hide_field.required:
-                                node_info['required'] = True
-                                node.set('required', '1')
+                    if hide_field.invisible:
+                        node_info['column_invisible'] = True
+                        node.set('column_invisible', 'True')
+                        node_info['invisible'] = True
+                        node.set('invisible', '1')
+                    if hide_field.readonly:
+                        node_info['readonly'] = True
+                        node.set('readonly', '1')
+                        node.set('force_save', '1')
+                    if hide_field.required:
+                        node_info['required'] = True
+                        node.set('required', '1')
 
         except Exception:
             pass
@@ -72,15 +127,9 @@ class ir_ui_view(models.Model):
         #      ('access_management_id.user_ids', 'in', request.env.uid)])
         
         # hide_button_ids -= hide_button_ids.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-        hide_button_ids = search_data(self, 'hide.view.nodes', name_manager.model._name)
         # Filtered with same env user and current model
-        btn_store_model_nodes_ids = hide_button_ids.mapped('btn_store_model_nodes_ids') if hide_button_ids else False
-        # translation_obj = self.env['ir.translation']
-        if btn_store_model_nodes_ids:
-            for btn in btn_store_model_nodes_ids:
-                if btn.attribute_name == node.get('name'):
-                    hide = [btn]
-                    break
+        if node.get('name') in self._get_access_model_policy(name_manager).buttons:
+            hide = True
         if hide:
             node.set('invisible', '1')
             if 'attrs' in node.attrib.keys() and node.attrib['attrs']:
@@ -102,27 +151,9 @@ class ir_ui_view(models.Model):
         #                                            ('access_management_id.user_ids', 'in', request.env.uid)])
         
         # hide_tab_ids -= hide_tab_ids.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-        hide_tab_ids = search_data(self, 'hide.view.nodes', name_manager.model._name)
-        page_store_model_nodes_ids = hide_tab_ids.mapped('page_store_model_nodes_ids') if hide_tab_ids else False
-        if page_store_model_nodes_ids:
-
-            for tab in page_store_model_nodes_ids:
-                attribute_string = tab.attribute_string
-                attribute_name = tab.attribute_name
-                
-                if tab.lang_code != self.env.lang:
-                    field = self.env['ir.ui.view']._fields['arch_db']
-                    translation_dictionary = field.get_translation_dictionary(
-                        self.with_context(lang=tab.lang_code).arch_db,
-                        {self.env.lang: self.with_context(lang=self.env.lang)['arch_db']})
-                    attribute_string = translation_dictionary[attribute_string][self.env.lang]
-                    if not attribute_string:
-                        if tab.attribute_name == node.attrib.get('name'):
-                            hide = [tab]
-                            break
-                if attribute_string == node.get('string') or attribute_name == node.get('name'):
-                    hide = [tab]
-                    break
+        hidden_page_names, hidden_page_strings = self._get_access_hidden_pages(name_manager)
+        if node.get('name') in hidden_page_names or node.get('string') in hidden_page_strings:
+            hide = True
         if hide:
             node.set('invisible', '1')
             if 'attrs' in node.attrib.keys() and node.attrib['attrs']:
@@ -145,13 +176,8 @@ class ir_ui_view(models.Model):
         #                                            ('access_management_id.user_ids', 'in', request.env.uid)])
         
         # hide_tab_ids -= hide_tab_ids.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-        hide_tab_ids = search_data(self, 'hide.view.nodes', name_manager.model._name)
-        link_store_model_nodes_ids = hide_tab_ids.mapped('link_store_model_nodes_ids') if hide_tab_ids else False
-        if link_store_model_nodes_ids:
-            for link in link_store_model_nodes_ids:
-                if _(link.attribute_name) == node.get('name'):
-                    hide = [link]
-                    break
+        if node.get('name') in self._get_access_model_policy(name_manager).links:
+            hide = True
         if hide:
             node.set('invisible', '1')
             if 'attrs' in node.attrib.keys() and node.attrib['attrs']:
@@ -173,18 +199,10 @@ class ir_ui_view(models.Model):
         #                                                ('access_management_id.user_ids', 'in', request.env.uid)])
         
         # setting_tabs -= setting_tabs.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-        setting_tabs = search_data(self, 'hide.view.nodes', name_manager.model._name)
         if name_manager.model._name == 'res.config.settings' and node.tag == 'app' and node.get('string'):
-            setting_tabs = setting_tabs.mapped('page_store_model_nodes_ids') if setting_tabs else False
-            for setting_tab in setting_tabs:
-                attribute_string = setting_tab.attribute_string
-                if setting_tab.lang_code != self.env.lang:
-                    field = self.env['ir.ui.view']._fields['arch_db']
-                    translation_dictionary = field.get_translation_dictionary(
-                        self.with_context(lang=setting_tab.lang_code).arch_db,
-                        {self.env.lang: self.with_context(lang=self.env.lang)['arch_db']})
-                    attribute_string = translation_dictionary[attribute_string][self.env.lang]
-                if node.get('data-key') == setting_tab.attribute_name:
+            setting_tabs = self._get_access_model_policy(name_manager).pages
+            for attribute_name, attribute_string, lang_code in setting_tabs:
+                if node.get('data-key') == attribute_name:
                     # if node.get('string') == attribute_string and node.get('data-key') == setting_tab.attribute_name:
                     node_info['invisible'] = True
                     node.set('invisible', '1')
@@ -204,23 +222,13 @@ class ir_ui_view(models.Model):
             #      ('access_management_id.user_ids', 'in', request.env.uid)])
             
             # hide_filter_group_obj -= hide_filter_group_obj.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-            hide_filter_group_obj = search_data(self, 'hide.filters.groups', name_manager.model._name)
-            if hide_filter_group_obj:
-                for hide_field_obj in hide_filter_group_obj:
-                    for hide_filter in hide_field_obj.filters_store_model_nodes_ids.mapped('attribute_name'):
-                        if hide_filter == node.get('name', False):
-                            node_info['invisible'] = True
-                            node.set('invisible', '1')
-                    for hide_field_obj in hide_filter_group_obj:
-                        for hide_filter in hide_field_obj.groups_store_model_nodes_ids.mapped('attribute_name'):
-                            if hide_filter == node.get('name', False):
-                                node_info['invisible'] = True
-                                node.set('invisible', '1')
+            if node.get('name', False) in self._get_access_model_policy(name_manager).filters:
+                node_info['invisible'] = True
+                node.set('invisible', '1')
         return None
         
     def _postprocess_tag_label(self, node, name_manager, node_info):
         postprocessor = getattr(super(ir_ui_view, self), '_postprocess_tag_label', False)
-        hide_field_obj = self.env['hide.field'].sudo()
         if postprocessor:
             super(ir_ui_view, self)._postprocess_tag_label(node, name_manager, node_info)
             if node.get('for'):
@@ -229,13 +237,10 @@ class ir_ui_view(models.Model):
                 #                                     ('access_management_id.user_ids','in',request.env.uid)])
                 
                 # hide_lable -= hide_lable.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-                hide_lable = search_data(self, 'hide.field', name_manager.model._name)
-                if hide_lable:
-                    for hide_field in hide_lable:
-                        for field_id in hide_field.field_id:
-                            if node.get('for') == field_id.name and node.get('string') == field_id.field_description:
-                                node_info['invisible'] = True
-                                node.set('invisible', '1')
+                hide_field = self._get_access_model_policy(name_manager).fields.get(node.get('for'))
+                if hide_field and node.get('string') in hide_field.descriptions:
+                    node_info['invisible'] = True
+                    node.set('invisible', '1')
 
             
 
@@ -2,9 +2,8 @@ from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, AccessError
 from odoo.osv import expression
 from odoo.tools.safe_eval import safe_eval
-from odoo.addons.advanced_web_domain_widget.models.domain_prepare import prepare_domain_v2,compute_domain
-from odoo.tools.sql import SQL
-from .query_prepare import search_data
+from odoo.addons.advanced_web_domain_widget.models.domain_prepare import prepare_domain
+from .access_policy import get_access_policy, get_model_policy, has_rules, EMPTY_MODEL_POLICY, VIEW_FLAGS
 
 
 
@@ -14,6 +13,8 @@ class BaseModel(models.AbstractModel):
     @api.model
     def get_views(self, views, options=None):
         res = super().get_views(views, options)
+        if not has_rules(self.env, self._name, 'get_views'):
+            return res
         form_toolbar = res['views'].get('form', {}).get('toolbar') or False
         tree_toolbar = res['views'].get('list', {}).get('toolbar') or False
         # remove_action = self.env['remove.action'].sudo().search(
@@ -22,11 +23,10 @@ class BaseModel(models.AbstractModel):
         #      ('model_id.model', '=', self._name)])
         
         # remove_action -= remove_action.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-        remove_action = search_data(self, 'remove.action', search_model=self._name)
-        if remove_action:
+        model_policy = get_model_policy(self.env, self._name)
+        if model_policy.remove_action:
             if form_toolbar or tree_toolbar:
-                remove_server_action = remove_action.mapped('server_action_ids.action_id').ids
-                remove_print_action = remove_action.mapped('report_action_ids.action_id').ids
+                remove_server_action = remove_print_action = model_policy.hidden_action_ids
             if form_toolbar:
                 if res['views']['form']['toolbar'].get('action', False):
                     action = [rec for rec in res['views']['form']['toolbar']['action'] if
@@ -50,19 +50,16 @@ class BaseModel(models.AbstractModel):
 
     @api.model
     def load_views(self, views, options=None):
-        actions_and_prints = []
         # remove_action = self.env['remove.action'].sudo().search([('access_management_id.active', '=', True),
         #                                         ('access_management_id', 'in',self.env.user.access_management_ids.ids),
         #                                         ('model_id.model', '=', self._name)])
         # remove_action -= remove_action.filtered(lambda x: x.access_management_id.is_apply_on_without_company == False and self.env.company.id not in x.access_management_id.company_ids.ids)
-        remove_action = search_data(self, 'remove.action', search_model=self._name)
-        for access in remove_action:
-            actions_and_prints = actions_and_prints + access.mapped('report_action_ids.action_id').ids
-            actions_and_prints = actions_and_prints + access.mapped('server_action_ids.action_id').ids
-            for view_data in access.view_data_ids:
-                for view_data_list in views:
-                    if view_data.techname == view_data_list[1]:
-                        views.pop(views.index(view_data_list))
+        if not has_rules(self.env, self._name, 'load_views'):
+            return super(BaseModel, self).load_views(views, options=options)
+        model_policy = get_model_policy(self.env, self._name)
+        actions_and_prints = model_policy.hidden_action_ids
+        if model_policy.hidden_views:
+            views = [view for view in views if view[1] not in model_policy.hidden_views]
 
         res = super(BaseModel, self).load_views(views, options=options)
 
@@ -82,34 +79,40 @@ class BaseModel(models.AbstractModel):
                                     res['fields_views'][view]['toolbar']['action'].remove(act)
         return res
 
+    @api.model
+    def _get_view_cache_key(self, view_id=None, view_type='form', **options):
+        key = super()._get_view_cache_key(view_id, view_type, **options)
+        policy = get_access_policy(self.env)
+        return key + (policy.view_key if policy else None,)
+
     @api.model
     def _get_view(self, view_id=None, view_type='form', **options):
         arch, view = super()._get_view(view_id, view_type, **options)
-        readonly_access_id = search_data(self, 'access.management', condition=('readonly', '=', True), operator='AND')
-        access_recs = search_data(self, 'access.domain.ah', search_model=self._name)
-        access_model_recs = search_data(self, 'remove.action', search_model=self._name)
+        if not has_rules(self.env, self._name, '_get_view', flags=VIEW_FLAGS):
+            return arch, view
+        policy = get_access_policy(self.env)
+        if not policy:
+            return arch, view
+        model_policy = policy.models.get(self._name, EMPTY_MODEL_POLICY)
+        readonly_access_id = policy.readonly
+        access_recs = model_policy.domains
+        access_model_recs = model_policy.remove_action
 
         if view_type == 'form':
-            access_management_id = search_data(self, 'access.management', condition=('hide_chatter', '=', True),operator='AND', limit=1)
-            if access_management_id:
+            if 'hide_chatter' in policy.flags or 'hide_chatter' in model_policy.chatter:
                 for chatter_path in arch.xpath("//chatter"):
                     chatter_path.getparent().remove(chatter_path)
-            else:
-                hide_chatter_id = search_data(self, 'hide.chatter', search_model=self._name, condition=('hide_chatter', '=', True), operator='AND', limit=1)
-                if hide_chatter_id:
-                    for chatter_path in arch.xpath("//chatter"):
-                        chatter_path.getparent().remove(chatter_path)
 
         if view_type in ['kanban', 'list']:
-            restrict_import = search_data(self, 'access.management', condition=('hide_import', '=', True), operator='AND', limit=1)
-            if restrict_import or (access_model_recs and access_model_recs.filtered(lambda x: x.restrict_import)):
+            restrict_import = 'hide_import' in policy.flags
+            if restrict_import or 'restrict_import' in model_policy.restrictions:
                 doc = arch
                 doc.attrib.update({'import': 'false'})
                 arch = doc
 
-            restrict_export = search_data(self, 'access.management', condition=('hide_export', '=', True), operator='AND', limit=1)
+            restrict_export = 'hide_export' in policy.flags
 
-            if access_model_recs and (access_model_recs.filtered(lambda x: x.restrict_export) or restrict_export):
+            if access_model_recs and ('restrict_export' in model_policy.restrictions or restrict_export):
                 doc = arch
                 doc.attrib.update({'export_xlsx': 'false'})
                 arch = doc
@@ -130,16 +133,9 @@ class BaseModel(models.AbstractModel):
         else:
 
             if access_model_recs:
-                delete = 'true'
-                edit = 'true'
-                create = 'true'
-                for access_model in access_model_recs:
-                    if access_model.restrict_create:
-                        create = 'false'
-                    if access_model.restrict_edit:
-                        edit = 'false'
-                    if access_model.restrict_delete:
-                        delete = 'false'
+                create = 'false' if 'restrict_create' in model_policy.restrictions else 'true'
+                edit = 'false' if 'restrict_edit' in model_policy.restrictions else 'true'
+                delete = 'false' if 'restrict_delete' in model_policy.restrictions else 'true'
 
                 if view_type in ['form', 'list', 'kanban', 'gantt','pivot','graph']:
                             arch.attrib.update({'create': create, 'delete': delete, 'edit': edit})
@@ -150,16 +146,9 @@ class BaseModel(models.AbstractModel):
                     arch.attrib.update({'create': create, 'delete': delete, 'edit': edit})
 
             if access_recs:
-                delete = 'false'
-                edit = 'false'
-                create = 'false'
-                for access_rec in access_recs:
-                    if access_rec.create_right:
-                        create = 'true'
-                    if access_rec.write_right:
-                        edit = 'true'
-                    if access_rec.delete_right:
-                        delete = 'true'
+                create = 'true' if any('create' in rule.rights for rule in access_recs) else 'false'
+                edit = 'true' if any('write' in rule.rights for rule in access_recs) else 'false'
+                delete = 'true' if any('unlink' in rule.rights for rule in access_recs) else 'false'
 
                 if view_type in ['form', 'list', 'kanban', 'gantt','pivot','graph']:
                     arch.attrib.update({'create': create, 'delete': delete, 'edit': edit})
@@ -172,74 +161,53 @@ class BaseModel(models.AbstractModel):
         return arch, view
 
     def _get_access_management_domain_record(self, model=False):
+        """access.domain.ah lines of the user for ``model`` whose access pack is set on the current company."""
         records = None
-        try:
-            if model:
-                self._cr.execute(SQL("SELECT id FROM ir_model WHERE model='%s'" % model))
-                model_numeric_id = self._cr.fetchone()[0]
-                if model_numeric_id and isinstance(model_numeric_id, int) and self.env.user:
-                    self._cr.execute(SQL("""
-                                    SELECT dm.id
-                                    FROM access_domain_ah as dm
-                                    WHERE dm.model_id=%s AND dm.access_management_id 
-                                    IN (SELECT am.id 
-                                        FROM access_management as am 
-                                        WHERE am.active='t' AND am.id 
-                                        IN (SELECT amusr.access_management_id
-                                            FROM access_management_users_rel_ah as amusr
-                                            WHERE amusr.user_id=%s))
-                                    """% (model_numeric_id, self.env.user.id)))
-                    records = self.env['access.domain.ah'].sudo().browse(row[0] for row in self._cr.fetchall())
-        except:
-            pass
+        if model:
+            rule_ids = [rule.id for rule in get_model_policy(self.env, model).domains if rule.in_company]
+            records = self.env['access.domain.ah'].sudo().browse(rule_ids)
         return records
 
+    def _get_access_management_search_domain(self, rule, partner_ids=None):
+        """Search domain of an access.domain.ah line, with its ``date_filter`` leaves expanded."""
+        domain_list = []
+        dom = safe_eval(rule.domain) if rule.domain else []
+        if dom:
+            domain_list = prepare_domain(self.env, self._name, expression.normalize_domain(dom))
+            if partner_ids is not None:
+                domain_list = ['|', ('id', 'in', partner_ids)] + domain_list
+        return domain_list
+
     def _check_access_management_right(self, mode=False, records=False):
+        """Check ``mode`` on the whole recordset against the access.domain.ah lines ``records``.
+
+        A record passes when one line granting ``mode`` matches it. Each line is
+        searched once, restricted to the records no earlier line granted.
+        ``denied`` holds the records no line granted.
+        """
         access_flag = False
         access_rule = None
-        length = len(records.sudo()) if records.sudo() else 0
-        partner_ids = self.env['res.users'].sudo().search([]).mapped("partner_id.id")
-        partner_domain = ['|', ('id', 'in', partner_ids)]
-        for record in records.sudo():
-            if mode == 'create' and record.create_right:
-                access_flag = True
+        denied = self.browse()
+        rules = records.sudo() if records else records
+        if not rules:
+            return {'access_flag': access_flag, 'access_rule': access_rule, 'denied': denied}
+        access_rule = rules[-1].access_management_id.name
+        if mode == 'create':
+            access_flag = any(rules.mapped('create_right'))
+            return {'access_flag': access_flag, 'access_rule': access_rule, 'denied': denied}
+
+        right = 'delete_right' if mode == 'unlink' else 'write_right'
+        partner_ids = None
+        if self._name == "res.partner":
+            partner_ids = self.env['res.users'].sudo().search([]).partner_id.ids
+        denied = self
+        records_model = self.with_context(active_test=False)
+        for rule in rules.filtered(right):
+            search_domain = self._get_access_management_search_domain(rule, partner_ids)
+            denied -= records_model.search([('id', 'in', denied.ids)] + search_domain)
+            if not denied:
                 break
-            elif mode in ['write', 'unlink']:
-                access = False
-                if mode == 'unlink':
-                    access = record.delete_right
-                elif mode == 'write':
-                    access = record.write_right
-
-                domain_list = []
-                if self.sudo()._name == "res.partner":
-                    domain_list += partner_domain
-                dom = safe_eval(record.domain) if record.domain else []
-                if dom:
-                    dom = expression.normalize_domain(dom)
-                    model_name = self._name
-                    if isinstance(dom, list):
-                        for dom_tuple in dom:
-                            if isinstance(dom_tuple, tuple):
-                                compute_domain(dom_tuple, model_name)
-                                operator_value = dom_tuple[1]
-                                already_add = False
-                                if operator_value == 'date_filter':
-                                    domain_list += prepare_domain_v2(dom_tuple)
-                                else:
-                                    domain_list.append(dom_tuple)
-                            else:
-                                domain_list.append(dom_tuple)
-                search_domain = domain_list
-                if 'active' in self._fields:
-                    search_domain = ['|', ('active', '=', False), ('active', '=', True)] + search_domain
-                record_ids = self.search(search_domain)
-
-                if self in record_ids and access:
-                    access_flag = access
-                    break
-            access_rule = record.access_management_id.name
-        return {'access_flag': access_flag, 'access_rule': access_rule}
+        return {'access_flag': not denied, 'access_rule': access_rule, 'denied': denied}
 
     def _display_access_management_error(self, mode=None, rule=None):
         if mode and rule:
@@ -263,57 +231,35 @@ class BaseModel(models.AbstractModel):
             raise AccessError(msg)
 
     def unlink(self):
-        value = self.env['ir.config_parameter'].sudo().search([('key', '=', 'uninstall_simplify_access_management')],
-                                                              limit=1).value
-        if not value:
-            for rec in self:
-                if rec._name:
-                    access_domain_ah_ids = rec._get_access_management_domain_record(model=rec._name)
-                    if access_domain_ah_ids:
-                        access_domain_ah_ids = access_domain_ah_ids.filtered(
-                            lambda line: self.env.company in line.access_management_id.company_ids)
-                    if access_domain_ah_ids:
-                        flag = rec._check_access_management_right(mode='unlink', records=access_domain_ah_ids)
-                        unlink_flag = flag['access_flag']
-                        access_rule = flag['access_rule']
-                        if not unlink_flag:
-                            rec._display_access_management_error(mode='unlink', rule=access_rule)
+        if self and has_rules(self.env, self._name, 'unlink', domain=True) and get_access_policy(self.env):
+            access_domain_ah_ids = self._get_access_management_domain_record(model=self._name)
+            if access_domain_ah_ids:
+                flag = self._check_access_management_right(mode='unlink', records=access_domain_ah_ids)
+                if not flag['access_flag']:
+                    flag['denied'][:1]._display_access_management_error(mode='unlink', rule=flag['access_rule'])
 
         return super().unlink()
 
     def write(self, vals):
-        value = self.env['ir.config_parameter'].sudo().search([('key', '=', 'uninstall_simplify_access_management')],
-                                                              limit=1).value
-        if not value:
-            for rec in self:
-                if rec._name:
-                    access_domain_ah_ids = rec._get_access_management_domain_record(model=rec._name)
-                    if access_domain_ah_ids:
-                        access_domain_ah_ids = access_domain_ah_ids.filtered(
-                            lambda line: self.env.company in line.access_management_id.company_ids)
-                    if access_domain_ah_ids:
-                        flag = rec._check_access_management_right(mode='write', records=access_domain_ah_ids)
-                        write_flag = flag['access_flag']
-                        access_rule = flag['access_rule']
-                        if not write_flag:
-                            rec._display_access_management_error(mode='write', rule=access_rule)
+        if self and has_rules(self.env, self._name, 'write', domain=True) and get_access_policy(self.env):
+            access_domain_ah_ids = self._get_access_management_domain_record(model=self._name)
+            if access_domain_ah_ids:
+                flag = self._check_access_management_right(mode='write', records=access_domain_ah_ids)
+                if not flag['access_flag']:
+                    flag['denied'][:1]._display_access_management_error(mode='write', rule=flag['access_rule'])
         return super().write(vals)
     
 
     @api.model_create_multi
     @api.returns('self', lambda value: value.id)
     def create(self, vals_list):
-        value = self.env['ir.config_parameter'].sudo().search([('key','=','uninstall_simplify_access_management')],limit=1).value
-        if not value:
-            if self._name:
-                access_domain_ah_ids = self._get_access_management_domain_record(model=self._name)
-                if access_domain_ah_ids:
-                    access_domain_ah_ids = access_domain_ah_ids.filtered(lambda line: self.env.company in line.access_management_id.company_ids)
-                if access_domain_ah_ids:
-                        flag = self._check_access_management_right(mode='create',records=access_domain_ah_ids)
-                        create_flag = flag['access_flag']
-                        access_rule = flag['access_rule']
-                        if not create_flag:
-                            self._display_access_management_error(mode='create',rule=access_rule)
+        if has_rules(self.env, self._name, 'create', domain=True) and get_access_policy(self.env):
+            access_domain_ah_ids = self._get_access_management_domain_record(model=self._name)
+            if access_domain_ah_ids:
+                flag = self._check_access_management_right(mode='create',records=access_domain_ah_ids)
+                create_flag = flag['access_flag']
+                access_rule = flag['access_rule']
+                if not create_flag:
+                    self._display_access_management_error(mode='create',rule=access_rule)
 
         return super().create(vals_list)
@@ -2,6 +2,7 @@ from odoo import fields, models, api, _
 
 class remove_action(models.Model):
     _name = 'remove.action'
+    _inherit = 'access.policy.mixin'
     _description = "Models Right"
 
 
@@ -1,6 +1,6 @@
 from odoo import fields, models, api, SUPERUSER_ID,_
 from odoo.exceptions import UserError, AccessDenied
-from .query_prepare import search_data
+from .access_policy import bump_policy_version, get_access_policy
 import logging
 _logger = logging.getLogger(__name__)
 
@@ -11,6 +11,8 @@ class res_users(models.Model):
     
     def write(self, vals):
         res = super(res_users, self).write(vals)
+        if 'access_management_ids' in vals:
+            bump_policy_version(self.env)
         for user in self:
             for access in user.sudo().access_management_ids:
                 if user.env.company in access.company_ids and access.readonly:
@@ -21,6 +23,8 @@ class res_users(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         res = super(res_users, self).create(vals_list)
+        if any(vals.get('access_management_ids') for vals in vals_list):
+            bump_policy_version(self.env)
         for record in self:
             for access in record.sudo().access_management_ids:    
                 if self.env.company in access.company_ids and access.readonly:
@@ -38,8 +42,8 @@ class res_users(models.Model):
                 self = api.Environment(cr, uid, {})[cls._name] 
                 # access_management_obj = self.env['access.management']
                 
-                result = search_data(self, 'access.management',condition=('disable_login','=',True), operator='AND', limit=1)
-                if result:
+                policy = get_access_policy(self.env)
+                if policy and 'disable_login' in policy.flags:
                     raise AccessDenied("Login is disabled for this user due to access management settings.")
         except AccessDenied:
             _logger.info("Login failed for db:%s login:%s from ", db, credential.get('login'))
@@ -0,0 +1,2 @@
+from . import test_access_management_performance
+from . import test_access_management_benchmark
@@ -0,0 +1,274 @@
+import contextlib
+import functools
+import logging
+import os
+import time
+from collections import defaultdict
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import SQL
+
+from odoo.addons.simplify_access_management.models import access_policy
+from odoo.addons.simplify_access_management.models import ir_model_access
+from odoo.addons.simplify_access_management.models import ir_rule
+from odoo.addons.simplify_access_management.models import models as access_models
+
+_logger = logging.getLogger(__name__)
+
+# hooks of the module whose time and queries are reported, {label: (class, method name)}
+HOOKS = {
+    "ir.model.access.check": (ir_model_access.ir_model_access, "check"),
+    "ir.rule._compute_domain": (ir_rule.ir_rule, "_compute_domain"),
+    "_get_view": (access_models.BaseModel, "_get_view"),
+    "write": (access_models.BaseModel, "write"),
+}
+
+
+def _size(name, default):
+    return int(os.environ.get("ACCESS_BENCH_%s" % name, default))
+
+
+@tagged("post_install", "-at_install", "-standard", "access_management_benchmark")
+class TestAccessManagementBenchmark(TransactionCase):
+    """Overhead of the access management hooks on ordinary ORM traffic.
+
+    Not part of the standard test run, start it with
+    ``--test-tags access_management_benchmark``. The sizes are read from the
+    ``ACCESS_BENCH_USERS``, ``ACCESS_BENCH_RULES``, ``ACCESS_BENCH_DOMAINS``,
+    ``ACCESS_BENCH_RECORDS`` and ``ACCESS_BENCH_ROUNDS`` environment variables.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users_count = _size("USERS", 20)
+        cls.rules_count = _size("RULES", 10)
+        cls.domains_count = _size("DOMAINS", 5)
+        cls.records_count = _size("RECORDS", 200)
+        cls.rounds = _size("ROUNDS", 5)
+        # tag names "Bench <digit> ..." the pack of the measured user grants
+        cls.granted_digits = max(min(cls.domains_count, 10), 1)
+
+        groups = [
+            cls.env.ref("base.group_user").id,
+            cls.env.ref("base.group_partner_manager").id,
+        ]
+        cls.users = cls.env["res.users"].create(
+            [
+                {
+                    "name": "Access Bench %s" % index,
+                    "login": "access.bench.%s" % index,
+                    "groups_id": [Command.set(groups)],
+                }
+                for index in range(cls.users_count)
+            ]
+        )
+        cls.user = cls.users[0]
+
+        tag_model = cls.env["ir.model"]._get("res.partner.category")
+        partner_model = cls.env["ir.model"]._get("res.partner")
+        function_field = cls.env["ir.model.fields"]._get("res.partner", "function")
+        packs = []
+        for index in range(cls.rules_count):
+            domains = []
+            for domain_index in range(cls.domains_count):
+                domains += [
+                    Command.create(
+                        {
+                            "model_id": tag_model.id,
+                            "apply_domain": True,
+                            "domain": "[('name', 'ilike', 'Bench %s')]" % (domain_index % 10),
+                            "write_right": True,
+                            "create_right": True,
+                            "delete_right": True,
+                        }
+                    ),
+                    Command.create(
+                        {
+                            "model_id": partner_model.id,
+                            "apply_domain": True,
+                            "domain": "[('create_date', 'date_filter', 'this_year')]",
+                        }
+                    ),
+                ]
+            packs.append(
+                {
+                    "name": "Bench Pack %s" % index,
+                    "user_ids": [Command.set(cls.users[index % len(cls.users):][:5].ids)],
+                    "access_domain_ah_ids": domains,
+                    "hide_field_ids": [
+                        Command.create(
+                            {
+                                "model_id": partner_model.id,
+                                "field_id": [Command.set(function_field.ids)],
+                                "invisible": True,
+                            }
+                        )
+                    ],
+                }
+            )
+        cls.env["access.management"].create(packs)
+
+    @contextlib.contextmanager
+    def _hooks_disabled(self):
+        """Run with the module switched off the way uninstallation does it."""
+        self.env.flush_all()
+        self.cr.execute(
+            SQL(
+                "INSERT INTO ir_config_parameter (key, value) VALUES (%s, %s)",
+                "uninstall_simplify_access_management",
+                "1",
+            )
+        )
+        self.cr.cache.pop(access_policy.POLICY_STATE_CACHE_KEY, None)
+        try:
+            yield
+        finally:
+            self.cr.execute(
+                SQL(
+                    "DELETE FROM ir_config_parameter WHERE key = %s",
+                    "uninstall_simplify_access_management",
+                )
+            )
+            self.cr.cache.pop(access_policy.POLICY_STATE_CACHE_KEY, None)
+
+    @contextlib.contextmanager
+    def _profile_hooks(self, stats):
+        """Accumulate calls, time and queries of each hook in ``stats``."""
+        cr = self.cr
+        active = set()
+
+        def wrap(label, method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                if label in active:
+                    return method(*args, **kwargs)
+                active.add(label)
+                queries = cr.sql_log_count
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    entry = stats[label]
+                    entry[0] += 1
+                    entry[1] += time.perf_counter() - start
+                    entry[2] += cr.sql_log_count - queries
+                    active.discard(label)
+
+            return wrapper
+
+        with contextlib.ExitStack() as stack:
+            for label, (cls, name) in HOOKS.items():
+                stack.enter_context(patch.object(cls, name, wrap(label, cls.__dict__[name])))
+            yield
+
+    def _measure(self, label, results, function):
+        self.env.invalidate_all()
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        for _round in range(self.rounds):
+            function()
+        elapsed = time.perf_counter() - start
+        results[label] = (
+            elapsed / self.rounds,
+            (self.cr.sql_log_count - queries) / self.rounds,
+        )
+
+    def _run_workload(self):
+        results = {}
+        hook_stats = defaultdict(lambda: [0, 0.0, 0])
+        tags = self.env["res.partner.category"].with_user(self.user)
+        partners = self.env["res.partner"].with_user(self.user)
+        self.env.registry.clear_cache()
+        # warm the metadata caches shared by both modes
+        tags.search([], limit=1)
+
+        with self._profile_hooks(hook_stats):
+            self._measure(
+                "search", results, lambda: tags.search([("name", "ilike", "Bench")])
+            )
+            records = tags.sudo().search([("name", "ilike", "Bench")]).with_user(self.user)
+            self._measure(
+                "read", results, lambda: records.read(["name", "color", "parent_id"])
+            )
+            created = tags.browse()
+
+            def create():
+                nonlocal created
+                created |= tags.create(
+                    [
+                        {"name": "Bench %s new %s" % (index % self.granted_digits, index)}
+                        for index in range(self.records_count // self.rounds or 1)
+                    ]
+                )
+
+            self._measure("create", results, create)
+            self._measure("write", results, lambda: records.write({"color": 4}))
+
+            def unlink():
+                nonlocal created
+                size = self.records_count // self.rounds or 1
+                batch, created = created[:size], created[size:]
+                batch.unlink()
+
+            self._measure("unlink", results, unlink)
+
+            def get_views_cold():
+                self.env.registry.clear_cache("templates")
+                partners.get_views([(False, "form"), (False, "list"), (False, "search")])
+
+            self._measure("get_views (cold)", results, get_views_cold)
+            self._measure(
+                "get_views (warm)",
+                results,
+                lambda: partners.get_views([(False, "form"), (False, "list"), (False, "search")]),
+            )
+        return results, hook_stats
+
+    def test_hooks_overhead(self):
+        self.env["res.partner.category"].create(
+            [{"name": "Bench %s %s" % (index % self.granted_digits, index)} for index in range(self.records_count)]
+        )
+        self.env.flush_all()
+
+        with self._hooks_disabled():
+            disabled, disabled_hooks = self._run_workload()
+        enabled, enabled_hooks = self._run_workload()
+
+        lines = [
+            "access management benchmark: %s users, %s rules, %s domains per rule, %s records"
+            % (self.users_count, self.rules_count, self.domains_count, self.records_count),
+            "%-20s %12s %9s %12s %9s" % ("operation", "disabled ms", "queries", "enabled ms", "queries"),
+        ]
+        for label in enabled:
+            lines.append(
+                "%-20s %12.2f %9.1f %12.2f %9.1f"
+                % (
+                    label,
+                    disabled[label][0] * 1000,
+                    disabled[label][1],
+                    enabled[label][0] * 1000,
+                    enabled[label][1],
+                )
+            )
+        lines.append(
+            "%-24s %8s %12s %9s %12s %9s"
+            % ("hook", "calls", "disabled ms", "queries", "enabled ms", "queries")
+        )
+        for label in HOOKS:
+            _calls, disabled_time, disabled_queries = disabled_hooks[label]
+            enabled_calls, enabled_time, enabled_queries = enabled_hooks[label]
+            lines.append(
+                "%-24s %8s %12.2f %9s %12.2f %9s"
+                % (label, enabled_calls, disabled_time * 1000, disabled_queries,
+                   enabled_time * 1000, enabled_queries)
+            )
+        stats = self.env["access.management"].get_fast_path_stats()
+        lines += ["%-24s %s/%s short-circuited" % (hook, values["short_circuited"], values["calls"])
+                  for hook, values in sorted(stats.items())]
+        _logger.info("\n".join(lines))
+
+        self.assertEqual(set(enabled), set(disabled))
+        self.assertTrue(enabled_hooks["ir.model.access.check"][0])
@@ -0,0 +1,132 @@
+import logging
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.exceptions import AccessError
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.advanced_web_domain_widget.models import domain_prepare
+from odoo.addons.simplify_access_management.models import ir_rule
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("post_install", "-at_install", "access_management_performance")
+class TestAccessManagementPerformance(TransactionCase):
+    """Mass write/unlink on a model with active access management domain rules"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = cls.env["res.users"].create(
+            {
+                "name": "Access Bench User",
+                "login": "access.bench.user",
+                "groups_id": [
+                    Command.set(
+                        [
+                            cls.env.ref("base.group_user").id,
+                            cls.env.ref("base.group_partner_manager").id,
+                        ]
+                    )
+                ],
+            }
+        )
+        model = cls.env["ir.model"]._get("res.partner.category")
+        cls.access = cls.env["access.management"].create(
+            {
+                "name": "Bench Rule",
+                "user_ids": [Command.set(cls.user.ids)],
+                "access_domain_ah_ids": [
+                    Command.create(
+                        {
+                            "model_id": model.id,
+                            "domain": "[('name', 'ilike', 'Bench A')]",
+                            "write_right": True,
+                            "delete_right": True,
+                        }
+                    ),
+                    Command.create(
+                        {
+                            "model_id": model.id,
+                            "domain": "[('name', 'ilike', 'Bench B')]",
+                            "write_right": True,
+                            "delete_right": True,
+                        }
+                    ),
+                ],
+            }
+        )
+
+    def _create_tags(self, count, prefix="Bench"):
+        return self.env["res.partner.category"].create(
+            [
+                {"name": "%s %s %s" % (prefix, "AB"[index % 2], index)}
+                for index in range(count)
+            ]
+        )
+
+    def _count_queries(self, method, records, *args):
+        records.env.invalidate_all()
+        count = self.cr.sql_log_count
+        start = time.perf_counter()
+        method(records, *args)
+        elapsed = time.perf_counter() - start
+        _logger.info(
+            "%s on %s %s records: %s queries in %.3fs",
+            method.__name__,
+            len(records),
+            records._name,
+            self.cr.sql_log_count - count,
+            elapsed,
+        )
+        return self.cr.sql_log_count - count
+
+    def test_mass_write_query_count(self):
+        """The number of rule searches does not depend on the number of records"""
+        small = self._create_tags(10).with_user(self.user)
+        large = self._create_tags(500).with_user(self.user)
+        self.env.flush_all()
+        # warm the policy and metadata caches
+        self._create_tags(1).with_user(self.user).write({"color": 1})
+
+        small_count = self._count_queries(type(small).write, small, {"color": 2})
+        large_count = self._count_queries(type(large).write, large, {"color": 2})
+        self.assertLessEqual(large_count, small_count + 2)
+
+    def test_mass_unlink_query_count(self):
+        small = self._create_tags(10).with_user(self.user)
+        large = self._create_tags(500).with_user(self.user)
+        self.env.flush_all()
+        self._create_tags(1).with_user(self.user).unlink()
+
+        small_count = self._count_queries(type(small).unlink, small)
+        large_count = self._count_queries(type(large).unlink, large)
+        self.assertLessEqual(large_count, small_count + 2)
+
+    def test_mass_write_denied(self):
+        """One record outside every rule refuses the whole batch"""
+        tags = self._create_tags(50) | self._create_tags(1, prefix="Other")
+        with self.assertRaises(AccessError):
+            tags.with_user(self.user).write({"color": 3})
+        with self.assertRaises(AccessError):
+            tags.with_user(self.user).unlink()
+        tags[:-1].with_user(self.user).write({"color": 3})
+        self.assertEqual(set(tags[:-1].mapped("color")), {3})
+
+    def test_date_filter_domain_follows_day(self):
+        """Cached rule domains using date_filter are expanded again on the next day"""
+        self.access.access_domain_ah_ids[0].write(
+            {"domain": "[('create_date', 'date_filter', 'today')]", "apply_domain": True}
+        )
+        rules = self.env["ir.rule"].with_user(self.user)
+        domains = []
+        for day in (datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 1)):
+            with patch.object(domain_prepare, "_user_today", return_value=day), \
+                    patch.object(ir_rule, "_user_today", return_value=day):
+                domains.append(str(rules._compute_domain("res.partner.category")))
+        self.assertIn("2024-01-01", domains[0])
+        self.assertIn("2024-01-02", domains[1])
+        self.assertEqual(domains[0], domains[2])